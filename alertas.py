@@ -0,0 +1,396 @@
+# alertas.py - Motor de alertas del modo online con índices de umbrales por cripto y métrica
+#
+# Cada alerta se compila en una o varias reglas "métrica > umbral" (o >=, <, <=). Las reglas
+# se agrupan por (cripto o 'all', métrica, sentido) en arrays de umbrales ordenados: las que
+# se cumplen para un valor son un prefijo del array y su longitud sale de una búsqueda binaria.
+# En cada actualización solo se revisan las métricas que cambiaron.
+#
+# Las reglas disparan por cruce: una regla armada dispara al pasar el umbral y queda disparada
+# hasta que el valor vuelve más allá del umbral de rearme (umbral menos la banda de histéresis),
+# que tiene su propio array ordenado. Entre dos disparos de la misma alerta y cripto tiene que
+# pasar el enfriamiento. Los disparos se añaden a un registro JSONL con fsync por lotes.
+import json
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+
+import numpy as np
+
+from global_data import CONFIG_ALERTAS, CONFIG_ALMACEN
+
+# métrica -> (sección de la instantánea, ruta dentro de ella, valor si falta)
+METRICAS = {
+    'precio': ('datos', ('precio',), 0.0),
+    'cambio_esperado': ('analisis', ('cambio_esperado',), 0.0),
+    'volatilidad': ('analisis', ('indicadores', 'volatilidad'), 0.0),
+    'rsi': ('analisis', ('rsi',), 50.0),
+}
+
+
+CONDICIONES = {'precio': ('above', 'below'), 'cambio': ('increase', 'decrease')}
+
+
+def reglas_alerta(alerta: dict) -> list:
+    """
+    Reglas (métrica, signo, umbral, inclusiva) de una alerta; se cumple si alguna se cumple.
+    signo +1: valor > umbral (>= si inclusiva); signo -1: valor < umbral (<= si inclusiva).
+    """
+    tipo = alerta.get('tipo')
+    if tipo == 'pump':
+        return [('cambio_esperado', 1, 10.0, False)]
+    if tipo == 'dump':
+        return [('cambio_esperado', -1, -10.0, False)]
+    if tipo == 'volumen':
+        return [('volatilidad', 1, 10.0, False)]  # 10% de volatilidad
+    if tipo == 'rsi':
+        return [('rsi', 1, 80.0, False), ('rsi', -1, 20.0, False)]
+    if tipo in ('precio', 'cambio'):
+        if alerta.get('valor') in (None, ''):
+            raise ValueError(f"Las alertas de {tipo} necesitan un valor")
+        valor = float(alerta['valor'])
+        condicion = alerta.get('condicion') or ('above' if tipo == 'precio' else 'increase')
+        if condicion not in CONDICIONES[tipo]:
+            raise ValueError(f"Condición no válida para {tipo}: {condicion} (usa {' o '.join(CONDICIONES[tipo])})")
+        if tipo == 'precio':
+            return [('precio', 1 if condicion == 'above' else -1, valor, True)]
+        if condicion == 'increase':
+            return [('cambio_esperado', 1, valor, True)]
+        return [('cambio_esperado', -1, -valor, True)]
+    raise ValueError(f"Tipo de alerta desconocido: {tipo}")
+
+
+def banda_histeresis(alerta: dict, metrica: str, umbral: float) -> float:
+    """Distancia (positiva) entre el umbral y el de rearme; la del precio es un % del umbral"""
+    banda = alerta.get('histeresis')
+    banda = CONFIG_ALERTAS['histeresis'].get(metrica, 0.0) if banda is None else float(banda)
+    if metrica == 'precio':
+        return abs(umbral) * max(banda, 0.0) / 100
+    return max(banda, 0.0)
+
+
+def valor_metrica(metrica: str, datos: dict, analisis: dict) -> float:
+    seccion, ruta, defecto = METRICAS[metrica]
+    valor = datos if seccion == 'datos' else analisis
+    for clave in ruta:
+        valor = valor.get(clave) if isinstance(valor, dict) else None
+    try:
+        return float(defecto if valor is None else valor)
+    except (TypeError, ValueError):
+        return float(defecto)
+
+
+class _Indice:
+    """
+    Reglas de un mismo (origen, métrica, signo, inclusiva), con umbrales multiplicados por el
+    signo para que todas se lean como "valor > umbral". Dos órdenes: por umbral de disparo y
+    por umbral de rearme.
+    """
+    __slots__ = ('signo', 'inclusiva', 'umbrales', 'ids', 'reglas', 'rearmes', 'ids_rearme', 'reglas_rearme')
+
+    def __init__(self, signo: int, inclusiva: bool, umbrales: list, bandas: list, ids: list, reglas: list):
+        self.signo = signo
+        self.inclusiva = inclusiva
+        umbrales = np.asarray(umbrales, dtype=np.float64) * signo
+        rearmes = umbrales - np.asarray(bandas, dtype=np.float64)
+        ids = np.asarray(ids, dtype=np.int64)
+        reglas = np.asarray(reglas, dtype=np.int64)
+        orden = np.argsort(umbrales, kind='stable')
+        self.umbrales, self.ids, self.reglas = umbrales[orden], ids[orden], reglas[orden]
+        orden = np.argsort(rearmes, kind='stable')
+        self.rearmes, self.ids_rearme, self.reglas_rearme = rearmes[orden], ids[orden], reglas[orden]
+
+    def _superados(self, umbrales: np.ndarray, valor: float) -> int:
+        """Cuántos umbrales deja atrás `valor` (un prefijo del array)"""
+        if np.isnan(valor):
+            return 0
+        return int(np.searchsorted(umbrales, valor * self.signo, side='right' if self.inclusiva else 'left'))
+
+    def cumplidas(self, valor: float) -> int:
+        return self._superados(self.umbrales, valor)
+
+    def sin_rearmar(self, valor: float) -> int:
+        """Reglas cuyo umbral de rearme sigue superado (prefijo de `rearmes`)"""
+        return self._superados(self.rearmes, valor)
+
+
+class MotorAlertas:
+    """Índices de umbrales y estado (armada/disparada) de cada regla por cripto; thread-safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._alertas = {}         # id -> alerta
+        self._indices = {}         # origen ('all' o cripto) -> métrica -> [_Indice]
+        self._valores = {}         # (cripto, origen, métrica) -> último valor evaluado
+        self._posiciones = {}      # (cripto, origen, métrica, k) -> (cumplidas, sin_rearmar)
+        self._disparadas = {}      # (id, cripto) -> reglas disparadas sin rearmar
+        self._activas = {}         # (id, cripto) -> copia de la alerta con 'cripto_afectada'
+        self._ultimo_disparo = {}  # (id, cripto) -> time.time() del último evento
+        self._recompilado = False
+        self.evaluaciones = 0
+        self.suprimidas = 0  # disparos dentro del enfriamiento
+
+    def cargar(self, alertas: list):
+        """
+        Compila las alertas activas. El estado de las que siguen existiendo se conserva:
+        una alerta ya disparada no vuelve a disparar por recompilar.
+        """
+        reglas = {}
+        compiladas = {}
+        for alerta in alertas:
+            if not alerta.get('activa', True):
+                continue
+            try:
+                for n, (metrica, signo, umbral, inclusiva) in enumerate(reglas_alerta(alerta)):
+                    origen = alerta.get('cripto') or 'all'
+                    grupo = reglas.setdefault((origen, metrica, signo, inclusiva), ([], [], [], []))
+                    grupo[0].append(umbral)
+                    grupo[1].append(banda_histeresis(alerta, metrica, umbral))
+                    grupo[2].append(alerta['id'])
+                    grupo[3].append(n)
+                compiladas[alerta['id']] = alerta
+            except (TypeError, ValueError) as e:
+                print(f"⚠️ Alerta {alerta.get('id')} ignorada: {e}")
+
+        indices = {}
+        for (origen, metrica, signo, inclusiva), grupo in reglas.items():
+            indices.setdefault(origen, {}).setdefault(metrica, []).append(_Indice(signo, inclusiva, *grupo))
+        with self._lock:
+            self._alertas = compiladas
+            self._indices = indices
+            for estado in (self._disparadas, self._activas, self._ultimo_disparo):
+                for par in [p for p in estado if p[0] not in compiladas]:
+                    del estado[par]
+            self._recompilado = True
+
+    def evaluar(self, datos_actuales: dict, analisis_actuales: dict, criptos: list = None,
+                ahora: float = None) -> dict:
+        """
+        Evalúa las criptos actualizadas (`criptos`, por defecto todas las de `datos_actuales`).
+        Devuelve {'disparadas': [eventos], 'rearmadas': [(id, cripto)], 'suprimidas': n}.
+        """
+        ahora = time.time() if ahora is None else ahora
+        disparadas, rearmadas, suprimidas = [], [], 0
+        with self._lock:
+            if self._recompilado:
+                # Índices nuevos: posiciones desde cero para todas las criptos conocidas
+                criptos = list(datos_actuales)
+                self._valores.clear()
+                self._posiciones.clear()
+                self._recompilado = False
+            else:
+                criptos = [c for c in (criptos if criptos is not None else datos_actuales) if c in datos_actuales]
+
+            for cripto in criptos:
+                datos = datos_actuales.get(cripto, {})
+                analisis = analisis_actuales.get(cripto, {})
+                for origen in (cripto, 'all'):
+                    for metrica, indices in self._indices.get(origen, {}).items():
+                        valor = valor_metrica(metrica, datos, analisis)
+                        clave_valor = (cripto, origen, metrica)
+                        if self._valores.get(clave_valor) == valor:
+                            continue  # la métrica no cambió: sus reglas tampoco
+                        self._valores[clave_valor] = valor
+                        for k, indice in enumerate(indices):
+                            clave = (cripto, origen, metrica, k)
+                            cumplidas_antes, sin_rearmar_antes = self._posiciones.get(clave, (0, len(indice.rearmes)))
+                            cumplidas, sin_rearmar = indice.cumplidas(valor), indice.sin_rearmar(valor)
+                            self._posiciones[clave] = (cumplidas, sin_rearmar)
+                            self.evaluaciones += 1
+
+                            # Reglas que vuelven por detrás de su umbral de rearme
+                            tramo = slice(sin_rearmar, sin_rearmar_antes)
+                            for id_alerta, n in zip(indice.ids_rearme[tramo].tolist(), indice.reglas_rearme[tramo].tolist()):
+                                if self._rearmar((id_alerta, cripto), n):
+                                    rearmadas.append((id_alerta, cripto))
+
+                            # Reglas que cruzan su umbral: disparan si estaban armadas
+                            tramo = slice(cumplidas_antes, cumplidas)
+                            for id_alerta, n, umbral in zip(indice.ids[tramo].tolist(), indice.reglas[tramo].tolist(),
+                                                            indice.umbrales[tramo].tolist()):
+                                par = (id_alerta, cripto)
+                                if n in self._disparadas.get(par, ()):
+                                    continue
+                                self._disparadas.setdefault(par, set()).add(n)
+                                if par not in self._activas:
+                                    self._activas[par] = dict(self._alertas[id_alerta], cripto_afectada=cripto)
+                                if ahora - self._ultimo_disparo.get(par, float('-inf')) < self._enfriamiento(id_alerta):
+                                    suprimidas += 1
+                                    continue
+                                self._ultimo_disparo[par] = ahora
+                                disparadas.append(self._evento(par, metrica, valor, umbral * indice.signo, ahora))
+
+            self.suprimidas += suprimidas
+            return {'disparadas': disparadas, 'rearmadas': rearmadas, 'suprimidas': suprimidas}
+
+    def _rearmar(self, par: tuple, n: int) -> bool:
+        """Rearma la regla `n`; True si la alerta deja de estar disparada para esa cripto"""
+        reglas = self._disparadas.get(par)
+        if not reglas or n not in reglas:
+            return False
+        reglas.discard(n)
+        if reglas:
+            return False
+        del self._disparadas[par]
+        self._activas.pop(par, None)
+        return True
+
+    def _enfriamiento(self, id_alerta: int) -> float:
+        enfriamiento = self._alertas[id_alerta].get('enfriamiento')
+        return float(CONFIG_ALERTAS['enfriamiento'] if enfriamiento is None else enfriamiento)
+
+    def _evento(self, par: tuple, metrica: str, valor: float, umbral: float, ahora: float) -> dict:
+        id_alerta, cripto = par
+        alerta = self._alertas[id_alerta]
+        return {
+            'alerta_id': id_alerta,
+            'tipo': alerta.get('tipo'),
+            'cripto': alerta.get('cripto'),
+            'cripto_afectada': cripto,
+            'condicion': alerta.get('condicion'),
+            'valor': alerta.get('valor'),
+            'metrica': metrica,
+            'valor_metrica': valor,
+            'umbral': umbral,
+            'fecha': datetime.fromtimestamp(ahora).isoformat()
+        }
+
+    def activas(self) -> list:
+        """Alertas disparadas y aún sin rearmar, una copia por (alerta, cripto)"""
+        with self._lock:
+            return list(self._activas.values())
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'alertas': len(self._alertas),
+                'indices': sum(len(i) for m in self._indices.values() for i in m.values()),
+                'activas': len(self._activas),
+                'evaluaciones': self.evaluaciones,
+                'suprimidas': self.suprimidas
+            }
+
+
+def ruta_registro() -> str:
+    """<carpeta>/.almacen/<archivo>: junto al historial online"""
+    config = CONFIG_ALERTAS['registro']
+    return os.path.join(config['carpeta'], CONFIG_ALMACEN['subcarpeta'], config['archivo'])
+
+
+class RegistroEventos:
+    """
+    Eventos de alerta en un JSONL de solo añadir. Cada evento recibe un id creciente (su número
+    de línea); en memoria solo se guarda el desplazamiento de cada línea y su cripto/alerta,
+    para paginar y filtrar leyendo únicamente las líneas devueltas.
+    """
+
+    def __init__(self, ruta: str = None, fsync_eventos: int = None, fsync_segundos: float = None):
+        config = CONFIG_ALERTAS['registro']
+        self.ruta = ruta or ruta_registro()
+        self.fsync_eventos = fsync_eventos or config['fsync_eventos']
+        self.fsync_segundos = config['fsync_segundos'] if fsync_segundos is None else fsync_segundos
+        self._lock = threading.Lock()
+        self._desplazamientos = array('q')
+        self._alerta_ids = array('q')
+        self._criptos = []
+        self._resumen = {}  # alerta_id -> {'ejecuciones', 'ultima_ejecucion'}
+        self._pendientes = 0
+        self._ultimo_fsync = time.monotonic()
+        os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+        self._indexar()
+        self._archivo = open(self.ruta, 'ab')
+
+    def _indexar(self):
+        """Recorre el registro existente; una última línea incompleta (corte a mitad) se descarta"""
+        if not os.path.exists(self.ruta):
+            return
+        valido = 0
+        with open(self.ruta, 'rb') as f:
+            for linea in iter(f.readline, b''):
+                if not linea.endswith(b'\n'):
+                    break
+                try:
+                    evento = json.loads(linea)
+                except ValueError:
+                    break
+                self._anotar(valido, evento)
+                valido += len(linea)
+        if valido < os.path.getsize(self.ruta):
+            print(f"⚠️ Registro de alertas truncado a {len(self._desplazamientos)} eventos completos")
+            with open(self.ruta, 'r+b') as f:
+                f.truncate(valido)
+
+    def _anotar(self, desplazamiento: int, evento: dict):
+        self._desplazamientos.append(desplazamiento)
+        self._alerta_ids.append(int(evento.get('alerta_id') or 0))
+        self._criptos.append(evento.get('cripto_afectada'))
+        resumen = self._resumen.setdefault(evento.get('alerta_id'), {'ejecuciones': 0, 'ultima_ejecucion': None})
+        resumen['ejecuciones'] += 1
+        resumen['ultima_ejecucion'] = evento.get('fecha')
+
+    def agregar(self, eventos: list) -> list:
+        """Añade eventos (les asigna 'id') y los devuelve; fsync cuando el lote pendiente lo pide"""
+        if not eventos:
+            return []
+        with self._lock:
+            for evento in eventos:
+                evento['id'] = len(self._desplazamientos) + 1
+                linea = (json.dumps(evento, default=str) + '\n').encode('utf-8')
+                self._anotar(self._archivo.tell(), evento)
+                self._archivo.write(linea)
+            self._archivo.flush()
+            self._pendientes += len(eventos)
+            if (self._pendientes >= self.fsync_eventos or
+                    time.monotonic() - self._ultimo_fsync >= self.fsync_segundos):
+                self._sincronizar()
+        return eventos
+
+    def _sincronizar(self):
+        os.fsync(self._archivo.fileno())
+        self._pendientes = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def consultar(self, antes_id: int = None, limite: int = None, cripto: str = None,
+                  alerta_id: int = None) -> dict:
+        """
+        Eventos del más reciente al más antiguo con id < `antes_id` (todos si no se indica).
+        'siguiente' es el `antes_id` de la página siguiente, o None si no hay más.
+        """
+        maximo = CONFIG_ALERTAS['registro']['limite_consulta']
+        limite = max(1, min(int(limite or maximo), maximo))
+        with self._lock:
+            total = len(self._desplazamientos)
+            posicion = total if antes_id is None else max(0, min(int(antes_id) - 1, total))
+            elegidos = []
+            while posicion > 0 and len(elegidos) < limite:
+                posicion -= 1
+                if cripto is not None and self._criptos[posicion] != cripto:
+                    continue
+                if alerta_id is not None and self._alerta_ids[posicion] != alerta_id:
+                    continue
+                elegidos.append(self._desplazamientos[posicion])
+            hay_mas = posicion > 0
+
+        eventos = []
+        with open(self.ruta, 'rb') as f:
+            for desplazamiento in elegidos:
+                f.seek(desplazamiento)
+                eventos.append(json.loads(f.readline()))
+        return {
+            'eventos': eventos,
+            'total': total,
+            'siguiente': eventos[-1]['id'] if eventos and hay_mas else None
+        }
+
+    def resumen(self) -> dict:
+        """alerta_id -> {'ejecuciones', 'ultima_ejecucion'}"""
+        with self._lock:
+            return {id_alerta: dict(datos) for id_alerta, datos in self._resumen.items()}
+
+    def cerrar(self):
+        with self._lock:
+            if not self._archivo.closed:
+                self._archivo.flush()
+                self._sincronizar()
+                self._archivo.close()
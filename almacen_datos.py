@@ -0,0 +1,236 @@
+# almacen_datos.py - Almacén binario columnar para series OHLCV normalizadas
+#
+# Cada serie se guarda en <carpeta>/.almacen/<nombre>/ como:
+#   fechas_<gen>.npy   int64 (nanosegundos desde epoch), ordenado
+#   valores_<gen>.npy  float64 con forma (columnas, filas): cada columna es contigua
+#   meta.json          columnas, filas, generación vigente y firma del CSV de origen
+# Los .npy se abren con memmap, así que leer una serie no copia datos a memoria.
+import os
+import json
+import time
+import glob
+
+import numpy as np
+import pandas as pd
+
+from global_data import CONFIG_ALMACEN
+
+VERSION_FORMATO = 1
+
+
+def ruta_almacen(nombre: str, carpeta_data: str = "datos") -> str:
+    return os.path.join(carpeta_data, CONFIG_ALMACEN['subcarpeta'], nombre)
+
+
+def _firma(ruta: str):
+    try:
+        st = os.stat(ruta)
+        return {'mtime_ns': st.st_mtime_ns, 'tamano': st.st_size}
+    except OSError:
+        return None
+
+
+def _describir_origen(ruta_origen: str, firma_origen: tuple = None):
+    if not ruta_origen:
+        return None
+    if firma_origen is not None:
+        return {'ruta': ruta_origen, 'mtime_ns': firma_origen[0], 'tamano': firma_origen[1]}
+    return dict(ruta=ruta_origen, **(_firma(ruta_origen) or {}))
+
+
+def leer_metadatos(nombre: str, carpeta_data: str = "datos") -> dict:
+    ruta_meta = os.path.join(ruta_almacen(nombre, carpeta_data), 'meta.json')
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta if meta.get('version') == VERSION_FORMATO else None
+    except (OSError, ValueError):
+        return None
+
+
+def serie_vigente(meta: dict, ruta_origen: str = None) -> bool:
+    """True si el almacén corresponde a la versión actual del CSV de origen"""
+    if meta is None:
+        return False
+    if ruta_origen is None:
+        return True
+    origen = meta.get('origen') or {}
+    firma = _firma(ruta_origen)
+    return firma is not None and firma.get('mtime_ns') == origen.get('mtime_ns') \
+        and firma.get('tamano') == origen.get('tamano')
+
+
+def guardar_serie(df: pd.DataFrame, nombre: str, carpeta_data: str = "datos",
+                  ruta_origen: str = None, firma_origen: tuple = None) -> bool:
+    """
+    Escribe la serie en formato columnar. Solo se guardan frames totalmente numéricos.
+    `firma_origen` (mtime_ns, tamaño) debe tomarse antes de leer el CSV si este puede
+    cambiar mientras se parsea; por defecto se usa la firma actual de `ruta_origen`.
+    """
+    if not CONFIG_ALMACEN['habilitado'] or df is None or df.empty:
+        return False
+    if not isinstance(df.index, pd.DatetimeIndex):
+        return False
+
+    numericas = df.select_dtypes(include=[np.number, 'bool'])
+    if numericas.shape[1] != df.shape[1]:
+        return False
+
+    try:
+        destino = ruta_almacen(nombre, carpeta_data)
+        os.makedirs(destino, exist_ok=True)
+
+        df_ordenado = numericas.sort_index()
+        fechas = indices_ns(df_ordenado.index)
+        valores = np.ascontiguousarray(df_ordenado.to_numpy(dtype=np.float64).T)
+
+        # Cada escritura crea una generación nueva; meta.json apunta a la vigente.
+        # Así un lector con memmap abierto nunca ve un archivo a medio escribir.
+        generacion = time.time_ns()
+        np.save(os.path.join(destino, f'fechas_{generacion}.npy'), fechas)
+        np.save(os.path.join(destino, f'valores_{generacion}.npy'), valores)
+
+        meta = {
+            'version': VERSION_FORMATO,
+            'generacion': generacion,
+            'columnas': [str(c) for c in df_ordenado.columns],
+            'filas': int(len(fechas)),
+            'desde': str(pd.Timestamp(int(fechas[0]))) if len(fechas) else None,
+            'hasta': str(pd.Timestamp(int(fechas[-1]))) if len(fechas) else None,
+            'origen': _describir_origen(ruta_origen, firma_origen),
+            'creado': time.time()
+        }
+        ruta_meta = os.path.join(destino, 'meta.json')
+        temporal = ruta_meta + f'.{os.getpid()}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temporal, ruta_meta)
+
+        _limpiar_generaciones(destino, generacion)
+        return True
+    except Exception as e:
+        print(f"⚠️ Error guardando almacén de {nombre}: {e}")
+        return False
+
+
+def abrir_arrays(nombre: str, carpeta_data: str = "datos", ruta_origen: str = None):
+    """
+    Devuelve (meta, fechas, valores) como memmaps, o None si no hay serie vigente.
+    `valores` se abre copy-on-write: modificarlo nunca toca el archivo.
+    """
+    meta = leer_metadatos(nombre, carpeta_data)
+    if not serie_vigente(meta, ruta_origen):
+        return None
+
+    destino = ruta_almacen(nombre, carpeta_data)
+    generacion = meta['generacion']
+    try:
+        fechas = np.load(os.path.join(destino, f'fechas_{generacion}.npy'), mmap_mode='r')
+        valores = np.load(os.path.join(destino, f'valores_{generacion}.npy'), mmap_mode='c')
+    except (OSError, ValueError):
+        return None
+
+    if len(fechas) != meta['filas'] or valores.shape != (len(meta['columnas']), meta['filas']):
+        return None
+    return meta, fechas, valores
+
+
+def a_nanosegundos(fecha) -> int:
+    """Convierte str/datetime/Timestamp a nanosegundos desde epoch (sin zona horaria)"""
+    ts = pd.Timestamp(fecha)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(None)
+    return int(ts.value)
+
+
+def indices_ns(indice: pd.DatetimeIndex) -> np.ndarray:
+    """Marcas int64 (ns) de un DatetimeIndex; con zona horaria se pasa a UTC, como a_nanosegundos"""
+    if indice.tz is not None:
+        indice = indice.tz_convert(None)
+    return indice.values.astype('datetime64[ns]').view(np.int64)
+
+
+def indices_rango(fechas: np.ndarray, desde=None, hasta=None, ultimos_n: int = None) -> tuple:
+    """
+    Búsqueda binaria sobre el índice ordenado de timestamps (int64 ns).
+    Devuelve (inicio, fin) para el intervalo cerrado [desde, hasta], recortado a los
+    últimos `ultimos_n` registros si se indica.
+    """
+    inicio = int(np.searchsorted(fechas, a_nanosegundos(desde), side='left')) if desde is not None else 0
+    fin = int(np.searchsorted(fechas, a_nanosegundos(hasta), side='right')) if hasta is not None else len(fechas)
+    if ultimos_n is not None:
+        inicio = max(inicio, fin - int(ultimos_n))
+    return inicio, max(inicio, fin)
+
+
+def leer_rango(nombre: str, desde=None, hasta=None, columnas: list = None,
+               carpeta_data: str = "datos", ultimos_n: int = None,
+               ruta_origen: str = None) -> pd.DataFrame:
+    """
+    Lee solo el tramo [desde, hasta] (y/o los últimos `ultimos_n` registros) de la serie.
+    Las columnas y filas no pedidas nunca se leen del disco: el resultado es una vista
+    del memmap. Devuelve None si no hay serie vigente en el almacén.
+    """
+    if not CONFIG_ALMACEN['habilitado']:
+        return None
+
+    abiertos = abrir_arrays(nombre, carpeta_data, ruta_origen)
+    if abiertos is None:
+        return None
+    meta, fechas, valores = abiertos
+
+    nombres = meta['columnas']
+    if columnas is not None:
+        posiciones = [nombres.index(c) for c in columnas if c in nombres]
+        nombres = [nombres[p] for p in posiciones]
+        valores = valores[posiciones]
+
+    inicio, fin = indices_rango(fechas, desde, hasta, ultimos_n)
+    indice = pd.DatetimeIndex(fechas[inicio:fin].view('datetime64[ns]'), name='Date')
+    # valores.T es una vista del memmap: pandas la usa como bloque sin copiar
+    return pd.DataFrame(valores[:, inicio:fin].T, index=indice, columns=nombres, copy=False)
+
+
+def cargar_serie(nombre: str, carpeta_data: str = "datos", ruta_origen: str = None,
+                 columnas: list = None) -> pd.DataFrame:
+    """
+    Carga la serie completa desde el almacén sin re-parsear el CSV.
+    Devuelve None si no existe o si el CSV de origen cambió desde que se guardó.
+    """
+    return leer_rango(nombre, columnas=columnas, carpeta_data=carpeta_data, ruta_origen=ruta_origen)
+
+
+def recortar_rango(df: pd.DataFrame, desde=None, hasta=None, ultimos_n: int = None) -> pd.DataFrame:
+    """Mismo recorte que leer_rango para un DataFrame ya cargado en memoria"""
+    if desde is None and hasta is None and ultimos_n is None:
+        return df
+    if not isinstance(df.index, pd.DatetimeIndex) or not df.index.is_monotonic_increasing:
+        return df.tail(int(ultimos_n)) if ultimos_n is not None else df
+    fechas = indices_ns(df.index)
+    inicio, fin = indices_rango(fechas, desde, hasta, ultimos_n)
+    return df.iloc[inicio:fin]
+
+
+def eliminar_serie(nombre: str, carpeta_data: str = "datos"):
+    destino = ruta_almacen(nombre, carpeta_data)
+    for archivo in glob.glob(os.path.join(destino, '*')):
+        try:
+            os.remove(archivo)
+        except OSError:
+            pass
+    try:
+        os.rmdir(destino)
+    except OSError:
+        pass
+
+
+def _limpiar_generaciones(destino: str, generacion_vigente: int):
+    """Borra generaciones antiguas; en Windows pueden seguir abiertas y se reintenta luego"""
+    for archivo in glob.glob(os.path.join(destino, '*_*.npy')):
+        base = os.path.basename(archivo)
+        if base.endswith(f'_{generacion_vigente}.npy'):
+            continue
+        try:
+            os.remove(archivo)
+        except OSError:
+            pass
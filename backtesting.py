@@ -0,0 +1,426 @@
+# backtesting.py - Motor vectorizado de backtesting sobre arrays NumPy
+import os
+import math
+import time
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from global_data import CONFIG_ANALISIS, CONFIG_BACKTESTING
+from indicadores import MotorIndicadores
+
+ESTRATEGIAS_SOPORTADAS = ("rsi_macd", "bollinger", "golden_cross")
+
+# Parámetros que admite cada estrategia en la optimización.
+# Los "de indicador" cambian los arrays calculados; el resto solo los umbrales.
+PARAMETROS_ESTRATEGIA = {
+    'rsi_macd': {
+        'indicador': ('rsi_periodo', 'macd_fast', 'macd_slow', 'macd_signal'),
+        'umbral': ('rsi_compra', 'rsi_venta')
+    },
+    'bollinger': {
+        'indicador': ('bollinger_periodo', 'bollinger_std'),
+        'umbral': ()
+    },
+    'golden_cross': {
+        'indicador': ('sma_rapida', 'sma_lenta'),
+        'umbral': ()
+    }
+}
+
+# Valores usados cuando un parámetro no aparece en la grilla
+PARAMETROS_POR_DEFECTO = {
+    'rsi_periodo': CONFIG_ANALISIS['rsi_periodo'],
+    'rsi_compra': 30,
+    'rsi_venta': 70,
+    'macd_fast': CONFIG_ANALISIS['macd_fast'],
+    'macd_slow': CONFIG_ANALISIS['macd_slow'],
+    'macd_signal': CONFIG_ANALISIS['macd_signal'],
+    'bollinger_periodo': CONFIG_ANALISIS['bollinger_periodo'],
+    'bollinger_std': CONFIG_ANALISIS['bollinger_std'],
+    'sma_rapida': 50,
+    'sma_lenta': 200
+}
+PARAMETROS_REALES = ('rsi_compra', 'rsi_venta', 'bollinger_std')
+
+
+def senales_estrategia(motor: MotorIndicadores, estrategia: str, parametros: dict = None) -> tuple:
+    """
+    Devuelve (compra, venta) como arrays booleanos para cada vela.
+    La primera vela nunca genera señal (el bucle original empezaba en i=1).
+    Las señales de compra y venta de cada estrategia son mutuamente excluyentes.
+    """
+    parametros = parametros or {}
+    precios = motor.close
+
+    if estrategia == "rsi_macd":
+        rsi = motor.rsi(parametros.get('rsi_periodo'))
+        macd = motor.macd(parametros.get('macd_fast'), parametros.get('macd_slow'), parametros.get('macd_signal'))
+        compra = (rsi < parametros.get('rsi_compra', PARAMETROS_POR_DEFECTO['rsi_compra'])) & (macd['macd'] > macd['macd_signal'])
+        venta = (rsi > parametros.get('rsi_venta', PARAMETROS_POR_DEFECTO['rsi_venta'])) & (macd['macd'] < macd['macd_signal'])
+    elif estrategia == "bollinger":
+        bandas = motor.bollinger(parametros.get('bollinger_periodo'), parametros.get('bollinger_std'))
+        compra = precios < bandas['bb_lower']
+        venta = precios > bandas['bb_upper']
+    elif estrategia == "golden_cross":
+        rapida = motor.sma(parametros.get('sma_rapida', PARAMETROS_POR_DEFECTO['sma_rapida']))
+        lenta = motor.sma(parametros.get('sma_lenta', PARAMETROS_POR_DEFECTO['sma_lenta']))
+        rapida_prev = np.roll(rapida, 1)
+        lenta_prev = np.roll(lenta, 1)
+        compra = (rapida > lenta) & (rapida_prev <= lenta_prev)
+        venta = (rapida < lenta) & (rapida_prev >= lenta_prev)
+    else:
+        raise ValueError("Estrategia no soportada")
+
+    compra[0] = False
+    venta[0] = False
+    return compra, venta
+
+
+def resolver_posicion(compra: np.ndarray, venta: np.ndarray) -> np.ndarray:
+    """
+    Posición (0/1) al cierre de cada vela sin recorrer las velas una a una:
+    la posición es 1 si el último evento (compra o venta) hasta esa vela fue una compra.
+    Comprar estando dentro o vender estando fuera no cambia nada, igual que en el bucle.
+    """
+    eventos = np.where(compra, 1, np.where(venta, -1, 0)).astype(np.int8)
+    indices = np.where(eventos != 0, np.arange(len(eventos)), -1)
+    ultimo = np.maximum.accumulate(indices) if len(indices) else indices
+    return np.where(ultimo >= 0, eventos[np.maximum(ultimo, 0)] == 1, False).astype(np.int8)
+
+
+def costes_por_defecto() -> tuple:
+    """(comisión, slippage) por operación según CONFIG_BACKTESTING; las señales se ejecutan a mercado (taker)"""
+    return CONFIG_BACKTESTING['comisiones']['taker'], CONFIG_BACKTESTING['slippage']
+
+
+def resolver_costes(comision: float = None, slippage: float = None) -> tuple:
+    """(comisión, slippage) con los de CONFIG_BACKTESTING si faltan; ValueError fuera de [0, 1)"""
+    comision_config, slippage_config = costes_por_defecto()
+    costes = (comision_config if comision is None else comision, slippage_config if slippage is None else slippage)
+    for nombre, valor in zip(('comision', 'slippage'), costes):
+        if not 0 <= valor < 1:
+            raise ValueError(f"{nombre} debe estar en [0, 1): {valor}")
+    return costes
+
+
+def simular(precios: np.ndarray, compra: np.ndarray, venta: np.ndarray, capital_inicial: float,
+            comision: float = 0.0, slippage: float = 0.0) -> dict:
+    """
+    Resuelve la máquina de estados y devuelve arrays de operaciones y la curva de capital.
+    La posición abierta al final se cierra en la última vela.
+
+    Cada ejecución paga `comision` sobre el nominal y se llena `slippage` peor que el cierre.
+    Ambos costes se llevan al precio efectivo de entrada/salida, así que con costes cero
+    las ganancias son idénticas a las del cálculo sin costes.
+    """
+    n = len(precios)
+    posicion = resolver_posicion(compra, venta)
+    cambios = np.diff(posicion, prepend=np.int8(0))
+    entradas = np.flatnonzero(cambios == 1)
+    salidas = np.flatnonzero(cambios == -1)
+    cierre_forzado = len(salidas) < len(entradas)
+    if cierre_forzado:
+        salidas = np.append(salidas, n - 1)
+
+    precio_entrada = precios[entradas]
+    precio_salida = precios[salidas]
+    # Coste total por unidad al entrar e ingreso neto por unidad al salir
+    entrada_efectiva = precio_entrada * (1 + slippage) / (1 - comision)
+    salida_efectiva = precio_salida * (1 - slippage) * (1 - comision)
+    ganancias = (salida_efectiva - entrada_efectiva) / entrada_efectiva
+
+    # Mismo orden de multiplicación que el bucle: capital *= (1 + ganancia)
+    capital_final = math.prod([capital_inicial, *(1 + ganancias)])
+
+    # Curva de capital valorada a mercado (al cierre) en cada vela
+    factor = np.ones(n)
+    factor[salidas] = 1 + ganancias
+    if cierre_forzado:
+        factor[-1] = 1.0  # la vela final se valora aparte, no se duplica el cierre
+    realizado = capital_inicial * np.cumprod(factor)
+    capital_entrada = np.full(n, np.nan)
+    capital_entrada[entradas] = realizado[entradas]
+    capital_entrada = pd.Series(capital_entrada).ffill().to_numpy()
+    coste_unidad = np.full(n, np.nan)
+    coste_unidad[entradas] = entrada_efectiva
+    coste_unidad = pd.Series(coste_unidad).ffill().to_numpy()
+    equity = np.where(posicion == 1, capital_entrada * precios / coste_unidad, realizado)
+    if cierre_forzado:
+        equity[-1] = capital_final
+
+    # Nominal negociado y comisiones pagadas en cada ejecución
+    # (la comisión de entrada se descuenta del capital comprometido: nominal = capital * (1 - comisión))
+    capital_en_entrada = realizado[entradas]
+    nominal_entradas = capital_en_entrada * (1 - comision)
+    nominal_salidas = capital_en_entrada * salida_efectiva / entrada_efectiva / (1 - comision)
+
+    return {
+        'posicion': posicion,
+        'entradas': entradas,
+        'salidas': salidas,
+        'precio_entrada': precio_entrada,
+        'precio_salida': precio_salida,
+        'ganancias': ganancias,
+        'capital_final': capital_final,
+        'equity': equity,
+        'nominal_negociado': float(nominal_entradas.sum() + nominal_salidas.sum()),
+        'comisiones_pagadas': float((capital_en_entrada.sum() + nominal_salidas.sum()) * comision)
+    }
+
+
+def periodos_por_anio(fechas) -> float:
+    """Velas por año según el espaciado mediano del índice (mercado 24/7); 365 si no es temporal"""
+    if not isinstance(fechas, pd.DatetimeIndex) or len(fechas) < 2:
+        return 365.0
+    pasos = np.diff(fechas.values.astype('datetime64[ns]').view(np.int64))
+    paso = float(np.median(pasos))
+    return 365 * 24 * 3600 * 1e9 / paso if paso > 0 else 365.0
+
+
+def metricas_equity(equity: np.ndarray, posicion: np.ndarray, nominal_negociado: float,
+                    anualizacion: float = 365.0) -> dict:
+    """Drawdown, Sharpe, Sortino, exposición y rotación de la estrategia a partir de su curva de capital"""
+    maximos = np.maximum.accumulate(equity)
+    drawdown = float(np.max((maximos - equity) / maximos) * 100) if len(equity) else 0.0
+
+    retornos = equity[1:] / equity[:-1] - 1 if len(equity) > 1 else np.empty(0)
+    media = float(retornos.mean()) if len(retornos) else 0.0
+    desviacion = float(retornos.std(ddof=1)) if len(retornos) > 1 else 0.0
+    desviacion_bajista = float(np.sqrt(np.mean(np.minimum(retornos, 0.0) ** 2))) if len(retornos) else 0.0
+    raiz = math.sqrt(anualizacion)
+
+    return {
+        'max_drawdown': drawdown,
+        'sharpe': media / desviacion * raiz if desviacion > 0 else 0.0,
+        'sortino': media / desviacion_bajista * raiz if desviacion_bajista > 0 else 0.0,
+        'exposicion': float(posicion.mean() * 100) if len(posicion) else 0.0,
+        'rotacion': nominal_negociado / float(equity.mean()) if len(equity) and equity.mean() > 0 else 0.0
+    }
+
+
+def max_drawdown_precio(precios: np.ndarray) -> float:
+    """Máxima caída (%) del precio desde su máximo previo"""
+    maximos = np.maximum.accumulate(precios)
+    return float(np.nanmax((maximos - precios) / maximos) * 100)
+
+
+def evaluar(precios: np.ndarray, motor: MotorIndicadores, estrategia: str,
+            parametros: dict = None, capital_inicial: float = 10000,
+            comision: float = 0.0, slippage: float = 0.0, anualizacion: float = 365.0) -> dict:
+    """Simula una configuración y devuelve solo las métricas resumidas"""
+    compra, venta = senales_estrategia(motor, estrategia, parametros)
+    resultado = simular(precios, compra, venta, capital_inicial, comision, slippage)
+    ganancias = resultado['ganancias']
+    capital = resultado['capital_final']
+    return {
+        'capital_final': capital,
+        'retorno_total': (capital - capital_inicial) / capital_inicial * 100,
+        **metricas_equity(resultado['equity'], resultado['posicion'], resultado['nominal_negociado'], anualizacion),
+        'cantidad_operaciones': 2 * len(ganancias),
+        'ganadoras': int((ganancias > 0).sum()),
+        'perdedoras': int((ganancias < 0).sum())
+    }
+
+
+def curva_compacta(fechas, resultado: dict) -> dict:
+    """Curva de capital como arrays paralelos (timestamps en ms) en vez de una lista de dicts"""
+    if isinstance(fechas, pd.DatetimeIndex):
+        indice = fechas.tz_convert(None) if fechas.tz is not None else fechas
+        marcas = (indice.values.astype('datetime64[ns]').view(np.int64) // 1_000_000).tolist()
+    else:
+        marcas = list(range(len(resultado['equity'])))
+    return {
+        'timestamps': marcas,
+        'equity': resultado['equity'].tolist(),
+        'posicion': resultado['posicion'].tolist()
+    }
+
+
+def ejecutar_backtesting(df: pd.DataFrame, capital_inicial: float = 10000, estrategia: str = "rsi_macd",
+                         parametros: dict = None, motor: MotorIndicadores = None,
+                         comision: float = None, slippage: float = None, incluir_curva: bool = True) -> dict:
+    """
+    Backtesting vectorizado con la misma salida que backtesting_estrategia.
+    `motor` permite reutilizar indicadores ya calculados entre varias ejecuciones.
+    Sin `comision`/`slippage` se usan los de CONFIG_BACKTESTING.
+    """
+    if estrategia not in ESTRATEGIAS_SOPORTADAS:
+        return {"error": "Estrategia no soportada"}
+
+    comision, slippage = resolver_costes(comision, slippage)
+
+    precios = df['Close'].to_numpy(dtype=np.float64)
+    motor = motor or MotorIndicadores(precios)
+    compra, venta = senales_estrategia(motor, estrategia, parametros)
+    resultado = simular(precios, compra, venta, capital_inicial, comision, slippage)
+
+    fechas = df.index
+    operaciones = []
+    for entrada, salida, p_entrada, p_salida, ganancia in zip(
+            resultado['entradas'], resultado['salidas'], resultado['precio_entrada'],
+            resultado['precio_salida'], resultado['ganancias']):
+        operaciones.append({"tipo": "COMPRA", "fecha": fechas[entrada], "precio": p_entrada})
+        operaciones.append({"tipo": "VENTA", "fecha": fechas[salida], "precio": p_salida, "ganancia": ganancia})
+
+    capital = resultado['capital_final']
+    ganancias = resultado['ganancias']
+    metricas = metricas_equity(resultado['equity'], resultado['posicion'],
+                               resultado['nominal_negociado'], periodos_por_anio(fechas))
+    salida = {
+        "estrategia": estrategia,
+        "capital_inicial": capital_inicial,
+        "capital_final": capital,
+        "retorno_total": (capital - capital_inicial) / capital_inicial * 100,
+        "buy_and_hold": (precios[-1] - precios[0]) / precios[0] * 100,
+        "max_drawdown": metricas['max_drawdown'],
+        "max_drawdown_buy_hold": max_drawdown_precio(precios),
+        "sharpe": metricas['sharpe'],
+        "sortino": metricas['sortino'],
+        "exposicion": metricas['exposicion'],
+        "rotacion": metricas['rotacion'],
+        "comision": comision,
+        "slippage": slippage,
+        "comisiones_pagadas": resultado['comisiones_pagadas'],
+        "operaciones": operaciones,
+        "cantidad_operaciones": len(operaciones),
+        "ganadoras": int((ganancias > 0).sum()),
+        "perdedoras": int((ganancias < 0).sum())
+    }
+    if incluir_curva:
+        salida["curva_equity"] = curva_compacta(fechas, resultado)
+    return salida
+
+
+# ==================== OPTIMIZACIÓN DE PARÁMETROS ====================
+
+# Estado de cada proceso del pool: precios y motor de indicadores compartidos entre lotes
+_PRECIOS_TRABAJADOR = None
+_MOTOR_TRABAJADOR = None
+
+
+def generar_combinaciones(estrategia: str, grilla: dict) -> list:
+    """Producto cartesiano de la grilla, descartando combinaciones incoherentes"""
+    if estrategia not in PARAMETROS_ESTRATEGIA:
+        raise ValueError("Estrategia no soportada")
+    admitidos = PARAMETROS_ESTRATEGIA[estrategia]['indicador'] + PARAMETROS_ESTRATEGIA[estrategia]['umbral']
+    desconocidos = [p for p in grilla if p not in admitidos]
+    if desconocidos:
+        raise ValueError(f"Parámetros no válidos para {estrategia}: {', '.join(desconocidos)}")
+
+    nombres = list(grilla)
+    valores = [v if isinstance(v, (list, tuple)) else [v] for v in grilla.values()]
+    combinaciones = []
+    for combinacion in itertools.product(*valores):
+        parametros = {
+            nombre: float(valor) if nombre in PARAMETROS_REALES else int(valor)
+            for nombre, valor in zip(nombres, combinacion)
+        }
+        efectivos = {**PARAMETROS_POR_DEFECTO, **parametros}
+        if efectivos['macd_fast'] >= efectivos['macd_slow'] or \
+                efectivos['sma_rapida'] >= efectivos['sma_lenta'] or \
+                efectivos['rsi_compra'] >= efectivos['rsi_venta']:
+            continue
+        if min(v for k, v in efectivos.items() if k not in PARAMETROS_REALES) < 1 or efectivos['bollinger_std'] <= 0:
+            continue
+        combinaciones.append(parametros)
+    return combinaciones
+
+
+def _clave_indicador(estrategia: str, parametros: dict) -> tuple:
+    return tuple(str(parametros.get(p)) for p in PARAMETROS_ESTRATEGIA[estrategia]['indicador'])
+
+
+def _iniciar_trabajador(precios: np.ndarray):
+    """Inicializador del ProcessPoolExecutor: solo los procesos del pool usan este estado global"""
+    global _PRECIOS_TRABAJADOR, _MOTOR_TRABAJADOR
+    _PRECIOS_TRABAJADOR = precios
+    _MOTOR_TRABAJADOR = MotorIndicadores(precios)
+
+
+def _evaluar_lote(precios: np.ndarray, motor: MotorIndicadores, estrategia: str, combinaciones: list,
+                  capital_inicial: float, comision: float, slippage: float, anualizacion: float) -> list:
+    """
+    Evalúa un lote ordenado por parámetros de indicador: las combinaciones que solo
+    cambian umbrales reutilizan los mismos arrays del motor.
+    """
+    resultados = []
+    clave_anterior = None
+    for parametros in combinaciones:
+        clave = _clave_indicador(estrategia, parametros)
+        if clave != clave_anterior:
+            motor.liberar_derivados()
+            clave_anterior = clave
+        metricas = evaluar(precios, motor, estrategia, parametros,
+                           capital_inicial, comision, slippage, anualizacion)
+        resultados.append(dict(parametros=parametros, **metricas))
+    return resultados
+
+
+def _evaluar_lote_trabajador(estrategia: str, combinaciones: list, *argumentos) -> list:
+    """_evaluar_lote con los precios y el motor del proceso trabajador"""
+    return _evaluar_lote(_PRECIOS_TRABAJADOR, _MOTOR_TRABAJADOR, estrategia, combinaciones, *argumentos)
+
+
+def optimizar_backtesting(df: pd.DataFrame, estrategia: str, grilla: dict, capital_inicial: float = 10000,
+                          procesos: int = None, ordenar_por: str = 'retorno_total', limite: int = None,
+                          comision: float = None, slippage: float = None) -> dict:
+    """
+    Evalúa todas las combinaciones de `grilla` (parámetro -> lista de valores) repartidas
+    en un ProcessPoolExecutor y devuelve la tabla ordenada de configuraciones.
+    """
+    config = CONFIG_BACKTESTING['optimizacion']
+    if len(df) < 30:
+        return {"error": "Datos insuficientes para backtesting (mínimo 30 días)"}
+    if ordenar_por not in ('retorno_total', 'max_drawdown', 'sharpe', 'sortino', 'cantidad_operaciones', 'ganadoras'):
+        return {"error": f"No se puede ordenar por {ordenar_por}"}
+    try:
+        combinaciones = generar_combinaciones(estrategia, grilla or {})
+    except (TypeError, ValueError) as e:
+        return {"error": str(e)}
+    if not combinaciones:
+        return {"error": "La grilla no produce combinaciones válidas"}
+    if len(combinaciones) > config['maximo_combinaciones']:
+        return {"error": f"Demasiadas combinaciones ({len(combinaciones)}); máximo {config['maximo_combinaciones']}"}
+
+    comision, slippage = resolver_costes(comision, slippage)
+    argumentos = (capital_inicial, comision, slippage, periodos_por_anio(df.index))
+
+    inicio = time.perf_counter()
+    precios = df['Close'].to_numpy(dtype=np.float64)
+    combinaciones.sort(key=lambda p: _clave_indicador(estrategia, p))
+    # El cliente puede pedir menos procesos, nunca más que la configuración o los núcleos
+    maximo_procesos = config['procesos'] or os.cpu_count() or 1
+    procesos = max(1, min(int(procesos or maximo_procesos), maximo_procesos, len(combinaciones)))
+
+    if procesos == 1 or len(combinaciones) < config['minimo_para_paralelizar']:
+        # En el propio proceso (hilo de Flask): precios y motor locales, nunca los globales
+        procesos = 1
+        resultados = _evaluar_lote(precios, MotorIndicadores(precios), estrategia, combinaciones, *argumentos)
+    else:
+        # Varios lotes por proceso para repartir bien la carga; cada lote es contiguo
+        # en el orden por indicador para aprovechar los arrays ya calculados
+        lotes = [list(l) for l in np.array_split(np.array(combinaciones, dtype=object), procesos * 4) if len(l)]
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                                 initargs=(precios,)) as ejecutor:
+            futuros = [ejecutor.submit(_evaluar_lote_trabajador, estrategia, lote, *argumentos) for lote in lotes]
+            resultados = [fila for futuro in futuros for fila in futuro.result()]
+
+    descendente = ordenar_por != 'max_drawdown'
+    resultados.sort(key=lambda r: r[ordenar_por], reverse=descendente)
+    for posicion, fila in enumerate(resultados, 1):
+        fila['ranking'] = posicion
+
+    return {
+        'estrategia': estrategia,
+        'capital_inicial': capital_inicial,
+        'combinaciones': len(combinaciones),
+        'procesos': procesos,
+        'ordenado_por': ordenar_por,
+        'comision': comision,
+        'slippage': slippage,
+        'tiempo_segundos': round(time.perf_counter() - inicio, 3),
+        'resultados': resultados[:limite] if limite else resultados
+    }
@@ -0,0 +1,130 @@
+# benchmark_alertas.py - Bucle alerta x cripto vs motor de alertas indexado
+#
+# Genera alertas aleatorias de todos los tipos, simula ticks en los que cambian las métricas
+# de la mitad de las criptos y compara el bucle anterior (todas las alertas contra todas las criptos en
+# cada tick) con MotorAlertas. Comprueba en cada tick que las alertas activas (disparadas sin
+# rearmar, sin histéresis) coinciden.
+#
+# Uso: python benchmarks/benchmark_alertas.py [alertas] [ticks]
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from alertas import MotorAlertas, RegistroEventos
+
+CRIPTOS = ['BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'ADA', 'DOGE', 'DOT']
+PRECIOS = dict(zip(CRIPTOS, [60000, 3000, 500, 150, 0.6, 0.5, 0.15, 7]))
+
+
+def verificar_alerta_individual(alerta, cripto, datos_actuales, analisis_actuales):
+    """Evaluación anterior: re-despacho por tipo en cada comprobación"""
+    tipo = alerta['tipo']
+    if tipo == 'pump':
+        return analisis_actuales.get(cripto, {}).get('cambio_esperado', 0) > 10
+    elif tipo == 'dump':
+        return analisis_actuales.get(cripto, {}).get('cambio_esperado', 0) < -10
+    elif tipo == 'volumen':
+        return analisis_actuales.get(cripto, {}).get('indicadores', {}).get('volatilidad', 0) > 10
+    elif tipo == 'rsi':
+        rsi = analisis_actuales.get(cripto, {}).get('rsi', 50)
+        return rsi > 80 or rsi < 20
+    elif tipo == 'precio':
+        precio_actual = datos_actuales.get(cripto, {}).get('precio', 0)
+        if alerta.get('condicion', 'above') == 'above':
+            return precio_actual >= float(alerta.get('valor', 0))
+        return precio_actual <= float(alerta.get('valor', 0))
+    elif tipo == 'cambio':
+        cambio = analisis_actuales.get(cripto, {}).get('cambio_esperado', 0)
+        if alerta.get('condicion', 'increase') == 'increase':
+            return cambio >= float(alerta.get('valor', 0))
+        return cambio <= -float(alerta.get('valor', 0))
+    return False
+
+
+def bucle_anterior(alertas, datos_actuales, analisis_actuales) -> set:
+    activas = set()
+    for alerta in alertas:
+        criptos = datos_actuales.keys() if alerta['cripto'] == 'all' else [alerta['cripto']]
+        for cripto in criptos:
+            if cripto in datos_actuales and verificar_alerta_individual(alerta, cripto, datos_actuales, analisis_actuales):
+                activas.add((alerta['id'], cripto))
+    return activas
+
+
+def generar_alertas(n: int, rng) -> list:
+    alertas = []
+    for i in range(1, n + 1):
+        cripto = rng.choice(CRIPTOS + ['all'])
+        tipo = rng.choice(['precio'] * 6 + ['cambio'] * 2 + ['pump', 'dump', 'volumen', 'rsi'])
+        # Sin histéresis una alerta está disparada exactamente mientras se cumple: comparable con el bucle
+        alerta = {'id': i, 'tipo': str(tipo), 'cripto': str(cripto), 'valor': None, 'condicion': None,
+                  'activa': True, 'histeresis': 0}
+        if tipo == 'precio':
+            base = PRECIOS['BTC' if cripto == 'all' else cripto]
+            alerta['valor'] = round(float(base * rng.uniform(0.9, 1.1)), 4)
+            alerta['condicion'] = str(rng.choice(['above', 'below']))
+        elif tipo == 'cambio':
+            alerta['valor'] = round(float(rng.uniform(0, 8)), 2)
+            alerta['condicion'] = str(rng.choice(['increase', 'decrease']))
+        alertas.append(alerta)
+    return alertas
+
+
+def main():
+    n_alertas = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = np.random.default_rng(3)
+    alertas = generar_alertas(n_alertas, rng)
+
+    motor = MotorAlertas()
+    inicio = time.perf_counter()
+    motor.cargar(alertas)
+    t_compilar = time.perf_counter() - inicio
+
+    datos = {c: {'precio': float(PRECIOS[c])} for c in CRIPTOS}
+    analisis = {c: {'cambio_esperado': 0.0, 'rsi': 50.0, 'indicadores': {'volatilidad': 5.0}} for c in CRIPTOS}
+    registro = RegistroEventos(os.path.join(tempfile.mkdtemp(), 'eventos.jsonl'))
+    t_anterior = t_motor = t_registro = 0.0
+    n_eventos = 0
+    for _ in range(ticks):
+        # Cada tick se actualiza la mitad de las criptos: las métricas siguen un paseo aleatorio
+        actualizadas = [str(c) for c in rng.choice(CRIPTOS, size=len(CRIPTOS) // 2, replace=False)]
+        datos, analisis = dict(datos), dict(analisis)
+        for c in actualizadas:
+            datos[c] = {'precio': datos[c]['precio'] * float(np.exp(rng.normal(0, 0.01)))}
+            anterior = analisis[c]
+            analisis[c] = {
+                'cambio_esperado': float(np.clip(anterior['cambio_esperado'] + rng.normal(0, 1), -20, 20)),
+                'rsi': float(np.clip(anterior['rsi'] + rng.normal(0, 3), 0, 100)),
+                'indicadores': {'volatilidad': float(np.clip(anterior['indicadores']['volatilidad'] + rng.normal(0, 0.5), 0, 30))}
+            }
+
+        inicio = time.perf_counter()
+        esperadas = bucle_anterior(alertas, datos, analisis)
+        t_anterior += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultado = motor.evaluar(datos, analisis, actualizadas)
+        lista = motor.activas()
+        t_motor += time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        n_eventos += len(registro.agregar(resultado['disparadas']))
+        t_registro += time.perf_counter() - inicio
+        activas = {(a['id'], a['cripto_afectada']) for a in lista}
+        assert activas == esperadas, f"{len(activas ^ esperadas)} diferencias"
+
+    print(f"{n_alertas} alertas, {len(CRIPTOS)} criptos, {ticks} ticks (compilar: {t_compilar * 1000:.1f}ms)")
+    print(f"bucle anterior: {t_anterior / ticks * 1000:8.2f} ms/tick")
+    print(f"motor indexado: {t_motor / ticks * 1000:8.2f} ms/tick (incluye listar activas)")
+    print(f"registro:       {t_registro / max(n_eventos, 1) * 1e6:8.2f} us/evento ({n_eventos} eventos, fsync por lotes)")
+    registro.cerrar()
+    print(f"Alertas activas idénticas en todos los ticks ✅  ({len(esperadas)} en el último)")
+
+
+if __name__ == '__main__':
+    main()
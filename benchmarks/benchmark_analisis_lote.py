@@ -0,0 +1,75 @@
+# benchmark_analisis_lote.py - Análisis de varias criptos: secuencial vs ProcessPoolExecutor
+#
+# Escribe N CSV sintéticos en una carpeta temporal y ejecuta analisis_lote_criptos en frío
+# (cada pasada usa su propia copia, sin caché de DataFrames ni almacén binario), primero en el
+# propio proceso y después repartido entre procesos. Comprueba que los resultados coinciden.
+# La ganancia depende de los núcleos disponibles: con uno solo el pool solo añade coste.
+#
+# Uso: python benchmarks/benchmark_analisis_lote.py [criptos] [velas] [procesos]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funciones import analisis_lote_criptos
+from global_data import CONFIG_RENDIMIENTO
+
+
+def escribir_csvs(carpeta: str, n: int, velas: int) -> list:
+    rng = np.random.default_rng(3)
+    criptos = [f"C{i}" for i in range(n)]
+    for cripto in criptos:
+        precios = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, velas)))
+        pd.DataFrame({'Date': pd.date_range('2015-01-01', periods=velas, freq='D').strftime('%Y-%m-%d'),
+                      'Open': precios, 'High': precios * 1.01, 'Low': precios * 0.99,
+                      'Close': precios, 'Volume': rng.uniform(1e3, 1e6, velas)}
+                     ).to_csv(os.path.join(carpeta, f"{cripto}.csv"), index=False)
+    return criptos
+
+
+def pasada(origen: str, criptos: list, procesos: int) -> tuple:
+    carpeta = tempfile.mkdtemp()
+    try:
+        for cripto in criptos:
+            shutil.copy(os.path.join(origen, f"{cripto}.csv"), carpeta)
+        inicio = time.perf_counter()
+        resultados = analisis_lote_criptos(criptos, carpeta, procesos)
+        return time.perf_counter() - inicio, resultados
+    finally:
+        shutil.rmtree(carpeta)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    velas = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    procesos = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    CONFIG_RENDIMIENTO['analisis_paralelo'].update(procesos=procesos, minimo_para_paralelizar=2)
+
+    origen = tempfile.mkdtemp()
+    try:
+        criptos = escribir_csvs(origen, n, velas)
+        t_secuencial, secuencial = pasada(origen, criptos, 1)
+        t_procesos, paralelo = pasada(origen, criptos, procesos)
+    finally:
+        shutil.rmtree(origen)
+
+    for a, b in zip(secuencial, paralelo):
+        assert a['success'] and b['success'], f"{a['cripto']}: {a.get('error') or b.get('error')}"
+        assert a['cripto'] == b['cripto'] and a['precio_actual'] == b['precio_actual']
+        assert a['prediccion'] == b['prediccion'] and a['decision_info'] == b['decision_info']
+
+    lenta = max(secuencial, key=lambda r: r['tiempo_segundos'])
+    print(f"{n} criptos, {velas} velas, {os.cpu_count()} núcleos")
+    print(f"secuencial:            {t_secuencial:7.2f}s")
+    print(f"{procesos} procesos:            {t_procesos:7.2f}s  ({t_secuencial / t_procesos:.1f}x)")
+    print(f"cripto más lenta:      {lenta['cripto']} ({lenta['tiempo_segundos']:.3f}s)")
+    print("Resultados idénticos y en el mismo orden ✅")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# benchmark_backtesting.py - Bucle iloc original vs motor vectorizado de backtesting
+#
+# Comprueba que ambos producen las mismas operaciones, retorno_total, max_drawdown y
+# ganadoras/perdedoras en las tres estrategias (sin costes), y mide el tiempo de cada uno.
+#
+# Uso: python benchmarks/benchmark_backtesting.py [velas]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funciones import backtesting_estrategia
+from backtesting import ESTRATEGIAS_SOPORTADAS
+from tests.referencia_backtesting import backtesting_iloc
+
+
+def generar_velas(velas: int) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    rendimientos = rng.normal(0, 0.01, velas) + 0.002 * np.sin(np.arange(velas) / 500)
+    precios = 30000 * np.exp(np.cumsum(rendimientos))
+    return pd.DataFrame({'Close': precios}, index=pd.date_range('2014-01-01', periods=velas, freq='h'))
+
+
+def comparar(referencia: dict, vectorizado: dict, estrategia: str):
+    assert referencia['operaciones'] == vectorizado['operaciones'], f"{estrategia}: operaciones distintas"
+    # El bucle original medía la caída del precio, que ahora es max_drawdown_buy_hold
+    assert referencia['max_drawdown'] == vectorizado['max_drawdown_buy_hold'], f"{estrategia}: max_drawdown"
+    for clave in ('retorno_total', 'ganadoras', 'perdedoras'):
+        assert referencia[clave] == vectorizado[clave], \
+            f"{estrategia}: {clave} {referencia[clave]} != {vectorizado[clave]}"
+
+
+def main():
+    velas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = generar_velas(velas)
+
+    print(f"{'Estrategia':<14}{'iloc':>10}{'vectorizado':>14}{'speedup':>10}{'operaciones':>13}")
+    for estrategia in ESTRATEGIAS_SOPORTADAS:
+        inicio = time.perf_counter()
+        referencia = backtesting_iloc(df, 10000, estrategia)
+        t_iloc = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        # Sin comisiones ni slippage, como el bucle original
+        vectorizado = backtesting_estrategia(df, 10000, estrategia, comision=0, slippage=0)
+        t_vector = time.perf_counter() - inicio
+
+        comparar(referencia, vectorizado, estrategia)
+        print(f"{estrategia:<14}{t_iloc:>9.2f}s{t_vector:>13.3f}s{t_iloc / t_vector:>9.0f}x"
+              f"{vectorizado['cantidad_operaciones']:>13}")
+
+    print("\nOperaciones, retorno_total, max_drawdown y ganadoras/perdedoras idénticos ✅")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# benchmark_buffer_precios.py - Lista de dicts re-recortada vs buffer circular NumPy
+#
+# Mide el coste por tick de añadir un punto con cada estructura a la misma capacidad y
+# el de obtener la ventana de cierres para un gráfico o un indicador.
+#
+# Uso: python benchmarks/benchmark_buffer_precios.py [capacidad] [ticks]
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from buffer_precios import BufferCircular
+
+
+def main():
+    capacidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10080
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    precios = 30000 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.001, ticks)))
+
+    # Estructura anterior: append de un dict y recorte a los últimos `capacidad`
+    lista = []
+    inicio = time.perf_counter()
+    for precio in precios:
+        lista.append({'timestamp': datetime.now().isoformat(), 'precio': float(precio)})
+        if len(lista) > capacidad:
+            lista = lista[-capacidad:]
+    t_lista = time.perf_counter() - inicio
+
+    buffer = BufferCircular(capacidad)
+    inicio = time.perf_counter()
+    for precio in precios:
+        p = float(precio)
+        buffer.agregar(time.time_ns(), (p, p, p, p, 0.0))
+    t_buffer = time.perf_counter() - inicio
+
+    cierres_lista = np.array([p['precio'] for p in lista[-500:]])
+    cierres_buffer = buffer.columna('Close', 500)
+    assert np.array_equal(cierres_lista, cierres_buffer)
+
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        np.array([p['precio'] for p in lista[-500:]])
+    t_ventana_lista = (time.perf_counter() - inicio) / 1000
+    inicio = time.perf_counter()
+    for _ in range(1000):
+        buffer.columna('Close', 500)
+    t_ventana_buffer = (time.perf_counter() - inicio) / 1000
+
+    print(f"{'':<22}{'lista':>12}{'buffer':>12}")
+    print(f"{'append por tick':<22}{t_lista / ticks * 1e6:>10.2f}us{t_buffer / ticks * 1e6:>10.2f}us")
+    print(f"{'ventana de 500':<22}{t_ventana_lista * 1e6:>10.1f}us{t_ventana_buffer * 1e6:>10.1f}us")
+    print(f"\nCapacidad {capacidad}, {ticks} ticks; últimos 500 cierres idénticos ✅")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmark_codificacion.py - Tamaño y tiempo de codificación de series OHLCV por formato
+#
+# Compara la respuesta clásica (fechas como texto + una lista por columna), la de un dict por
+# fila con iterrows (obtener-datos) y los formatos compacto y binario de codificacion.py,
+# con y sin precisión float32. También muestra el tamaño tras gzip.
+#
+# Uso: python benchmarks/benchmark_codificacion.py [filas]
+import gzip
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codificacion import Serie, codificar
+
+
+def serie_sintetica(filas: int) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    cierre = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, filas)))
+    apertura = np.r_[cierre[0], cierre[:-1]]
+    return pd.DataFrame({
+        'Open': apertura,
+        'High': np.maximum(apertura, cierre) * (1 + rng.uniform(0, 0.01, filas)),
+        'Low': np.minimum(apertura, cierre) * (1 - rng.uniform(0, 0.01, filas)),
+        'Close': cierre,
+        'Volume': rng.uniform(1e8, 5e9, filas)
+    }, index=pd.date_range('2015-01-01', periods=filas, freq='h'))
+
+
+def por_filas(df: pd.DataFrame) -> str:
+    """La respuesta de obtener-datos antes de codificacion.py: un dict por fila"""
+    datos = [{'timestamp': str(idx), 'open': float(fila['Open']), 'close': float(fila['Close']),
+              'high': float(fila['High']), 'low': float(fila['Low']), 'volume': float(fila['Volume'])}
+             for idx, fila in df.iterrows()]
+    return json.dumps({'success': True, 'datos': datos, 'count': len(datos)})
+
+
+def medir(funcion, repeticiones: int) -> tuple:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        cuerpo = funcion()
+    return cuerpo, (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    df = serie_sintetica(filas)
+    casos = [
+        ('filas (iterrows)', lambda: por_filas(df), 1),
+        ('json clásico', lambda: codificar(Serie.desde_dataframe(df, '%Y-%m-%d %H:%M'), 'json')[0], 3),
+        ('compacto', lambda: codificar(Serie.desde_dataframe(df), 'compacto')[0], 3),
+        ('compacto float32', lambda: codificar(Serie.desde_dataframe(df), 'compacto', 'float32')[0], 3),
+        ('binario', lambda: codificar(Serie.desde_dataframe(df), 'binario')[0], 20),
+        ('binario float32', lambda: codificar(Serie.desde_dataframe(df), 'binario', 'float32')[0], 20),
+    ]
+
+    print(f"{'formato':<20}{'bytes':>12}{'gzip':>12}{'codificar':>12}")
+    for nombre, funcion, repeticiones in casos:
+        cuerpo, segundos = medir(funcion, repeticiones)
+        if isinstance(cuerpo, str):
+            cuerpo = cuerpo.encode('utf-8')
+        print(f"{nombre:<20}{len(cuerpo):>12,}{len(gzip.compress(cuerpo, 6)):>12,}{segundos * 1000:>10.1f}ms")
+    print(f"\n{filas} velas horarias")
+
+
+if __name__ == '__main__':
+    main()
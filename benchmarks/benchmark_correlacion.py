@@ -0,0 +1,76 @@
+# benchmark_correlacion.py - returns.corr() por vela vs matriz incremental, y correlación móvil
+#
+# Simula N criptos con un factor común. Para cada vela nueva compara rehacer la matriz con
+# pandas sobre la ventana (lo que hacía /api/online/correlacion en cada petición) con
+# MatrizCorrelacion.agregar_retornos, y la correlación móvil par a par de pandas con
+# correlacion_movil(). Comprueba que los resultados coinciden.
+#
+# Uso: python benchmarks/benchmark_correlacion.py [criptos] [velas] [ventana]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from correlacion import MatrizCorrelacion, correlacion_movil
+
+
+def retornos_sinteticos(n: int, velas: int) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    factor = rng.normal(0, 0.01, (velas, 1))
+    beta = rng.uniform(0.2, 1.2, n)
+    retornos = factor * beta + rng.normal(0, 0.01, (velas, n))
+    return pd.DataFrame(retornos, columns=[f"C{i}" for i in range(n)],
+                        index=pd.date_range('2024-01-01', periods=velas, freq='h'))
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    velas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    ventana = int(sys.argv[3]) if len(sys.argv) > 3 else 168
+    retornos = retornos_sinteticos(n, velas)
+    valores = retornos.to_numpy()
+
+    # Matriz de la ventana tras cada vela
+    medidas = range(ventana, velas, max(1, (velas - ventana) // 200))
+    inicio = time.perf_counter()
+    for fin in medidas:
+        esperada = retornos.iloc[fin - ventana:fin].corr().to_numpy()
+    t_pandas = (time.perf_counter() - inicio) / len(medidas)
+
+    motor = MatrizCorrelacion(n, ventana)
+    inicio = time.perf_counter()
+    for fila in valores[:medidas[-1]]:
+        motor.agregar_retornos(fila)
+    t_agregar = (time.perf_counter() - inicio) / medidas[-1]
+    inicio = time.perf_counter()
+    matriz = motor.matriz()
+    t_matriz = time.perf_counter() - inicio
+    error = np.abs(matriz - esperada).max()
+    assert error < 1e-9, f"diferencia {error}"
+
+    # Correlación móvil de todos los pares
+    movil = 30
+    pares = [(a, b) for i, a in enumerate(retornos.columns) for b in retornos.columns[i + 1:]]
+    inicio = time.perf_counter()
+    esperado = {f"{a}-{b}": retornos[a].rolling(movil).corr(retornos[b]) for a, b in pares}
+    t_rolling = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    resultado = correlacion_movil(retornos, movil)
+    t_movil = time.perf_counter() - inicio
+    error_movil = max(np.nanmax(np.abs(resultado[par].to_numpy() - serie.dropna().to_numpy()))
+                      for par, serie in esperado.items())
+    assert error_movil < 1e-9, f"diferencia {error_movil}"
+
+    print(f"{n} criptos, {velas} velas, ventana {ventana}")
+    print(f"returns.corr() por vela:     {t_pandas * 1000:8.3f} ms")
+    print(f"incremental por vela:        {t_agregar * 1000:8.3f} ms (+ {t_matriz * 1000:.3f} ms al leer la matriz)")
+    print(f"móvil ({movil}) pandas por par:   {t_rolling * 1000:8.1f} ms ({len(pares)} pares)")
+    print(f"móvil ({movil}) vectorizada:      {t_movil * 1000:8.1f} ms")
+    print(f"Resultados idénticos ✅  (error máx. {max(error, error_movil):.1e})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# benchmark_correlacion_escala.py - Correlación de cientos de criptos: bucle iloc vs bloques BLAS
+#
+# Reproduce la versión anterior de calcular_correlacion_criptos (returns.corr(), doble bucle con
+# iloc para la matriz y las recomendaciones, linkage sobre la matriz densa) y la compara con
+# correlacion_dispersa() + ArbolClusters, y el recorte de clusters a otro t con el linkage en caché.
+#
+# Uso: python benchmarks/benchmark_correlacion_escala.py [criptos] [velas]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from correlacion import ArbolClusters, correlacion_dispersa
+
+
+def retornos_sinteticos(n: int, velas: int) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    sectores = rng.integers(0, 6, n)
+    factores = rng.normal(0, 0.01, (velas, 6))
+    retornos = 0.8 * factores[:, sectores] + rng.normal(0, 0.01, (velas, n))
+    return pd.DataFrame(retornos, columns=[f"C{i}" for i in range(n)])
+
+
+def version_anterior(returns: pd.DataFrame) -> tuple:
+    from scipy.cluster.hierarchy import linkage, fcluster
+    from scipy.spatial.distance import squareform
+
+    corr_matrix = returns.corr()
+    recomendaciones, matriz_valores = [], []
+    for i in range(len(corr_matrix.columns)):
+        fila = []
+        for j in range(len(corr_matrix.columns)):
+            fila.append(float(corr_matrix.iloc[i, j]))
+            if i < j:
+                corr_val = corr_matrix.iloc[i, j]
+                if corr_val < 0.3 or corr_val > 0.7:
+                    recomendaciones.append((i, j, float(corr_val)))
+        matriz_valores.append(fila)
+    enlace = linkage(squareform(1 - np.abs(corr_matrix)), method='average')
+    return matriz_valores, recomendaciones, fcluster(enlace, t=3, criterion='maxclust')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    velas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    returns = retornos_sinteticos(n, velas)
+
+    inicio = time.perf_counter()
+    matriz, recomendaciones, _ = version_anterior(returns)
+    t_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resultado = correlacion_dispersa(returns.to_numpy(), 0.3, 0.7, distancias=True)
+    t_bloques = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    arbol = ArbolClusters(list(returns.columns), resultado['distancias'])
+    arbol.cortar(3)
+    t_arbol = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for t in range(2, 12):
+        arbol.cortar(t)
+    t_recorte = (time.perf_counter() - inicio) / 10
+
+    esperados = np.array([r[:2] for r in recomendaciones])
+    assert np.array_equal(esperados[:, 0], resultado['i']) and np.array_equal(esperados[:, 1], resultado['j'])
+    error = np.abs(np.array([r[2] for r in recomendaciones]) - resultado['valores']).max()
+    assert error < 1e-9, f"diferencia {error}"
+
+    print(f"{n} criptos, {velas} velas")
+    print(f"anterior (corr + bucle iloc + linkage): {t_anterior * 1000:9.1f} ms, {n * n} valores en la matriz")
+    print(f"bloques BLAS (pares fuera de umbrales): {t_bloques * 1000:9.1f} ms, {len(resultado['i'])} pares")
+    print(f"linkage + primer corte:                 {t_arbol * 1000:9.1f} ms")
+    print(f"recorte a otro t (linkage en caché):    {t_recorte * 1000:9.3f} ms")
+    print(f"Pares y valores idénticos ✅  (error máx. {error:.1e})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmark_indicadores_incrementales.py - Recalcular por lotes vs actualizar EstadoIndicadores
+#
+# Simula el bucle online: en cada tick llega una vela horaria nueva. Compara el coste de
+# recalcular RSI/MACD/Bollinger/predicción sobre la ventana completa con el de actualizar
+# el estado incremental, y comprueba que ambos dan el mismo resultado.
+#
+# Uso: python benchmarks/benchmark_indicadores_incrementales.py [velas]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funciones import calcular_rsi, calcular_macd, calcular_bollinger_bands, predecir_precio
+from indicadores_incrementales import EstadoIndicadores
+
+TOLERANCIA = 1e-9
+
+
+def generar_velas(velas: int) -> pd.Series:
+    rng = np.random.default_rng(7)
+    precios = 30000 + np.cumsum(rng.normal(0, 50, velas))
+    precios[velas // 3: velas // 3 + 40] = precios[velas // 3 - 1]  # tramo plano (RSI sin pérdidas)
+    return pd.Series(precios, index=pd.date_range('2024-01-01', periods=velas, freq='h'))
+
+
+def resumen_por_lotes(precios: pd.Series) -> dict:
+    macd = calcular_macd(precios).iloc[-1]
+    bandas = calcular_bollinger_bands(precios).iloc[-1]
+    return {
+        'rsi': calcular_rsi(precios).iloc[-1],
+        'macd': macd['macd'],
+        'signal': macd['signal'],
+        'bb_upper': bandas['upper'],
+        'bb_lower': bandas['lower'],
+        'prediccion': predecir_precio(pd.DataFrame({'Close': precios}))['prediccion_final']
+    }
+
+
+def resumen_incremental(estado: EstadoIndicadores) -> dict:
+    r = estado.resumen()
+    return {
+        'rsi': r['rsi'],
+        'macd': r['macd']['macd'],
+        'signal': r['macd']['signal'],
+        'bb_upper': r['bollinger']['upper'],
+        'bb_lower': r['bollinger']['lower'],
+        'prediccion': r['prediccion']['prediccion_final']
+    }
+
+
+def main():
+    velas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    precios = generar_velas(velas)
+
+    # Equivalencia en varios puntos del flujo
+    estado = EstadoIndicadores()
+    puntos = set(np.linspace(0, velas - 1, 25).astype(int)) | {velas // 3 + 39}
+    for i, (marca, precio) in enumerate(precios.items()):
+        estado.actualizar(precio, marca)
+        if i in puntos:
+            esperado = resumen_por_lotes(precios.iloc[:i + 1])
+            obtenido = resumen_incremental(estado)
+            for clave, valor in esperado.items():
+                np.testing.assert_allclose(obtenido[clave], valor, rtol=TOLERANCIA, atol=TOLERANCIA,
+                                           err_msg=f"{clave} en la vela {i}")
+    print(f"Resultados incrementales equivalentes a los de lotes en {len(puntos)} puntos ✅")
+
+    # Coste por tick: ventana de 7 días (168 velas) como en actualizar_datos_online
+    ventana = 7 * 24
+    ticks = velas - ventana
+    inicio = time.perf_counter()
+    for i in range(ventana, velas):
+        resumen_por_lotes(precios.iloc[i - ventana:i + 1])
+    t_lotes = (time.perf_counter() - inicio) / ticks
+
+    estado = EstadoIndicadores(ventana)
+    estado.actualizar_desde(precios.iloc[:ventana])
+    inicio = time.perf_counter()
+    for marca, precio in precios.iloc[ventana:].items():
+        estado.actualizar(precio, marca)
+        estado.resumen()
+    t_incremental = (time.perf_counter() - inicio) / ticks
+
+    print(f"\n{'Por lotes':<14}{t_lotes * 1e3:>10.3f} ms/tick")
+    print(f"{'Incremental':<14}{t_incremental * 1e3:>10.3f} ms/tick")
+    print(f"{'Speedup':<14}{t_lotes / t_incremental:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+# benchmark_optimizacion.py - Escalado del barrido de parámetros con el número de procesos
+#
+# Uso: python benchmarks/benchmark_optimizacion.py [velas]
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtesting import optimizar_backtesting
+from benchmark_backtesting import generar_velas
+
+GRILLA = {
+    'rsi_compra': [20, 25, 30, 35],
+    'rsi_venta': [65, 70, 75, 80],
+    'macd_fast': [8, 10, 12],
+    'macd_slow': [21, 26, 30],
+    'macd_signal': [7, 9]
+}
+
+
+def main():
+    velas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = generar_velas(velas)
+    nucleos = os.cpu_count() or 1
+
+    referencia = None
+    print(f"{'Procesos':<10}{'tiempo':>10}{'speedup':>10}")
+    procesos = 1
+    while procesos <= nucleos:
+        resultado = optimizar_backtesting(df, 'rsi_macd', GRILLA, procesos=procesos)
+        if referencia is None:
+            referencia = resultado
+        # El ranking no depende del número de procesos
+        assert [r['parametros'] for r in resultado['resultados']] == \
+            [r['parametros'] for r in referencia['resultados']]
+        t = resultado['tiempo_segundos']
+        print(f"{resultado['procesos']:<10}{t:>9.2f}s{referencia['tiempo_segundos'] / t:>9.1f}x")
+        procesos *= 2
+
+    print(f"\n{referencia['combinaciones']} combinaciones; mejor: {referencia['resultados'][0]['parametros']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# benchmark_parser_europeo.py - Compara convertir_precio_europeo (celda a celda) con convertir_columna_europea
+#
+# Uso: python benchmarks/benchmark_parser_europeo.py [filas]
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from funciones import convertir_precio_europeo, convertir_columna_europea
+
+
+def formato_europeo(valores: np.ndarray, decimales: int) -> list:
+    """Formatea floats como investing.com en español: 84.235,5"""
+    return [f"{v:,.{decimales}f}".replace(',', '_').replace('.', ',').replace('_', '.') for v in valores]
+
+
+def generar_csv_sintetico(ruta: str, filas: int):
+    rng = np.random.default_rng(42)
+    precios = 1000 + np.abs(np.cumsum(rng.normal(0, 50, filas))) + rng.uniform(0, 90000, filas)
+    volumen = rng.uniform(1, 999, filas)
+    cambio = rng.normal(0, 3, filas)
+
+    pd.DataFrame({
+        'Fecha': pd.date_range('2000-01-01', periods=filas, freq='h').strftime('%d.%m.%Y'),
+        'Último': formato_europeo(precios, 1),
+        'Apertura': formato_europeo(precios * 0.99, 1),
+        'Vol.': [v + 'K' for v in formato_europeo(volumen, 2)],
+        '% var.': [v + '%' for v in formato_europeo(cambio, 2)]
+    }).to_csv(ruta, index=False)
+
+
+def medir(funcion, repeticiones: int = 1) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, 'sintetico.csv')
+        print(f"Generando CSV sintético de {filas:,} filas...")
+        generar_csv_sintetico(ruta, filas)
+        df = pd.read_csv(ruta, dtype=str)
+
+    print(f"\n{'Columna':<10}{'celda a celda':>16}{'vectorizado':>14}{'speedup':>10}")
+    for col in ['Último', 'Apertura', 'Vol.', '% var.']:
+        serie = df[col]
+        resultado = {}
+        t_celda = medir(lambda: resultado.__setitem__('celda', serie.astype(str).apply(convertir_precio_europeo)))
+        t_vector = medir(lambda: resultado.__setitem__('vector', convertir_columna_europea(serie)))
+        print(f"{col:<10}{t_celda:>15.3f}s{t_vector:>13.3f}s{t_celda / t_vector:>9.1f}x")
+
+        # En columnas de precio ambos parsers deben coincidir exactamente;
+        # las de volumen/porcentaje solo las entiende la versión vectorizada
+        if col in ('Último', 'Apertura'):
+            np.testing.assert_array_equal(resultado['celda'].to_numpy(), resultado['vector'].to_numpy())
+        else:
+            assert resultado['celda'].isna().all() and resultado['vector'].notna().all()
+
+    print("\nResultados de precio idénticos en ambas implementaciones ✅")
+
+
+if __name__ == '__main__':
+    main()
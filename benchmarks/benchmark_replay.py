@@ -0,0 +1,45 @@
+# benchmark_replay.py - Rendimiento del bucle online sin red con el proveedor replay
+#
+# Reproduce datos/*_online.csv avanzando una vela por tick y ejecuta la actualización
+# online completa (descarga + análisis) de todas las criptos en cada tick.
+#
+# Uso: python benchmarks/benchmark_replay.py [ticks]
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.chdir(RAIZ)
+import main
+from proveedores import ProveedorReplay
+
+
+def main_benchmark():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    criptos = sorted(os.path.basename(r)[:-len('_online.csv')] for r in glob.glob('datos/*_online.csv'))
+    if not criptos:
+        print("No hay datos/*_online.csv para reproducir")
+        return
+
+    proveedor = ProveedorReplay(velas_por_segundo=0)
+    main.online_config['criptos_seleccionadas'] = criptos
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ticks):
+            proveedor.avanzar(1)
+            main.actualizar_datos_online(proveedor)
+    total = time.perf_counter() - inicio
+
+    analizadas = len(main.estado_mercado.instantanea().analisis_actuales)
+    assert analizadas == len(criptos), f"Solo {analizadas}/{len(criptos)} criptos analizadas"
+    print(f"{ticks} ticks x {len(criptos)} criptos en {total:.2f}s")
+    print(f"{ticks / total:.1f} ticks/s, {ticks * len(criptos) / total:.0f} actualizaciones de cripto/s")
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,124 @@
+# buffer_precios.py - Historial de precios del modo online en buffers circulares NumPy
+#
+# Cada cripto tiene un buffer de capacidad fija con marcas de tiempo int64 (ns desde epoch)
+# y OHLCV float64. Cada punto se escribe dos veces (posición i e i + capacidad), así cualquier
+# ventana de hasta `capacidad` puntos es un tramo contiguo del array: añadir es O(1) y las
+# ventanas son vistas sin copia, aptas para gráficos y para MotorIndicadores.
+import os
+
+import numpy as np
+
+from global_data import CONFIG_HISTORIAL_ONLINE, CONFIG_ALMACEN
+
+COLUMNAS_OHLCV = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def ruta_historial() -> str:
+    """<carpeta>/.almacen/<archivo>: junto al almacén binario de las series"""
+    return os.path.join(CONFIG_HISTORIAL_ONLINE['carpeta'], CONFIG_ALMACEN['subcarpeta'],
+                        CONFIG_HISTORIAL_ONLINE['archivo'])
+
+
+class BufferCircular:
+    """Últimos `capacidad` puntos OHLCV de una cripto"""
+
+    def __init__(self, capacidad: int):
+        self.capacidad = int(capacidad)
+        self._marcas = np.zeros(2 * self.capacidad, dtype=np.int64)
+        self._valores = np.zeros((2 * self.capacidad, len(COLUMNAS_OHLCV)), dtype=np.float64)
+        self.total = 0  # puntos añadidos desde el principio (no solo los retenidos)
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacidad)
+
+    def agregar(self, marca_ns: int, valores) -> int:
+        """Añade un punto (valores en el orden de COLUMNAS_OHLCV) y devuelve el nuevo total"""
+        posicion = self.total % self.capacidad
+        self._marcas[posicion] = self._marcas[posicion + self.capacidad] = marca_ns
+        self._valores[posicion] = self._valores[posicion + self.capacidad] = valores
+        self.total += 1
+        return self.total
+
+    def cargar_arrays(self, marcas: np.ndarray, valores: np.ndarray):
+        """Rellena un buffer vacío con los últimos `capacidad` puntos de unos arrays ordenados"""
+        marcas, valores = marcas[-self.capacidad:], valores[-self.capacidad:]
+        n = len(marcas)
+        for desplazamiento in (0, self.capacidad):
+            self._marcas[desplazamiento:desplazamiento + n] = marcas
+            self._valores[desplazamiento:desplazamiento + n] = valores
+        self.total = n
+
+    def ventana(self, n: int = None, hasta: int = None) -> tuple:
+        """
+        (marcas, valores) de los `n` puntos anteriores a `hasta` (por defecto los últimos), como vistas.
+        Una instantánea guarda su `hasta`; la vista sigue siendo válida mientras no se añadan
+        más de `capacidad - n` puntos después.
+        """
+        hasta = self.total if hasta is None else min(hasta, self.total)
+        # Los puntos retenidos son [total - capacidad, total)
+        disponibles = max(0, min(hasta, self.capacidad - (self.total - hasta)))
+        n = max(0, min(disponibles if n is None else n, disponibles))
+        inicio = (hasta - n) % self.capacidad
+        return self._marcas[inicio:inicio + n], self._valores[inicio:inicio + n]
+
+    def columna(self, nombre: str, n: int = None, hasta: int = None) -> np.ndarray:
+        """Vista de una sola columna (p. ej. 'Close') de la ventana"""
+        return self.ventana(n, hasta)[1][:, COLUMNAS_OHLCV.index(nombre)]
+
+
+class HistorialPrecios:
+    """Un BufferCircular por cripto; un solo escritor (el actualizador online)"""
+
+    def __init__(self, capacidad: int = None):
+        self.capacidad = int(capacidad or CONFIG_HISTORIAL_ONLINE['capacidad'])
+        self._buffers = {}
+
+    def buffer(self, simbolo: str) -> BufferCircular:
+        return self._buffers.get(simbolo)
+
+    def simbolos(self) -> list:
+        return list(self._buffers)
+
+    def agregar(self, simbolo: str, marca_ns: int, valores) -> int:
+        if simbolo not in self._buffers:
+            self._buffers[simbolo] = BufferCircular(self.capacidad)
+        return self._buffers[simbolo].agregar(marca_ns, valores)
+
+    def totales(self) -> dict:
+        return {simbolo: b.total for simbolo, b in self._buffers.items()}
+
+    def guardar(self, ruta: str = None):
+        """Guarda los puntos retenidos (en orden) en un .npz; escritura atómica"""
+        ruta = ruta or ruta_historial()
+        arrays = {}
+        for simbolo, buffer in self._buffers.items():
+            marcas, valores = buffer.ventana()
+            arrays[f"{simbolo}__marcas"] = marcas
+            arrays[f"{simbolo}__valores"] = valores
+        os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str = None, capacidad: int = None) -> 'HistorialPrecios':
+        """Historial guardado con guardar(); vacío si no existe o no se puede leer"""
+        ruta = ruta or ruta_historial()
+        historial = cls(capacidad)
+        if not os.path.exists(ruta):
+            return historial
+        try:
+            with np.load(ruta) as archivo:
+                for clave in archivo.files:
+                    if not clave.endswith('__marcas'):
+                        continue
+                    simbolo = clave[:-len('__marcas')]
+                    buffer = BufferCircular(historial.capacidad)
+                    buffer.cargar_arrays(archivo[clave], archivo[f"{simbolo}__valores"])
+                    historial._buffers[simbolo] = buffer
+            print(f"✅ Historial online cargado: {len(historial.simbolos())} criptos")
+        except Exception as e:
+            print(f"⚠️ Error cargando historial online: {e}")
+            historial = cls(capacidad)
+        return historial
@@ -0,0 +1,138 @@
+# cache_datos.py - Caché en memoria de DataFrames normalizados (OHLCV)
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from global_data import CONFIG_RENDIMIENTO
+
+
+def firma_archivo(ruta: str) -> tuple:
+    """Firma (mtime_ns, tamaño) usada para invalidar entradas cuando el archivo cambia"""
+    st = os.stat(ruta)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CacheDataFrames:
+    """
+    Caché LRU de DataFrames ya parseados, acotada por memoria.
+    Cada entrada se invalida si cambia el mtime o el tamaño del archivo de origen.
+    """
+
+    def __init__(self, maximo_mb: float = 100, duracion: float = 300,
+                 habilitado: bool = True, limpiar_auto: bool = True):
+        self.maximo_bytes = int(maximo_mb * 1024 * 1024)
+        self.duracion = duracion
+        self.habilitado = habilitado
+        self.limpiar_auto = limpiar_auto
+        self._entradas = OrderedDict()  # ruta -> (firma, df, bytes, creado)
+        self._bytes_totales = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidaciones = 0
+        self.expulsiones = 0
+
+    @classmethod
+    def desde_config(cls, config: dict) -> 'CacheDataFrames':
+        return cls(
+            maximo_mb=config.get('maximo_tamano', 100),
+            duracion=config.get('duracion', 300),
+            habilitado=config.get('habilitado', True),
+            limpiar_auto=config.get('limpiar_auto', True)
+        )
+
+    def obtener(self, ruta: str):
+        """Devuelve una copia del DataFrame cacheado o None si no hay entrada válida"""
+        if not self.habilitado:
+            return None
+
+        clave = os.path.abspath(ruta)
+        try:
+            firma = firma_archivo(clave)
+        except OSError:
+            firma = None
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+
+            firma_cache, df, tamano, creado = entrada
+            caducada = self.limpiar_auto and self.duracion and (time.time() - creado) > self.duracion
+            if firma != firma_cache or caducada:
+                self._eliminar(clave)
+                self.invalidaciones += 1
+                self.misses += 1
+                return None
+
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+
+        # Copia para que el llamador no modifique la entrada compartida
+        return df.copy()
+
+    def guardar(self, ruta: str, df: pd.DataFrame, firma: tuple = None):
+        """Guarda el DataFrame; `firma` debe tomarse antes de leer el archivo"""
+        if not self.habilitado or df is None:
+            return
+
+        clave = os.path.abspath(ruta)
+        if firma is None:
+            try:
+                firma = firma_archivo(clave)
+            except OSError:
+                return
+
+        tamano = int(df.memory_usage(index=True, deep=True).sum())
+        if tamano > self.maximo_bytes:
+            return
+
+        with self._lock:
+            if clave in self._entradas:
+                self._eliminar(clave)
+            self._entradas[clave] = (firma, df.copy(), tamano, time.time())
+            self._bytes_totales += tamano
+
+            # Expulsar las entradas menos usadas hasta respetar el límite
+            while self._bytes_totales > self.maximo_bytes and self._entradas:
+                clave_antigua = next(iter(self._entradas))
+                self._eliminar(clave_antigua)
+                self.expulsiones += 1
+
+    def invalidar(self, ruta: str = None):
+        """Invalida una ruta concreta o toda la caché"""
+        with self._lock:
+            if ruta is None:
+                self._entradas.clear()
+                self._bytes_totales = 0
+            else:
+                clave = os.path.abspath(ruta)
+                if clave in self._entradas:
+                    self._eliminar(clave)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'habilitado': self.habilitado,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes_totales,
+                'maximo_bytes': self.maximo_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'ratio_aciertos': round(self.hits / total, 4) if total else 0.0,
+                'invalidaciones': self.invalidaciones,
+                'expulsiones': self.expulsiones
+            }
+
+    def _eliminar(self, clave: str):
+        _, _, tamano, _ = self._entradas.pop(clave)
+        self._bytes_totales -= tamano
+
+
+# Instancia compartida por todos los cargadores
+cache_dataframes = CacheDataFrames.desde_config(CONFIG_RENDIMIENTO['cache'])
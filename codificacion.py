@@ -0,0 +1,202 @@
+# codificacion.py - Codificación de series OHLCV para las respuestas de la API
+#
+# Las rutas devuelven un diccionario con objetos Serie dentro; codificar() los sustituye según
+# el formato pedido (?formato= o cabecera Accept):
+#   json      el de siempre: fechas como texto y una lista por columna (por defecto)
+#   compacto  JSON columnar: marcas epoch en ms como base + paso (series regulares) o
+#             base + deltas, y con precision=float32 valores redondeados a 7 cifras
+#   binario   'CRPT' + versión + longitud de cabecera (uint32 LE) + cabecera JSON + arrays
+#             little-endian alineados a 8 bytes; el navegador los lee con Float64Array,
+#             Float32Array e Int32Array sin parsear texto
+import json
+import struct
+
+import numpy as np
+import pandas as pd
+
+from global_data import CONFIG_CODIFICACION
+
+FORMATOS = ('json', 'compacto', 'binario')
+PRECISIONES = ('float64', 'float32')
+MAGIA = b'CRPT'
+VERSION_BINARIO = 1
+
+# Nombre en el JSON de siempre -> columna del DataFrame
+COLUMNAS_CLASICAS = {'precios': 'Close', 'volumenes': 'Volume', 'open': 'Open', 'high': 'High', 'low': 'Low'}
+COLUMNAS_SERIE = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def marcas_ms(indice) -> np.ndarray:
+    """Milisegundos desde epoch (UTC) de un DatetimeIndex o de marcas en nanosegundos"""
+    if isinstance(indice, pd.DatetimeIndex):
+        if indice.tz is not None:
+            indice = indice.tz_convert('UTC').tz_localize(None)
+        return np.asarray(indice, dtype='datetime64[ms]').astype(np.int64)
+    return np.asarray(indice, dtype=np.int64) // 1_000_000
+
+
+class Serie:
+    """Serie OHLCV pendiente de codificar: marcas en ms y una columna NumPy por campo"""
+
+    def __init__(self, marcas: np.ndarray, columnas: dict, formato_fecha: str = '%Y-%m-%d', indice=None):
+        self.marcas = np.asarray(marcas, dtype=np.int64)
+        self.columnas = {nombre: np.asarray(valores, dtype=np.float64) for nombre, valores in columnas.items()}
+        self.formato_fecha = formato_fecha
+        self._indice = indice  # índice original, para reproducir las fechas del formato json
+
+    @classmethod
+    def desde_dataframe(cls, df: pd.DataFrame, formato_fecha: str = '%Y-%m-%d') -> 'Serie':
+        columnas = {c: df[c].to_numpy(dtype=np.float64) for c in COLUMNAS_SERIE if c in df.columns}
+        return cls(marcas_ms(df.index), columnas, formato_fecha, df.index)
+
+    def __len__(self) -> int:
+        return len(self.marcas)
+
+    def fechas(self) -> list:
+        indice = self._indice
+        if indice is None:
+            indice = pd.to_datetime(self.marcas, unit='ms')
+        return indice.strftime(self.formato_fecha).tolist()
+
+    def clasica(self) -> dict:
+        """Forma histórica: {'fechas', 'precios', 'volumenes', 'open', 'high', 'low'}"""
+        datos = {'fechas': self.fechas()}
+        for clave, columna in COLUMNAS_CLASICAS.items():
+            datos[clave] = self.columnas[columna].tolist() if columna in self.columnas else []
+        return datos
+
+
+def formato_solicitado(formato: str = None, aceptados=None) -> str:
+    """
+    Formato de la respuesta: el parámetro `formato` manda; si no viene, la cabecera Accept
+    (werkzeug MIMEAccept); si tampoco, CONFIG_CODIFICACION['formato']. ValueError si no es válido.
+    """
+    if formato:
+        formato = formato.lower()
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato} (usa {', '.join(FORMATOS)})")
+        return formato
+    if aceptados:
+        tipos = CONFIG_CODIFICACION['tipos_mime']
+        mejor = aceptados.best_match(['application/json', tipos['compacto'], tipos['binario'],
+                                      'application/octet-stream'])
+        if mejor == tipos['compacto']:
+            return 'compacto'
+        if mejor in (tipos['binario'], 'application/octet-stream'):
+            return 'binario'
+        if mejor == 'application/json':
+            return 'json'
+    return CONFIG_CODIFICACION['formato']
+
+
+def validar_precision(precision: str = None) -> str:
+    precision = (precision or CONFIG_CODIFICACION['precision']).lower()
+    if precision not in PRECISIONES:
+        raise ValueError(f"Precisión no soportada: {precision} (usa {', '.join(PRECISIONES)})")
+    return precision
+
+
+def codificar_tiempos(marcas: np.ndarray) -> dict:
+    """{'base', 'paso'} si el paso es constante; si no, {'base', 'deltas'} (array int64)"""
+    if len(marcas) == 0:
+        return {'base': 0, 'paso': 0}
+    deltas = np.diff(marcas)
+    if len(deltas) == 0 or (deltas == deltas[0]).all():
+        return {'base': int(marcas[0]), 'paso': int(deltas[0]) if len(deltas) else 0}
+    return {'base': int(marcas[0]), 'deltas': deltas}
+
+
+def redondear_cifras(valores: np.ndarray, cifras: int = None) -> np.ndarray:
+    """Redondea una columna a `cifras` significativas respecto a su mayor valor (resolución float32)"""
+    cifras = cifras or CONFIG_CODIFICACION['cifras_float32']
+    finitos = np.abs(valores[np.isfinite(valores)])
+    if finitos.size == 0 or finitos.max() == 0:
+        return valores
+    decimales = cifras - 1 - int(np.floor(np.log10(finitos.max())))
+    return np.round(valores, decimales)
+
+
+def _lista_json(valores: np.ndarray) -> list:
+    """tolist() con None en lugar de NaN/inf (JSON estricto)"""
+    lista = valores.tolist()
+    invalidos = ~np.isfinite(valores)
+    if invalidos.any():
+        for i in np.flatnonzero(invalidos):
+            lista[i] = None
+    return lista
+
+
+def _serie_compacta(serie: Serie, precision: str) -> dict:
+    tiempo = codificar_tiempos(serie.marcas)
+    if 'deltas' in tiempo:
+        tiempo['deltas'] = tiempo['deltas'].tolist()
+    columnas = {}
+    for nombre, valores in serie.columnas.items():
+        if precision == 'float32':
+            valores = redondear_cifras(valores)
+        columnas[nombre.lower()] = _lista_json(valores)
+    return {'codificacion': 'columnar', 'n': len(serie), 'fechas': serie.formato_fecha,
+            'tiempo': tiempo, 'columnas': columnas}
+
+
+class _CuerpoBinario:
+    """Acumula arrays little-endian alineados a 8 bytes y devuelve su desplazamiento"""
+
+    def __init__(self):
+        self.partes = []
+        self.tamano = 0
+
+    def agregar(self, array: np.ndarray) -> int:
+        desplazamiento = self.tamano
+        datos = np.ascontiguousarray(array).tobytes()
+        relleno = -len(datos) % 8
+        self.partes.append(datos + b'\0' * relleno)
+        self.tamano += len(datos) + relleno
+        return desplazamiento
+
+
+def _serie_binaria(serie: Serie, precision: str, cuerpo: _CuerpoBinario) -> dict:
+    tiempo = codificar_tiempos(serie.marcas)
+    if 'deltas' in tiempo:
+        deltas = tiempo['deltas']
+        tipo = '<i4' if len(deltas) == 0 or np.abs(deltas).max() < 2 ** 31 else '<f8'
+        tiempo['deltas'] = {'tipo': tipo[1:], 'offset': cuerpo.agregar(deltas.astype(tipo))}
+    tipo = '<f4' if precision == 'float32' else '<f8'
+    columnas = {nombre.lower(): {'tipo': tipo[1:], 'offset': cuerpo.agregar(valores.astype(tipo))}
+                for nombre, valores in serie.columnas.items()}
+    return {'codificacion': 'columnar', 'n': len(serie), 'fechas': serie.formato_fecha,
+            'tiempo': tiempo, 'columnas': columnas}
+
+
+def _sustituir(valor, convertir):
+    """Copia de `valor` con cada Serie (en dicts y listas anidados) pasada por `convertir`"""
+    if isinstance(valor, Serie):
+        return convertir(valor)
+    if isinstance(valor, dict):
+        return {clave: _sustituir(v, convertir) for clave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [_sustituir(v, convertir) for v in valor]
+    return valor
+
+
+def series_clasicas(respuesta):
+    """La respuesta con cada Serie en la forma histórica (formato json)"""
+    return _sustituir(respuesta, Serie.clasica)
+
+
+def codificar(respuesta: dict, formato: str = 'json', precision: str = 'float64') -> tuple:
+    """(cuerpo, mimetype) de una respuesta que puede contener objetos Serie"""
+    if formato == 'json':
+        return json.dumps(series_clasicas(respuesta), default=str), 'application/json'
+    if formato == 'compacto':
+        cuerpo = json.dumps(_sustituir(respuesta, lambda s: _serie_compacta(s, precision)),
+                            default=str, separators=(',', ':'))
+        return cuerpo, CONFIG_CODIFICACION['tipos_mime']['compacto']
+
+    datos = _CuerpoBinario()
+    cabecera = json.dumps(_sustituir(respuesta, lambda s: _serie_binaria(s, precision, datos)),
+                          default=str, separators=(',', ':')).encode('utf-8')
+    # 12 bytes de prefijo + cabecera rellena con espacios: los arrays empiezan alineados a 8
+    cabecera += b' ' * (-(12 + len(cabecera)) % 8)
+    prefijo = MAGIA + struct.pack('<B3xI', VERSION_BINARIO, len(cabecera))
+    return prefijo + cabecera + b''.join(datos.partes), CONFIG_CODIFICACION['tipos_mime']['binario']
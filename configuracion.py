@@ -0,0 +1,170 @@
+# configuracion.py - Alertas y ajustes del modo online en SQLite
+#
+# La base de datos va en modo WAL: las lecturas no esperan a las escrituras y cada escritura
+# es una transacción BEGIN IMMEDIATE, así dos peticiones que guardan a la vez se serializan en
+# lugar de pisarse (antes cada cambio reescribía alertas_config.json entero). Cada hilo usa
+# su propia conexión. Los ids de alerta son AUTOINCREMENT: nunca se reutilizan tras borrar.
+# Al abrir una base de datos nueva se importan las alertas de alertas_config.json (una vez).
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from alertas import reglas_alerta
+from global_data import CONFIG_BASE_DATOS
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS alertas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    cripto TEXT NOT NULL,
+    valor REAL,
+    condicion TEXT,
+    histeresis REAL,
+    enfriamiento REAL,
+    activa INTEGER NOT NULL DEFAULT 1,
+    fecha_creacion TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alertas_cripto_tipo ON alertas (cripto, tipo);
+CREATE INDEX IF NOT EXISTS alertas_tipo ON alertas (tipo);
+CREATE TABLE IF NOT EXISTS ajustes (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+CAMPOS_ALERTA = ('tipo', 'cripto', 'valor', 'condicion', 'histeresis', 'enfriamiento', 'activa', 'fecha_creacion')
+
+
+def _alerta(fila: sqlite3.Row) -> dict:
+    alerta = dict(fila)
+    alerta['activa'] = bool(alerta['activa'])
+    return alerta
+
+
+def _numero(valor):
+    """Valor numérico opcional de una alerta (None si no viene)"""
+    return None if valor is None or valor == '' else float(valor)
+
+
+class AlmacenConfiguracion:
+    """Alertas y ajustes persistentes; seguro entre hilos y procesos"""
+
+    def __init__(self, ruta: str = None, json_alertas: str = None):
+        self.ruta = ruta or CONFIG_BASE_DATOS['archivo']
+        self.json_alertas = CONFIG_BASE_DATOS['json_alertas'] if json_alertas is None else json_alertas
+        self._local = threading.local()
+        if os.path.dirname(self.ruta):
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        conexion = self._conexion()
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.executescript(ESQUEMA)
+        self._migrar_json()
+
+    def _conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            # isolation_level=None: las transacciones se abren a mano con BEGIN IMMEDIATE
+            conexion = sqlite3.connect(self.ruta, timeout=CONFIG_BASE_DATOS['espera_bloqueo'],
+                                       isolation_level=None, check_same_thread=False)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+        return conexion
+
+    def _escribir(self, funcion):
+        """Ejecuta funcion(conexion) en una transacción de escritura y devuelve su resultado"""
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            resultado = funcion(conexion)
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        conexion.execute('COMMIT')
+        return resultado
+
+    def _migrar_json(self):
+        """Importa alertas_config.json conservando los ids, solo la primera vez"""
+        def migrar(conexion):
+            if conexion.execute("SELECT 1 FROM ajustes WHERE clave = 'migracion_json'").fetchone():
+                return 0
+            alertas = []
+            if self.json_alertas and os.path.exists(self.json_alertas):
+                try:
+                    with open(self.json_alertas, 'r') as f:
+                        alertas = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ No se pudo leer {self.json_alertas}: {e}")
+            for alerta in alertas:
+                conexion.execute(
+                    f"INSERT OR IGNORE INTO alertas (id, {', '.join(CAMPOS_ALERTA)}) VALUES (?{', ?' * len(CAMPOS_ALERTA)})",
+                    (alerta['id'], alerta.get('tipo'), alerta.get('cripto') or 'all', _numero(alerta.get('valor')),
+                     alerta.get('condicion'), _numero(alerta.get('histeresis')), _numero(alerta.get('enfriamiento')),
+                     int(alerta.get('activa', True)), alerta.get('fecha_creacion') or datetime.now().isoformat()))
+            conexion.execute("INSERT INTO ajustes (clave, valor) VALUES ('migracion_json', ?)",
+                             (json.dumps(datetime.now().isoformat()),))
+            return len(alertas)
+
+        migradas = self._escribir(migrar)
+        if migradas:
+            print(f"📦 {migradas} alertas migradas de {self.json_alertas} a {self.ruta}")
+
+    # ---- Alertas ----
+
+    def crear_alerta(self, datos: dict) -> dict:
+        """Inserta una alerta y la devuelve con su id (ValueError si el tipo, el valor o la condición no son válidos)"""
+        if not datos.get('tipo'):
+            raise ValueError('Tipo de alerta requerido')
+        reglas_alerta(datos)  # ValueError si el motor no podría evaluarla
+        fila = (datos['tipo'], datos.get('cripto') or 'all', _numero(datos.get('valor')), datos.get('condicion'),
+                _numero(datos.get('histeresis')), _numero(datos.get('enfriamiento')),
+                int(datos.get('activa', True)), datetime.now().isoformat())
+        id_alerta = self._escribir(lambda c: c.execute(
+            f"INSERT INTO alertas ({', '.join(CAMPOS_ALERTA)}) VALUES (?{', ?' * (len(CAMPOS_ALERTA) - 1)})",
+            fila).lastrowid)
+        return self.alerta(id_alerta)
+
+    def eliminar_alerta(self, id_alerta: int) -> bool:
+        return self._escribir(lambda c: c.execute('DELETE FROM alertas WHERE id = ?', (id_alerta,)).rowcount) > 0
+
+    def alerta(self, id_alerta: int) -> dict:
+        fila = self._conexion().execute('SELECT * FROM alertas WHERE id = ?', (id_alerta,)).fetchone()
+        return _alerta(fila) if fila else None
+
+    def alertas(self, cripto: str = None, tipo: str = None, solo_activas: bool = False) -> list:
+        """Alertas por id, filtradas por cripto y/o tipo (por los índices)"""
+        condiciones, parametros = [], []
+        if cripto:
+            condiciones.append('cripto = ?')
+            parametros.append(cripto)
+        if tipo:
+            condiciones.append('tipo = ?')
+            parametros.append(tipo)
+        if solo_activas:
+            condiciones.append('activa = 1')
+        consulta = 'SELECT * FROM alertas'
+        if condiciones:
+            consulta += ' WHERE ' + ' AND '.join(condiciones)
+        return [_alerta(f) for f in self._conexion().execute(consulta + ' ORDER BY id', parametros)]
+
+    # ---- Ajustes (valores JSON por clave) ----
+
+    def ajuste(self, clave: str, por_defecto=None):
+        fila = self._conexion().execute('SELECT valor FROM ajustes WHERE clave = ?', (clave,)).fetchone()
+        return json.loads(fila['valor']) if fila else por_defecto
+
+    def guardar_ajustes(self, ajustes: dict):
+        """Guarda varios ajustes en una sola transacción"""
+        filas = [(clave, json.dumps(valor)) for clave, valor in ajustes.items()]
+        self._escribir(lambda c: c.executemany(
+            'INSERT INTO ajustes (clave, valor) VALUES (?, ?) '
+            'ON CONFLICT(clave) DO UPDATE SET valor = excluded.valor', filas))
+
+    def cerrar(self):
+        """Cierra la conexión del hilo actual"""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is not None:
+            conexion.close()
+            self._local.conexion = None
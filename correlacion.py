@@ -0,0 +1,342 @@
+# correlacion.py - Matriz de correlación incremental y correlación móvil entre criptos
+#
+# MatrizCorrelacion guarda, sobre una ventana deslizante de retornos, las sumas Σx (por cripto)
+# y Σxy (por par, con Σx² en la diagonal). Cada vela nueva suma su producto exterior y resta el
+# de la vela que sale: O(N²) por vela sin volver a recorrer el histórico. Cada `recalcular_cada`
+# velas las sumas se rehacen desde la ventana para no acumular error de redondeo.
+#
+# CorrelacionOnline alinea por marca de tiempo las velas cerradas que llegan de cada cripto en
+# el modo online y mantiene un motor por conjunto de criptos consultado.
+#
+# correlacion_movil() calcula la correlación de cada par en todas las ventanas de una serie de
+# una sola pasada vectorizada (sumas acumuladas), para ver la deriva de la correlación.
+#
+# Para muchas criptos (offline), correlacion_dispersa() estandariza los retornos y calcula zᵀz
+# por bloques de columnas con BLAS, quedándose solo con los pares por encima o por debajo de los
+# umbrales. ArbolClusters guarda el linkage para recortar los clusters a otro `t` sin recalcular.
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from global_data import CONFIG_CORRELACION
+
+
+def correlacion_desde_sumas(suma: np.ndarray, productos: np.ndarray, n: int) -> np.ndarray:
+    """Matriz de correlación de Pearson a partir de Σx, Σxy y el número de observaciones"""
+    if n < 2:
+        return np.full(productos.shape, np.nan)
+    covarianza = productos - np.outer(suma, suma) / n
+    desviacion = np.sqrt(np.maximum(np.diag(covarianza), 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matriz = covarianza / np.outer(desviacion, desviacion)
+    matriz = np.clip(matriz, -1.0, 1.0)
+    constantes = desviacion == 0
+    matriz[constantes, :] = np.nan
+    matriz[:, constantes] = np.nan
+    np.fill_diagonal(matriz, np.where(constantes, np.nan, 1.0))
+    return matriz
+
+
+class MatrizCorrelacion:
+    """Correlación de N series sobre las últimas `ventana` velas, actualizada vela a vela"""
+
+    def __init__(self, n: int, ventana: int = None, recalcular_cada: int = None):
+        self.ventana = int(ventana or CONFIG_CORRELACION['ventana'])
+        self.recalcular_cada = int(recalcular_cada or CONFIG_CORRELACION['recalcular_cada'])
+        self._retornos = np.zeros((self.ventana, n))  # buffer circular de la ventana
+        self._suma = np.zeros(n)
+        self._productos = np.zeros((n, n))
+        self._ultimo_precio = None
+        self.observaciones = 0  # retornos dentro de la ventana
+        self.total = 0  # retornos añadidos desde el principio
+
+    def agregar_retornos(self, retornos):
+        retornos = np.asarray(retornos, dtype=np.float64)
+        posicion = self.total % self.ventana
+        if self.observaciones == self.ventana:
+            saliente = self._retornos[posicion]
+            self._suma -= saliente
+            self._productos -= np.outer(saliente, saliente)
+        else:
+            self.observaciones += 1
+        self._retornos[posicion] = retornos
+        self._suma += retornos
+        self._productos += np.outer(retornos, retornos)
+        self.total += 1
+        if self.total % self.recalcular_cada == 0:
+            self._recalcular()
+
+    def agregar_precios(self, precios):
+        """Añade el retorno respecto a los precios anteriores (la primera llamada solo los guarda)"""
+        precios = np.asarray(precios, dtype=np.float64)
+        if self._ultimo_precio is not None:
+            self.agregar_retornos(precios / self._ultimo_precio - 1)
+        self._ultimo_precio = precios
+
+    def _recalcular(self):
+        ventana = self._retornos[:self.observaciones]
+        self._suma = ventana.sum(axis=0)
+        self._productos = ventana.T @ ventana
+
+    def matriz(self) -> np.ndarray:
+        return correlacion_desde_sumas(self._suma, self._productos, self.observaciones)
+
+
+def correlacion_movil(retornos, ventana: int = None):
+    """
+    Correlación de cada par (i < j) en cada ventana de `ventana` filas, en una pasada.
+    Con un DataFrame devuelve un DataFrame (índice desde la primera ventana completa, columnas 'A-B');
+    con un array (T, N), un array (T - ventana + 1, N(N-1)/2) en el orden de np.triu_indices.
+    """
+    ventana = int(ventana or CONFIG_CORRELACION['ventana_movil'])
+    valores = np.asarray(retornos, dtype=np.float64)
+    filas, n = valores.shape
+    i, j = np.triu_indices(n, k=1)
+    if filas < ventana:
+        resultado = np.empty((0, len(i)))
+    else:
+        # Centrar no cambia la correlación y evita perder precisión en las sumas acumuladas
+        x = valores - valores.mean(axis=0)
+
+        def sumas_ventana(a):
+            acumulada = np.cumsum(a, axis=0)
+            acumulada = np.vstack([np.zeros((1, a.shape[1])), acumulada])
+            return acumulada[ventana:] - acumulada[:-ventana]
+
+        suma = sumas_ventana(x)
+        varianza = sumas_ventana(x * x) - suma * suma / ventana
+        covarianza = sumas_ventana(x[:, i] * x[:, j]) - suma[:, i] * suma[:, j] / ventana
+        with np.errstate(divide='ignore', invalid='ignore'):
+            resultado = covarianza / np.sqrt(np.maximum(varianza[:, i] * varianza[:, j], 0))
+        resultado = np.clip(resultado, -1.0, 1.0)
+
+    if not isinstance(retornos, pd.DataFrame):
+        return resultado
+    columnas = retornos.columns
+    return pd.DataFrame(resultado, index=retornos.index[ventana - 1:ventana - 1 + len(resultado)],
+                        columns=[f"{columnas[a]}-{columnas[b]}" for a, b in zip(i, j)])
+
+
+def marcas_ns(indice: pd.DatetimeIndex) -> np.ndarray:
+    """Marcas int64 (ns UTC) de un DatetimeIndex con o sin zona horaria"""
+    if indice.tz is not None:
+        indice = indice.tz_convert('UTC').tz_localize(None)
+    return indice.asi8
+
+
+class CorrelacionOnline:
+    """
+    Cierres de velas cerradas por cripto (marca ns -> precio) y un MatrizCorrelacion por conjunto
+    de criptos. Al llegar velas nuevas de una cripto, los motores que la incluyen avanzan con las
+    marcas que ya tienen todas sus criptos. Un solo escritor (el actualizador online) y lectores
+    desde las rutas: todo pasa por un lock.
+    """
+
+    def __init__(self, ventana: int = None, max_velas: int = None, max_motores: int = None):
+        self.ventana = int(ventana or CONFIG_CORRELACION['ventana'])
+        self.max_velas = int(max_velas or CONFIG_CORRELACION['max_velas'])
+        self.max_motores = int(max_motores or CONFIG_CORRELACION['max_motores'])
+        self._cierres = {}  # simbolo -> {marca_ns: cierre}, en orden de marca
+        self._actualizado = {}  # simbolo -> time.monotonic() de la última llegada
+        self._motores = {}  # tupla de símbolos -> [MatrizCorrelacion, última marca añadida]
+        self._lock = threading.Lock()
+
+    def agregar_cierres(self, simbolo: str, cierres: pd.Series):
+        """Añade las velas cerradas nuevas de una cripto (la serie puede repetir las ya vistas)"""
+        cierres = cierres.dropna()
+        if cierres.empty:
+            return
+        marcas, valores = marcas_ns(cierres.index), cierres.to_numpy(dtype=np.float64)
+        with self._lock:
+            self._actualizado[simbolo] = time.monotonic()
+            serie = self._cierres.get(simbolo)
+            if serie and marcas[-1] < next(reversed(serie)):
+                # La serie retrocede (proveedor replay en bucle): se empieza de nuevo
+                serie = None
+                self._motores = {clave: m for clave, m in self._motores.items() if simbolo not in clave}
+            if serie is None:
+                serie = self._cierres[simbolo] = {}
+            ultima = next(reversed(serie)) if serie else None
+            nuevas = [int(m) for m in (marcas if ultima is None else marcas[marcas > ultima])]
+            for marca, valor in zip(nuevas, valores[len(valores) - len(nuevas):]):
+                serie[marca] = float(valor)
+            while len(serie) > self.max_velas:
+                del serie[next(iter(serie))]
+            for clave, motor in self._motores.items():
+                if simbolo in clave:
+                    self._avanzar(clave, motor, nuevas)
+
+    def _avanzar(self, clave: tuple, motor: list, marcas: list):
+        series = [self._cierres[s] for s in clave]
+        for marca in marcas:
+            if marca <= motor[1]:
+                continue
+            precios = [serie.get(marca) for serie in series]
+            if None not in precios:
+                motor[0].agregar_precios(precios)
+                motor[1] = marca
+
+    def alineados(self, simbolos: list) -> pd.DataFrame:
+        """Cierres de las marcas comunes a todas las criptos (índice de fechas UTC)"""
+        with self._lock:
+            datos = {s: pd.Series(self._cierres[s]) for s in simbolos if self._cierres.get(s)}
+        df = pd.DataFrame(datos).dropna().sort_index()
+        df.index = pd.to_datetime(df.index, unit='ns')
+        return df
+
+    def simbolos(self) -> list:
+        """Criptos con cierres"""
+        with self._lock:
+            return [s for s, serie in self._cierres.items() if serie]
+
+    def pendientes(self, simbolos: list, segundos: float = None) -> list:
+        """Criptos sin cierres o sin velas nuevas desde hace más de `segundos`"""
+        segundos = CONFIG_CORRELACION['refresco_segundos'] if segundos is None else segundos
+        limite = time.monotonic() - segundos
+        with self._lock:
+            return [s for s in simbolos if not self._cierres.get(s) or self._actualizado.get(s, 0) < limite]
+
+    def matriz(self, simbolos: list) -> tuple:
+        """(matriz N×N, retornos en la ventana) de las criptos en el orden dado"""
+        clave = tuple(simbolos)
+        with self._lock:
+            motor = self._motores.pop(clave, None)
+            if motor is None:
+                # Motor nuevo: una sola pasada por las últimas `ventana` marcas comunes
+                motor = [MatrizCorrelacion(len(clave), self.ventana), -1]
+                comunes = set(self._cierres.get(clave[0], ()))
+                for simbolo in clave[1:]:
+                    comunes &= self._cierres.get(simbolo, {}).keys()
+                self._avanzar(clave, motor, sorted(comunes)[-(self.ventana + 1):])
+            self._motores[clave] = motor  # al final: los menos usados se descartan primero
+            while len(self._motores) > self.max_motores:
+                del self._motores[next(iter(self._motores))]
+            return motor[0].matriz(), motor[0].observaciones
+
+
+def estandarizar(retornos: np.ndarray) -> np.ndarray:
+    """Columnas centradas y de norma 1: zᵀz es la matriz de correlación (NaN si la columna es constante)"""
+    x = retornos - retornos.mean(axis=0)
+    norma = np.sqrt((x * x).sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = x / norma
+    z[:, norma == 0] = np.nan
+    return z
+
+
+def bloques_correlacion(z: np.ndarray, bloque: int = None):
+    """(columna inicial i, columna inicial j, bloque zᵢᵀzⱼ) del triángulo superior, un producto BLAS por bloque"""
+    n = z.shape[1]
+    bloque = int(bloque or CONFIG_CORRELACION['bloque'])
+    for a in range(0, n, bloque):
+        for b in range(a, n, bloque):
+            yield a, b, np.clip(z[:, a:a + bloque].T @ z[:, b:b + bloque], -1.0, 1.0)
+
+
+def correlacion_dispersa(retornos, bajo: float = None, alto: float = None, bloque: int = None,
+                         densa: bool = False, distancias: bool = False) -> dict:
+    """
+    Correlación de N series (columnas de `retornos`, sin NaN) calculada por bloques de columnas.
+    Devuelve los pares i < j con correlación < bajo o > alto ('i', 'j', 'valores', ordenados por i, j)
+    y las estadísticas del triángulo superior; con densa=True también la matriz N×N y con
+    distancias=True las distancias 1 - |c| en forma condensada (la que espera scipy linkage).
+    """
+    umbrales = CONFIG_CORRELACION['umbrales']
+    bajo = umbrales['bajo'] if bajo is None else bajo
+    alto = umbrales['alto'] if alto is None else alto
+    z = estandarizar(np.asarray(retornos, dtype=np.float64))
+    n = z.shape[1]
+    matriz = np.empty((n, n)) if densa else None
+    condensada = np.empty(n * (n - 1) // 2) if distancias else None
+    indices_i, indices_j, valores = [], [], []
+    suma, cuenta, maximo, minimo = 0.0, 0, -np.inf, np.inf
+
+    for a, b, c in bloques_correlacion(z, bloque):
+        fi = a + np.arange(c.shape[0])[:, None]
+        fj = b + np.arange(c.shape[1])[None, :]
+        superior = np.broadcast_to(fj > fi, c.shape)
+        if matriz is not None:
+            matriz[a:a + c.shape[0], b:b + c.shape[1]] = c
+            matriz[b:b + c.shape[1], a:a + c.shape[0]] = c.T
+        triangulo = c[superior]
+        validos = triangulo[~np.isnan(triangulo)]
+        if validos.size:
+            suma += validos.sum()
+            cuenta += validos.size
+            maximo = max(maximo, validos.max())
+            minimo = min(minimo, validos.min())
+        with np.errstate(invalid='ignore'):
+            seleccion = superior & ((c < bajo) | (c > alto))
+        pi, pj = np.nonzero(seleccion)
+        indices_i.append(pi + a)
+        indices_j.append(pj + b)
+        valores.append(c[pi, pj])
+        if condensada is not None:
+            gi, gj = np.nonzero(superior)
+            gi, gj = gi + a, gj + b
+            # Posición de (i, j) en la forma condensada de scipy; sin datos = sin relación (distancia 1)
+            condensada[n * gi - gi * (gi + 1) // 2 + (gj - gi - 1)] = 1 - np.abs(np.nan_to_num(c[superior]))
+
+    i = np.concatenate(indices_i) if indices_i else np.empty(0, dtype=np.int64)
+    j = np.concatenate(indices_j) if indices_j else np.empty(0, dtype=np.int64)
+    v = np.concatenate(valores) if valores else np.empty(0)
+    orden = np.lexsort((j, i))
+    resultado = {
+        'i': i[orden], 'j': j[orden], 'valores': v[orden],
+        'estadisticas': {
+            'correlacion_promedio': float(suma / cuenta) if cuenta else 0.0,
+            'max_correlacion': float(maximo) if cuenta else 0.0,
+            'min_correlacion': float(minimo) if cuenta else 0.0
+        }
+    }
+    if matriz is not None:
+        np.fill_diagonal(matriz, np.where(np.isnan(z).any(axis=0), np.nan, 1.0))
+        resultado['matriz'] = matriz
+    if condensada is not None:
+        resultado['distancias'] = condensada
+    return resultado
+
+
+class ArbolClusters:
+    """Linkage (media) de las distancias 1 - |correlación|: se corta a distintos `t` sin recalcularlo"""
+
+    def __init__(self, labels: list, distancias: np.ndarray):
+        from scipy.cluster.hierarchy import linkage
+        self.labels = list(labels)
+        self.linkage = linkage(distancias, method='average')
+
+    def cortar(self, t: float = 3, criterio: str = 'maxclust') -> list:
+        from scipy.cluster.hierarchy import fcluster
+        grupos = {}
+        for cripto, cluster_id in zip(self.labels, fcluster(self.linkage, t=t, criterion=criterio)):
+            grupos.setdefault(int(cluster_id), []).append(cripto)
+        return [{'id': k, 'criptomonedas': v} for k, v in grupos.items()]
+
+
+class CacheArboles:
+    """Últimos árboles de clusters por identificador (LRU)"""
+
+    def __init__(self, maximo: int = None):
+        self.maximo = int(maximo or CONFIG_CORRELACION['max_arboles'])
+        self._arboles = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str):
+        with self._lock:
+            arbol = self._arboles.pop(clave, None)
+            if arbol is not None:
+                self._arboles[clave] = arbol
+            return arbol
+
+    def guardar(self, clave: str, arbol: ArbolClusters) -> ArbolClusters:
+        with self._lock:
+            self._arboles.pop(clave, None)
+            self._arboles[clave] = arbol
+            while len(self._arboles) > self.maximo:
+                del self._arboles[next(iter(self._arboles))]
+        return arbol
+
+
+arboles_clusters = CacheArboles()
@@ -0,0 +1,73 @@
+# descargas.py - Descarga concurrente de históricos con reintentos y timeout
+#
+# Cada símbolo se descarga en un hilo de un pool acotado; las esperas de red se solapan
+# y el tiempo total pasa de la suma de todas las peticiones a aproximadamente la más lenta.
+# La fuente de datos es inyectable: cualquier callable (simbolo, period, interval, timeout)
+# que devuelva un DataFrame OHLCV sirve para pruebas sin red.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import yfinance as yf
+
+from global_data import CONFIG_ACTUALIZACION
+
+
+def historial_yahoo(simbolo: str, period: str, interval: str, timeout: float) -> pd.DataFrame:
+    """Histórico de Yahoo Finance para `simbolo`-USD (o el ticker tal cual si ya lleva par)"""
+    ticker = simbolo if '-' in simbolo else f"{simbolo}-USD"
+    return yf.Ticker(ticker).history(period=period, interval=interval, timeout=timeout)
+
+
+def descargar_con_reintentos(fuente, simbolo: str, period: str, interval: str, config: dict = None) -> dict:
+    """
+    Llama a `fuente` hasta `reintentos` veces, esperando `espera_reintento` segundos entre intentos.
+    Un DataFrame vacío cuenta como fallo (Yahoo lo devuelve ante errores transitorios).
+    """
+    config = config or CONFIG_ACTUALIZACION
+    intentos = max(1, int(config['reintentos']))
+    error = None
+
+    for intento in range(1, intentos + 1):
+        try:
+            datos = fuente(simbolo, period, interval, config['timeout'])
+            if datos is not None and not datos.empty:
+                return {'datos': datos, 'error': None, 'intentos': intento}
+            error = 'Sin datos'
+        except Exception as e:
+            error = str(e)
+        if intento < intentos:
+            time.sleep(config['espera_reintento'])
+
+    return {'datos': None, 'error': error, 'intentos': intentos}
+
+
+def descargar_historiales(simbolos: list, period: str = "7d", interval: str = "1h", fuente=None,
+                          trabajadores: int = None, config: dict = None) -> dict:
+    """
+    Descarga el histórico de todos los símbolos con concurrencia acotada.
+    Devuelve {'datos': {simbolo: DataFrame}, 'errores': {simbolo: mensaje}, 'tiempo_segundos'};
+    el orden de 'datos' es el de `simbolos`.
+    """
+    config = config or CONFIG_ACTUALIZACION
+    fuente = fuente or historial_yahoo
+    trabajadores = trabajadores or config['descargas_concurrentes']
+    inicio = time.perf_counter()
+
+    datos, errores = {}, {}
+    if simbolos:
+        with ThreadPoolExecutor(max_workers=max(1, min(trabajadores, len(simbolos)))) as pool:
+            futuros = [pool.submit(descargar_con_reintentos, fuente, s, period, interval, config)
+                       for s in simbolos]
+            for simbolo, futuro in zip(simbolos, futuros):
+                resultado = futuro.result()
+                if resultado['datos'] is not None:
+                    datos[simbolo] = resultado['datos']
+                else:
+                    errores[simbolo] = f"{resultado['error']} ({resultado['intentos']} intentos)"
+
+    return {
+        'datos': datos,
+        'errores': errores,
+        'tiempo_segundos': round(time.perf_counter() - inicio, 3)
+    }
@@ -0,0 +1,112 @@
+# difusion.py - Canal de eventos (Server-Sent Events) del modo online
+#
+# La actualización en segundo plano publica cada cambio una sola vez y el canal lo reparte
+# a todos los clientes conectados. Cada cliente tiene una cola acotada: los eventos con clave
+# (precio de una cripto, lista de anomalías) sustituyen al pendiente anterior con la misma
+# clave, y los eventos sueltos (alertas) descartan los más antiguos si el cliente va lento.
+import itertools
+import json
+import threading
+from collections import OrderedDict, deque
+
+from global_data import CONFIG_STREAM
+
+
+class Suscripcion:
+    """Cola de eventos pendientes de un cliente"""
+
+    def __init__(self, tamano_cola: int):
+        self._con_clave = OrderedDict()  # (tipo, clave) -> evento; solo interesa el último
+        self._sueltos = deque(maxlen=tamano_cola)
+        self._condicion = threading.Condition()
+        self.cerrada = False
+        self.descartados = 0
+
+    def entregar(self, evento: dict):
+        with self._condicion:
+            if evento['clave'] is not None:
+                indice = (evento['tipo'], evento['clave'])
+                if indice in self._con_clave:
+                    self.descartados += 1
+                    del self._con_clave[indice]
+                self._con_clave[indice] = evento
+            else:
+                if len(self._sueltos) == self._sueltos.maxlen:
+                    self.descartados += 1
+                self._sueltos.append(evento)
+            self._condicion.notify()
+
+    def siguientes(self, timeout: float) -> list:
+        """Espera hasta `timeout` y devuelve todos los eventos pendientes en orden de publicación"""
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._con_clave or self._sueltos or self.cerrada, timeout)
+            eventos = sorted(list(self._con_clave.values()) + list(self._sueltos), key=lambda e: e['id'])
+            self._con_clave.clear()
+            self._sueltos.clear()
+            return eventos
+
+    def cerrar(self):
+        with self._condicion:
+            self.cerrada = True
+            self._condicion.notify()
+
+
+class CanalEventos:
+    """Reparte cada evento publicado a todas las suscripciones activas"""
+
+    def __init__(self, maximo_clientes: int = None, tamano_cola: int = None):
+        self.maximo_clientes = maximo_clientes or CONFIG_STREAM['maximo_clientes']
+        self.tamano_cola = tamano_cola or CONFIG_STREAM['tamano_cola']
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.publicados = 0
+
+    def suscribir(self) -> Suscripcion:
+        """Nueva suscripción, o None si se alcanzó el máximo de clientes"""
+        with self._lock:
+            if len(self._suscripciones) >= self.maximo_clientes:
+                return None
+            suscripcion = Suscripcion(self.tamano_cola)
+            self._suscripciones.add(suscripcion)
+            return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+        suscripcion.cerrar()
+
+    def publicar(self, tipo: str, datos, clave: str = None):
+        """`clave` marca eventos que pueden sustituirse por uno más nuevo (p. ej. el precio de una cripto)"""
+        with self._lock:
+            evento = {'id': next(self._ids), 'tipo': tipo, 'clave': clave, 'datos': datos}
+            self.publicados += 1
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(evento)
+
+    def cerrar(self):
+        """Despierta y cierra todas las suscripciones (apagado)"""
+        with self._lock:
+            suscripciones, self._suscripciones = list(self._suscripciones), set()
+        for suscripcion in suscripciones:
+            suscripcion.cerrar()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'clientes': len(self._suscripciones),
+                'maximo_clientes': self.maximo_clientes,
+                'publicados': self.publicados,
+                'descartados': sum(s.descartados for s in self._suscripciones)
+            }
+
+
+def formato_sse(tipo: str, datos, id_evento: int = None) -> str:
+    """Serializa un evento en el formato de text/event-stream"""
+    lineas = []
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"event: {tipo}")
+    lineas.append(f"data: {json.dumps(datos, default=str)}")
+    return "\n".join(lineas) + "\n\n"
@@ -0,0 +1,92 @@
+# estado_online.py - Estado del modo online en instantáneas inmutables versionadas
+#
+# El actualizador construye una instantánea nueva (copia en escritura por cripto) y la
+# publica cambiando una sola referencia; los lectores toman la instantánea vigente sin
+# locks y la recorren sin riesgo de que cambie a mitad. Cada publicación incrementa la
+# versión, lo que permite a los clientes preguntar "¿cambió desde la versión N?".
+# El historial de precios vive en buffers circulares (buffer_precios.py): la instantánea solo
+# guarda cuántos puntos tenía cada cripto al publicarse y lee su ventana como vista.
+import threading
+from datetime import datetime
+
+from buffer_precios import HistorialPrecios
+
+
+class Instantanea:
+    """
+    Estado online en una versión concreta. Los diccionarios no se modifican nunca
+    después de publicarse: tratarlos como de solo lectura.
+    """
+    __slots__ = ('version', 'ultima_actualizacion', 'datos_actuales', 'analisis_actuales',
+                 'historial_precios', '_historial')
+
+    def __init__(self, version: int = 0, ultima_actualizacion: str = None, datos_actuales: dict = None,
+                 analisis_actuales: dict = None, historial_precios: dict = None,
+                 historial: HistorialPrecios = None):
+        self.version = version
+        self.ultima_actualizacion = ultima_actualizacion
+        self.datos_actuales = datos_actuales or {}
+        self.analisis_actuales = analisis_actuales or {}
+        self.historial_precios = historial_precios or {}  # simbolo -> puntos añadidos al publicar
+        self._historial = historial
+
+    @property
+    def criptos(self) -> list:
+        return list(self.datos_actuales.keys())
+
+    def historial(self, simbolo: str, n: int = None) -> tuple:
+        """(marcas ns, valores OHLCV) de los últimos `n` puntos de esta versión, como vistas; None si no hay"""
+        if self._historial is None or simbolo not in self.historial_precios:
+            return None
+        return self._historial.buffer(simbolo).ventana(n, hasta=self.historial_precios[simbolo])
+
+
+class EstadoOnline:
+    """Almacén de instantáneas: un solo escritor a la vez, lectores sin lock"""
+
+    def __init__(self, historial: HistorialPrecios = None):
+        self.historial = historial or HistorialPrecios()
+        self._actual = Instantanea(historial_precios=self.historial.totales(), historial=self.historial)
+        self._condicion = threading.Condition()
+
+    def instantanea(self) -> Instantanea:
+        """Instantánea vigente (lectura atómica de una referencia)"""
+        return self._actual
+
+    @property
+    def version(self) -> int:
+        return self._actual.version
+
+    def publicar(self, cambios: dict, ultima_actualizacion: str = None) -> Instantanea:
+        """
+        Publica una versión nueva. `cambios` = {simbolo: {'datos': {...}, 'analisis': {...},
+        'punto': {'marca_ns': int, 'valores': OHLCV}}}; las criptos que no aparecen se comparten
+        con la versión anterior.
+        """
+        with self._condicion:
+            anterior = self._actual
+            datos = dict(anterior.datos_actuales)
+            analisis = dict(anterior.analisis_actuales)
+            historial = dict(anterior.historial_precios)
+            for simbolo, cambio in cambios.items():
+                if 'datos' in cambio:
+                    datos[simbolo] = cambio['datos']
+                if 'analisis' in cambio:
+                    analisis[simbolo] = cambio['analisis']
+                if 'punto' in cambio:
+                    # Las versiones anteriores siguen viendo su tramo: solo cambia el total
+                    punto = cambio['punto']
+                    historial[simbolo] = self.historial.agregar(simbolo, punto['marca_ns'], punto['valores'])
+            nueva = Instantanea(anterior.version + 1,
+                                ultima_actualizacion or datetime.now().isoformat(),
+                                datos, analisis, historial, self.historial)
+            self._actual = nueva
+            self._condicion.notify_all()
+            return nueva
+
+    def esperar_cambio(self, version: int, timeout: float = 0) -> Instantanea:
+        """Devuelve la instantánea vigente en cuanto su versión supera `version` (o al agotar `timeout`)"""
+        if timeout and self._actual.version <= version:
+            with self._condicion:
+                self._condicion.wait_for(lambda: self._actual.version > version, timeout)
+        return self._actual
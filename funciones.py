@@ -8,11 +8,22 @@ import os
 import re
 import json
 import csv
+import hashlib
 import requests
 from bs4 import BeautifulSoup
-import yfinance as yf
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import StandardScaler
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from global_data import CONFIG_CORRELACION, CONFIG_RENDIMIENTO
+from cache_datos import cache_dataframes, firma_archivo
+from almacen_datos import guardar_serie, cargar_serie, leer_rango, recortar_rango
+from indicadores import MotorIndicadores, calcular_indicadores, INDICADORES_DISPONIBLES
+from backtesting import ejecutar_backtesting, optimizar_backtesting
+from montecarlo import simular_montecarlo
+from proveedores import obtener_proveedor
+from correlacion import correlacion_dispersa, ArbolClusters, arboles_clusters
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -20,18 +31,40 @@ plt.style.use('seaborn-v0_8-darkgrid')
 
 # ==================== FUNCIONES DE CARGA DE DATOS ====================
 
-def importar_base_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> pd.DataFrame:
-    archivo_csv = os.path.join(carpeta_data, f"{nombre_cripto}.csv")
+def archivo_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> str:
+    """Ruta del CSV de una cripto (<nombre>.csv o <nombre>_online.csv); None si no existe"""
+    for archivo in (f"{nombre_cripto}.csv", f"{nombre_cripto}_online.csv"):
+        ruta = os.path.join(carpeta_data, archivo)
+        if os.path.exists(ruta):
+            return ruta
+    return None
+
+def importar_base_cripto(nombre_cripto: str, carpeta_data: str = "datos",
+                         desde=None, hasta=None, ultimos_n: int = None) -> pd.DataFrame:
+    """
+    Carga y normaliza el CSV de una cripto. Con desde/hasta/ultimos_n devuelve solo
+    ese tramo; si la serie está en el almacén binario no se lee el resto del archivo.
+    """
+    archivo_csv = archivo_cripto(nombre_cripto, carpeta_data)
     
-    if not os.path.exists(archivo_csv):
-        archivo_online = os.path.join(carpeta_data, f"{nombre_cripto}_online.csv")
-        if os.path.exists(archivo_online):
-            archivo_csv = archivo_online
-        else:
-            print(f"Archivo no encontrado: {archivo_csv}")
-            return crear_datos_ejemplo_cripto(nombre_cripto)
+    if archivo_csv is None:
+        print(f"Archivo no encontrado: {os.path.join(carpeta_data, f'{nombre_cripto}.csv')}")
+        return recortar_rango(crear_datos_ejemplo_cripto(nombre_cripto), desde, hasta, ultimos_n)
+    
+    # Reutilizar el DataFrame ya normalizado si el archivo no cambió
+    df_cache = cache_dataframes.obtener(archivo_csv)
+    if df_cache is not None:
+        return recortar_rango(df_cache, desde, hasta, ultimos_n)
+    
+    nombre_archivo = os.path.splitext(os.path.basename(archivo_csv))[0]
+    # Versión binaria (memmap, sin copia) si el CSV no cambió desde que se guardó
+    df_almacen = leer_rango(nombre_archivo, desde, hasta, carpeta_data=carpeta_data,
+                            ultimos_n=ultimos_n, ruta_origen=archivo_csv)
+    if df_almacen is not None:
+        return df_almacen
     
     try:
+        firma = firma_archivo(archivo_csv)
         encodings = ['utf-8-sig', 'latin-1', 'iso-8859-1', 'cp1252']
         df = None
         
@@ -88,11 +121,11 @@ def importar_base_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> pd.
             df = df.dropna(subset=['Date'])
             df.set_index('Date', inplace=True)
         
-        numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume']
+        numeric_cols = ['Open', 'High', 'Low', 'Close', 'Volume', 'Change']
         for col in numeric_cols:
             if col in df.columns:
                 if df[col].dtype == object:
-                    df[col] = df[col].astype(str).apply(convertir_precio_europeo)
+                    df[col] = convertir_columna_europea(df[col])
                 df[col] = pd.to_numeric(df[col], errors='coerce')
         
         if 'Close' not in df.columns and len(df.columns) > 0:
@@ -110,12 +143,14 @@ def importar_base_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> pd.
         df = df.fillna(method='ffill').fillna(method='bfill')
         df.sort_index(inplace=True)
         
+        cache_dataframes.guardar(archivo_csv, df, firma)
+        guardar_serie(df, nombre_archivo, carpeta_data, ruta_origen=archivo_csv, firma_origen=firma)
         print(f"✅ Datos cargados: {nombre_cripto} ({len(df)} registros)")
-        return df
+        return recortar_rango(df, desde, hasta, ultimos_n)
         
     except Exception as e:
         print(f"❌ Error cargando {nombre_cripto}: {str(e)}")
-        return crear_datos_ejemplo_cripto(nombre_cripto)
+        return recortar_rango(crear_datos_ejemplo_cripto(nombre_cripto), desde, hasta, ultimos_n)
 
 def listar_criptomonedas_disponibles(carpeta_data: str = "datos") -> list:
     criptos = []
@@ -158,6 +193,139 @@ def convertir_precio_europeo(valor: str) -> float:
     except:
         return np.nan
 
+# Sufijos de magnitud usados por investing.com en la columna de volumen (109,59K)
+SUFIJOS_MAGNITUD = {'K': 1e3, 'M': 1e6, 'B': 1e9}
+
+_SUFIJOS_ORDENADOS = sorted(SUFIJOS_MAGNITUD.items(), key=lambda kv: ord(kv[0]))
+_CODIGOS_SUFIJO = np.array([ord(k) for k, _ in _SUFIJOS_ORDENADOS], dtype=np.uint32)
+_MULTIPLICADOR_SUFIJO = np.array([v for _, v in _SUFIJOS_ORDENADOS])
+# Potencias de 10 exactas: mantisa entera / 10**k reproduce float(texto) bit a bit
+_POTENCIAS_10 = np.array([float(10 ** i) for i in range(16)])
+_MAX_DIGITOS = 15
+
+# Clase de cada carácter (tabla de consulta por código Unicode < 256)
+_IGNORADO, _DIGITO, _COMA, _PUNTO, _MENOS, _MAS, _SUFIJO, _INVALIDO = range(8)
+_CLASE_CARACTER = np.full(257, _INVALIDO, dtype=np.uint8)
+_CLASE_CARACTER[[0] + [ord(c) for c in '$% \t\r\n\xa0']] = _IGNORADO
+_CLASE_CARACTER[ord('0'):ord('9') + 1] = _DIGITO
+_CLASE_CARACTER[ord(',')] = _COMA
+_CLASE_CARACTER[ord('.')] = _PUNTO
+_CLASE_CARACTER[ord('-')] = _MENOS
+_CLASE_CARACTER[ord('+')] = _MAS
+_CLASE_CARACTER[_CODIGOS_SUFIJO] = _SUFIJO
+
+def _ultima_posicion(mascara: np.ndarray) -> np.ndarray:
+    """Índice de la última posición True de cada columna (-1 si no hay)"""
+    pesos = np.arange(1, mascara.shape[0] + 1, dtype=np.int16)[:, None]
+    return (mascara * pesos).max(axis=0) - 1
+
+def _primera_posicion(mascara: np.ndarray) -> np.ndarray:
+    """Índice de la primera posición True de cada columna (-1 si no hay)"""
+    ancho = mascara.shape[0]
+    pesos = np.arange(ancho, 0, -1, dtype=np.int16)[:, None]
+    posicion = ancho - (mascara * pesos).max(axis=0)
+    return np.where(posicion == ancho, -1, posicion)
+
+def _contar_hasta(acumulado: np.ndarray, posicion: np.ndarray) -> np.ndarray:
+    """Valor del conteo acumulado en `posicion` para cada columna (0 si posicion == -1)"""
+    columnas = np.arange(acumulado.shape[1])
+    return np.where(posicion >= 0, acumulado[np.maximum(posicion, 0), columnas], 0)
+
+def _elegir_separador_decimal(n_comas, n_puntos, ultima_coma, ultimo_punto,
+                              digitos_tras_coma, parte_entera_cero) -> int:
+    """Decide para toda la columna si el separador decimal es '.' o ','"""
+    con_coma = n_comas > 0
+    
+    # Valores con ambos separadores: el último en aparecer es el decimal
+    ambos = con_coma & (n_puntos > 0)
+    if ambos.any():
+        return _COMA if (ultima_coma[ambos] > ultimo_punto[ambos]).mean() >= 0.5 else _PUNTO
+    
+    if con_coma.any():
+        if (n_comas > 1).any():
+            return _PUNTO
+        # Grupos de exactamente 3 dígitos sin parte entera cero = separador de miles
+        if (digitos_tras_coma[con_coma] != 3).any() or parte_entera_cero[con_coma].any():
+            return _COMA
+        return _PUNTO
+    
+    if (n_puntos > 1).any():
+        return _COMA
+    return _PUNTO
+
+def convertir_columna_europea(serie: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de convertir_precio_europeo para una columna completa.
+    El separador decimal se detecta una vez por columna y el texto se procesa
+    como una matriz de códigos de carácter (posición x fila) con NumPy.
+    Admite sufijos K/M/B (volumen) y porcentajes ('-0,51%' -> -0.51).
+    Las celdas con caracteres no numéricos se delegan a convertir_precio_europeo.
+    """
+    texto = serie.to_numpy(dtype=object).astype(str)
+    n = len(texto)
+    ancho = texto.dtype.itemsize // 4
+    if n == 0 or ancho == 0:
+        return pd.Series(np.full(n, np.nan), index=serie.index, name=serie.name)
+    
+    codigos = np.ascontiguousarray(texto.view(np.uint32).reshape(n, ancho).T)
+    clase = _CLASE_CARACTER[np.minimum(codigos, 256)]
+    clase[codigos == ord('€')] = _IGNORADO
+    
+    es_digito = clase == _DIGITO
+    es_coma = clase == _COMA
+    es_punto = clase == _PUNTO
+    es_signo = (clase == _MENOS) | (clase == _MAS)
+    es_sufijo = clase == _SUFIJO
+    digitos_acumulados = es_digito.cumsum(axis=0, dtype=np.int16)
+    
+    n_digitos = digitos_acumulados[-1]
+    n_comas = es_coma.sum(axis=0)
+    n_puntos = es_punto.sum(axis=0)
+    n_sufijos = es_sufijo.sum(axis=0)
+    ultima_coma = _ultima_posicion(es_coma)
+    ultimo_punto = _ultima_posicion(es_punto)
+    primera_coma = _primera_posicion(es_coma)
+    primer_digito_pos = np.maximum(_primera_posicion(es_digito), 0)
+    
+    digitos_tras_coma = n_digitos - _contar_hasta(digitos_acumulados, ultima_coma)
+    primer_digito = codigos[primer_digito_pos, np.arange(n)].astype(np.int64) - 48
+    parte_entera_cero = (_contar_hasta(digitos_acumulados, primera_coma) == 1) & (primer_digito == 0)
+    
+    decimal = _elegir_separador_decimal(n_comas, n_puntos, ultima_coma, ultimo_punto,
+                                        digitos_tras_coma, parte_entera_cero)
+    ultimo_decimal = ultima_coma if decimal == _COMA else ultimo_punto
+    n_decimales = n_comas if decimal == _COMA else n_puntos
+    escala = n_digitos - _contar_hasta(digitos_acumulados, ultimo_decimal)
+    escala = np.where(ultimo_decimal >= 0, escala, 0)
+    
+    # Mantisa entera exacta (Horner sobre las posiciones de carácter)
+    mantisa = np.zeros(n, dtype=np.int64)
+    for pos in range(ancho):
+        mantisa = np.where(es_digito[pos], mantisa * 10 + (codigos[pos].astype(np.int64) - 48), mantisa)
+    
+    ultimo_significativo = _ultima_posicion(clase != _IGNORADO)
+    clase_final = clase[np.maximum(ultimo_significativo, 0), np.arange(n)]
+    ultimo_signo = _ultima_posicion(es_signo)
+    
+    invalido = (clase == _INVALIDO).any(axis=0)
+    invalido |= (n_digitos == 0) | (n_digitos > _MAX_DIGITOS) | (n_decimales > 1)
+    invalido |= (ultimo_signo >= 0) & (ultimo_signo > primer_digito_pos)
+    invalido |= (n_sufijos > 1) | ((n_sufijos == 1) & (clase_final != _SUFIJO))
+    
+    valores = mantisa / _POTENCIAS_10[np.minimum(escala, _MAX_DIGITOS)]
+    valores = np.where((clase == _MENOS).any(axis=0), -valores, valores)
+    
+    con_sufijo = (n_sufijos == 1) & ~invalido
+    if con_sufijo.any():
+        codigo_sufijo = codigos[ultimo_significativo[con_sufijo], np.flatnonzero(con_sufijo)]
+        valores[con_sufijo] *= _MULTIPLICADOR_SUFIJO[np.searchsorted(_CODIGOS_SUFIJO, codigo_sufijo)]
+    
+    # Celdas raras (notación científica, texto, 'nan', '-') con el parser escalar original
+    if invalido.any():
+        valores[invalido] = [convertir_precio_europeo(v) for v in texto[invalido]]
+    
+    return pd.Series(valores, index=serie.index, name=serie.name)
+
 def crear_datos_ejemplo_cripto(nombre_cripto: str) -> pd.DataFrame:
     print(f"Generando datos de ejemplo para {nombre_cripto}...")
     
@@ -411,9 +579,10 @@ def tomar_desiciones(current_price: float, estadisticas: dict,
         'razones': razones
     }
 
-def analisis_rapido_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> dict:
+def analisis_rapido_cripto(nombre_cripto: str, carpeta_data: str = "datos",
+                           desde=None, hasta=None, ultimos_n: int = None) -> dict:
     try:
-        df = importar_base_cripto(nombre_cripto, carpeta_data)
+        df = importar_base_cripto(nombre_cripto, carpeta_data, desde, hasta, ultimos_n)
         
         if df.empty or len(df) < 10:
             return {'success': False, 'error': 'Datos insuficientes'}
@@ -446,32 +615,56 @@ def analisis_rapido_cripto(nombre_cripto: str, carpeta_data: str = "datos") -> d
     except Exception as e:
         return {'success': False, 'error': str(e), 'cripto': nombre_cripto}
 
+def _analisis_cronometrado(nombre_cripto: str, carpeta_data: str, rango: dict) -> dict:
+    inicio = time.perf_counter()
+    try:
+        resultado = analisis_rapido_cripto(nombre_cripto, carpeta_data, **rango)
+    except Exception as e:
+        resultado = {'success': False, 'error': str(e), 'cripto': nombre_cripto}
+    resultado['tiempo_segundos'] = round(time.perf_counter() - inicio, 4)
+    return resultado
+
+def analisis_lote_criptos(criptos: list, carpeta_data: str = "datos", procesos: int = None,
+                          **rango) -> list:
+    """
+    Ejecuta analisis_rapido_cripto para varias criptos. Por defecto una tras otra: el análisis
+    es de CPU y con hilos solo compite por el GIL. Con CONFIG_RENDIMIENTO['analisis_paralelo']
+    ['procesos'] > 1 (o `procesos`, acotado por la configuración y los núcleos) los lotes grandes
+    se reparten en un ProcessPoolExecutor, útil cuando hay que parsear muchos CSV en frío.
+    Devuelve los resultados en el mismo orden que `criptos`, cada uno con su 'tiempo_segundos';
+    un error en una cripto solo afecta a su resultado.
+    """
+    config = CONFIG_RENDIMIENTO['analisis_paralelo']
+    maximo_procesos = config['procesos'] or os.cpu_count() or 1
+    procesos = max(1, min(int(procesos or maximo_procesos), maximo_procesos, len(criptos) or 1))
+
+    if procesos == 1 or len(criptos) < config['minimo_para_paralelizar']:
+        return [_analisis_cronometrado(c, carpeta_data, rango) for c in criptos]
+
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        return list(ejecutor.map(_analisis_cronometrado, criptos, repeat(carpeta_data), repeat(rango)))
+
 def calcular_rsi(prices, period=14):
-    delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss.replace(0, np.nan)
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.fillna(50)
+    motor = MotorIndicadores(prices.to_numpy(dtype=np.float64))
+    return pd.Series(motor.rsi(period), index=prices.index)
 
 def calcular_macd(prices, fast=12, slow=26, signal=9):
-    ema_fast = prices.ewm(span=fast).mean()
-    ema_slow = prices.ewm(span=slow).mean()
-    macd = ema_fast - ema_slow
-    signal_line = macd.ewm(span=signal).mean()
-    histogram = macd - signal_line
+    motor = MotorIndicadores(prices.to_numpy(dtype=np.float64))
+    macd = motor.macd(fast, slow, signal)
     return pd.DataFrame({
-        'macd': macd,
-        'signal': signal_line,
-        'histogram': histogram
-    })
+        'macd': macd['macd'],
+        'signal': macd['macd_signal'],
+        'histogram': macd['macd_hist']
+    }, index=prices.index)
 
 def calcular_bollinger_bands(prices, period=20, std_dev=2):
-    sma = prices.rolling(window=period).mean()
-    std = prices.rolling(window=period).std()
-    upper = sma + (std * std_dev)
-    lower = sma - (std * std_dev)
-    return pd.DataFrame({'upper': upper, 'middle': sma, 'lower': lower})
+    motor = MotorIndicadores(prices.to_numpy(dtype=np.float64))
+    bandas = motor.bollinger(period, std_dev)
+    return pd.DataFrame({
+        'upper': bandas['bb_upper'],
+        'middle': bandas['bb_middle'],
+        'lower': bandas['bb_lower']
+    }, index=prices.index)
 
 # ==================== FUNCIONES DE EXPORTACIÓN ====================
 
@@ -829,8 +1022,7 @@ def procesar_csv_subido(ruta_archivo: str) -> dict:
         for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
             if col in df.columns:
                 if df[col].dtype == object:
-                    df[col] = df[col].astype(str).str.replace(',', '.')
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                    df[col] = convertir_columna_europea(df[col])
         
         if 'Close' not in df.columns:
             return {'success': False, 'message': 'Columna de precio (Close) no encontrada'}
@@ -897,6 +1089,11 @@ def guardar_csv_cripto(df: pd.DataFrame, nombre_cripto: str, carpeta_data: str =
             df_guardar['Date'] = pd.to_datetime(df_guardar['Date']).dt.strftime('%Y-%m-%d')
         
         df_guardar.to_csv(archivo, index=False, encoding='utf-8-sig')
+        
+        # Escribir también la versión binaria para no re-parsear el CSV al leerlo
+        if 'Date' in df_guardar.columns:
+            df_binario = df_guardar.set_index(pd.to_datetime(df_guardar['Date'])).drop(columns=['Date'])
+            guardar_serie(df_binario, nombre_cripto, carpeta_data, ruta_origen=archivo)
         return True
     except Exception as e:
         print(f"Error guardando CSV: {e}")
@@ -905,32 +1102,21 @@ def guardar_csv_cripto(df: pd.DataFrame, nombre_cripto: str, carpeta_data: str =
 # ==================== FUNCIONES DE SIMULACIÓN ====================
 def generar_datos_sinteticos(precio_inicial: float = 50000, dias: int = 90,
                             volatilidad: float = 0.03, tendencia: float = 0.001,
-                            nombre: str = 'Simulacion') -> pd.DataFrame:
+                            nombre: str = 'Simulacion', iteraciones: int = None,
+                            distribucion: str = 'normal', semilla: int = None) -> pd.DataFrame:
     """
     Genera datos sintéticos de mercado usando SIMULACIÓN DE MONTE CARLO.
     Simula múltiples trayectorias y devuelve la media como serie final.
     """
-    np.random.seed(int(datetime.now().timestamp()) % 10000)
-
-    # Parámetros de Monte Carlo
-    num_simulaciones = 1000
-    dt = 1  # un paso por día
-
-    # Arrays para almacenar trayectorias
-    trayectorias = np.zeros((num_simulaciones, dias))
-    trayectorias[:, 0] = precio_inicial
-
-    # Simulación Monte Carlo con movimiento browniano geométrico
-    for t in range(1, dias):
-        # Shock aleatorio normal
-        z = np.random.standard_normal(num_simulaciones)
-        # Fórmula de GBM: S_t = S_{t-1} * exp((mu - 0.5*sigma^2)*dt + sigma*sqrt(dt)*z)
-        trayectorias[:, t] = trayectorias[:, t-1] * np.exp(
-            (tendencia - 0.5 * volatilidad**2) * dt + volatilidad * np.sqrt(dt) * z
-        )
+    simulacion = simular_montecarlo(precio_inicial, dias, volatilidad, tendencia,
+                                    iteraciones=iteraciones, distribucion=distribucion, semilla=semilla)
+    return ohlcv_desde_trayectoria(simulacion['media'], volatilidad, semilla)
 
-    # Usamos la trayectoria media como representativa
-    precios_medios = np.mean(trayectorias, axis=0)
+def ohlcv_desde_trayectoria(precios_medios: np.ndarray, volatilidad: float = 0.03,
+                            semilla: int = None) -> pd.DataFrame:
+    """Construye un DataFrame OHLCV diario a partir de una trayectoria de cierres"""
+    rng = np.random.default_rng(semilla)
+    dias = len(precios_medios)
 
     # Generar fechas
     fechas = pd.date_range(end=datetime.now(), periods=dias, freq='D')
@@ -945,21 +1131,21 @@ def generar_datos_sinteticos(precio_inicial: float = 50000, dias: int = 90,
 
     # Simular High y Low con ruido intra-día
     intraday_vol = volatilidad * 0.5
-    df['High'] = df[['Open', 'Close']].max(axis=1) * (1 + np.abs(np.random.normal(0, intraday_vol, dias)))
-    df['Low'] = df[['Open', 'Close']].min(axis=1) * (1 - np.abs(np.random.normal(0, intraday_vol, dias)))
+    df['High'] = df[['Open', 'Close']].max(axis=1) * (1 + np.abs(rng.normal(0, intraday_vol, dias)))
+    df['Low'] = df[['Open', 'Close']].min(axis=1) * (1 - np.abs(rng.normal(0, intraday_vol, dias)))
 
     # Volumen simulado con correlación al cambio de precio
     cambio_pct = df['Close'].pct_change().fillna(0)
-    volumen_base = np.random.lognormal(20, 1, dias)
+    volumen_base = rng.lognormal(20, 1, dias)
     df['Volume'] = volumen_base * (1 + np.abs(cambio_pct) * 10)
 
     return df
+
 # ==================== FUNCIONES DE SENTIMIENTO Y ANOMALÍAS ====================
 
 def obtener_sentimiento_mercado_real(cripto: str = "Bitcoin") -> dict:
     try:
-        ticker = yf.Ticker(f"{cripto}-USD" if '-' not in cripto else cripto)
-        hist = ticker.history(period="30d", interval="1d")
+        hist = obtener_proveedor().historial(cripto, period="30d", interval="1d")
         
         if hist.empty:
             return {'error': 'Sin datos disponibles'}
@@ -1141,13 +1327,25 @@ def generar_explicacion_ia_completa(cripto: str, indicadores: dict) -> str:
 
 # ==================== FUNCIONES DE CORRELACIÓN ====================
 
-def calcular_correlacion_criptos(criptos: list, carpeta_data: str = "datos") -> dict:
+def calcular_correlacion_criptos(criptos: list, carpeta_data: str = "datos", modo: str = None,
+                                 t_clusters: float = 3) -> dict:
+    """
+    Matriz de correlación de los retornos, recomendaciones por par y clusters.
+    modo 'denso' devuelve la matriz N×N; 'disperso' solo los pares fuera de los umbrales de
+    CONFIG_CORRELACION (por defecto, disperso a partir de CONFIG_CORRELACION['max_denso'] criptos).
+    El linkage de los clusters queda en caché: 'arbol_clusters' permite recortarlos a otro t.
+    """
     datos = {}
+    firmas = {}
     
     for cripto in criptos:
+        # Firma tomada antes de leer: si el archivo cambia después, la próxima clave será otra
+        archivo = archivo_cripto(cripto, carpeta_data)
+        firma = firma_archivo(archivo) if archivo else None
         df = importar_base_cripto(cripto, carpeta_data)
         if not df.empty and len(df) > 10:
             datos[cripto] = df['Close']
+            firmas[cripto] = firma
     
     if len(datos) < 2:
         return {'error': 'Se necesitan al menos 2 criptomonedas con datos suficientes'}
@@ -1159,157 +1357,100 @@ def calcular_correlacion_criptos(criptos: list, carpeta_data: str = "datos") ->
         return {'error': 'Datos históricos insuficientes para correlación'}
     
     returns = df_combined.pct_change().dropna()
-    corr_matrix = returns.corr()
+    labels = list(returns.columns)
+    modo = modo or ('disperso' if len(labels) > CONFIG_CORRELACION['max_denso'] else 'denso')
+    if modo not in ('denso', 'disperso'):
+        raise ValueError(f"Modo no soportado: {modo} (usa denso o disperso)")
+    umbrales = CONFIG_CORRELACION['umbrales']
+    
+    # El linkage depende de las criptos y de los datos usados: misma clave = mismo árbol.
+    # La firma (mtime_ns, tamaño) de cada archivo detecta un CSV editado con el mismo rango de fechas
+    clave = hashlib.sha1(repr((labels, carpeta_data, [firmas[c] for c in labels], len(returns),
+                               str(returns.index[0]), str(returns.index[-1]))).encode()).hexdigest()[:16]
+    arbol = arboles_clusters.obtener(clave)
+    resultado = correlacion_dispersa(returns.to_numpy(), umbrales['bajo'], umbrales['alto'],
+                                     densa=modo == 'denso', distancias=arbol is None)
+    if arbol is None:
+        try:
+            arbol = arboles_clusters.guardar(clave, ArbolClusters(labels, resultado['distancias']))
+        except Exception:
+            arbol = None
     
+    # Solo los pares fuera de los umbrales generan recomendación
     recomendaciones = []
-    matriz_valores = []
-    
-    for i in range(len(corr_matrix.columns)):
-        fila = []
-        for j in range(len(corr_matrix.columns)):
-            val = corr_matrix.iloc[i, j]
-            fila.append(float(val))
-            
-            if i < j:
-                corr_val = corr_matrix.iloc[i, j]
-                if corr_val < 0.3:
-                    recomendaciones.append({
-                        'par': f"{corr_matrix.columns[i]}-{corr_matrix.columns[j]}",
-                        'correlacion': float(corr_val),
-                        'tipo': 'Diversificación ideal',
-                        'mensaje': f'Baja correlación ({corr_val:.2f}) - Buena para diversificar riesgo',
-                        'estrategia': 'Incluir ambas en cartera para reducir riesgo sistemático'
-                    })
-                elif corr_val > 0.9:
-                    recomendaciones.append({
-                        'par': f"{corr_matrix.columns[i]}-{corr_matrix.columns[j]}",
-                        'correlacion': float(corr_val),
-                        'tipo': 'Movimiento sincronizado',
-                        'mensaje': f'Alta correlación ({corr_val:.2f}) - Se mueven juntas',
-                        'estrategia': 'Evitar sobreexposición, no aportan diversificación'
-                    })
-                elif corr_val > 0.7:
-                    recomendaciones.append({
-                        'par': f"{corr_matrix.columns[i]}-{corr_matrix.columns[j]}",
-                        'correlacion': float(corr_val),
-                        'tipo': 'Correlación moderada-alta',
-                        'mensaje': f'Correlación significativa ({corr_val:.2f})',
-                        'estrategia': 'Limitar exposición combinada'
-                    })
-        matriz_valores.append(fila)
-    
-    clusters = identificar_clusters(corr_matrix)
+    for i, j, corr_val in zip(resultado['i'].tolist(), resultado['j'].tolist(), resultado['valores'].tolist()):
+        par = f"{labels[i]}-{labels[j]}"
+        if corr_val < umbrales['bajo']:
+            recomendaciones.append({
+                'par': par,
+                'correlacion': corr_val,
+                'tipo': 'Diversificación ideal',
+                'mensaje': f'Baja correlación ({corr_val:.2f}) - Buena para diversificar riesgo',
+                'estrategia': 'Incluir ambas en cartera para reducir riesgo sistemático'
+            })
+        elif corr_val > umbrales['muy_alto']:
+            recomendaciones.append({
+                'par': par,
+                'correlacion': corr_val,
+                'tipo': 'Movimiento sincronizado',
+                'mensaje': f'Alta correlación ({corr_val:.2f}) - Se mueven juntas',
+                'estrategia': 'Evitar sobreexposición, no aportan diversificación'
+            })
+        else:
+            recomendaciones.append({
+                'par': par,
+                'correlacion': corr_val,
+                'tipo': 'Correlación moderada-alta',
+                'mensaje': f'Correlación significativa ({corr_val:.2f})',
+                'estrategia': 'Limitar exposición combinada'
+            })
+    recomendaciones.sort(key=lambda x: abs(x['correlacion']))
+    
+    if modo == 'denso':
+        matriz_correlacion = {
+            'labels': labels,
+            'valores': resultado['matriz'].tolist()
+        }
+    else:
+        maximo = CONFIG_CORRELACION['max_recomendaciones']
+        if len(recomendaciones) > maximo:
+            recomendaciones = recomendaciones[:maximo // 2] + recomendaciones[-(maximo - maximo // 2):]
+        matriz_correlacion = {
+            'labels': labels,
+            'formato': 'disperso',
+            'umbrales': {'bajo': umbrales['bajo'], 'alto': umbrales['alto']},
+            'i': resultado['i'].tolist(),
+            'j': resultado['j'].tolist(),
+            'valores': resultado['valores'].tolist()
+        }
     
     return {
-        'matriz_correlacion': {
-            'labels': list(corr_matrix.columns),
-            'valores': matriz_valores
-        },
-        'recomendaciones': sorted(recomendaciones, key=lambda x: abs(x['correlacion'])),
-        'clusters': clusters,
+        'matriz_correlacion': matriz_correlacion,
+        'recomendaciones': recomendaciones,
+        'clusters': arbol.cortar(t_clusters) if arbol else [],
+        'arbol_clusters': clave if arbol else None,
         'periodo_analisis': len(returns),
-        'estadisticas': {
-            'correlacion_promedio': float(corr_matrix.values[np.triu_indices_from(corr_matrix.values, k=1)].mean()),
-            'max_correlacion': float(corr_matrix.values[np.triu_indices_from(corr_matrix.values, k=1)].max()),
-            'min_correlacion': float(corr_matrix.values[np.triu_indices_from(corr_matrix.values, k=1)].min())
-        }
+        'estadisticas': resultado['estadisticas']
     }
 
-def identificar_clusters(corr_matrix):
-    try:
-        from scipy.cluster.hierarchy import linkage, fcluster
-        from scipy.spatial.distance import squareform
-        
-        dist_matrix = 1 - np.abs(corr_matrix)
-        
-        linkage_matrix = linkage(squareform(dist_matrix), method='average')
-        clusters = fcluster(linkage_matrix, t=3, criterion='maxclust')
-        
-        grupos = {}
-        for i, cripto in enumerate(corr_matrix.columns):
-            cluster_id = int(clusters[i])
-            if cluster_id not in grupos:
-                grupos[cluster_id] = []
-            grupos[cluster_id].append(cripto)
-        
-        return [{'id': k, 'criptomonedas': v} for k, v in grupos.items()]
-    except:
-        return []
+def recortar_clusters(arbol_id: str, t: float = 3, criterio: str = 'maxclust') -> list:
+    """Clusters de un linkage ya calculado por calcular_correlacion_criptos (None si ya no está en caché)"""
+    arbol = arboles_clusters.obtener(arbol_id)
+    return arbol.cortar(t, criterio) if arbol else None
 
 # ==================== BACKTESTING ====================
 
-def backtesting_estrategia(df: pd.DataFrame, capital_inicial: float = 10000, estrategia: str = "rsi_macd") -> dict:
+def backtesting_estrategia(df: pd.DataFrame, capital_inicial: float = 10000, estrategia: str = "rsi_macd",
+                           comision: float = None, slippage: float = None) -> dict:
     """
     Simula una estrategia de trading sobre datos históricos.
     Estrategias soportadas: "rsi_macd", "bollinger", "golden_cross"
+    Comisión y slippage por defecto: CONFIG_BACKTESTING.
     """
     if len(df) < 30:  # ✅ Cambiado de 200 a 30 días mínimos
         return {"error": "Datos insuficientes para backtesting (mínimo 30 días)"}
 
-    df = df.copy()
-    df['rsi'] = calcular_rsi(df['Close'])
-    df['macd'] = calcular_macd(df['Close'])['macd']
-    df['signal'] = calcular_macd(df['Close'])['signal']
-    df['sma50'] = df['Close'].rolling(50).mean()
-    df['sma200'] = df['Close'].rolling(200).mean()
-    bb = calcular_bollinger_bands(df['Close'])
-    df['bb_upper'] = bb['upper']
-    df['bb_lower'] = bb['lower']
-
-    capital = capital_inicial
-    posicion = 0  # 0 = sin posición, 1 = comprado
-    operaciones = []
-    precio_compra = 0
-
-    for i in range(1, len(df)):
-        precio = df['Close'].iloc[i]
-        fecha = df.index[i]
-
-        if estrategia == "rsi_macd":
-            senal_compra = df['rsi'].iloc[i] < 30 and df['macd'].iloc[i] > df['signal'].iloc[i]
-            senal_venta = df['rsi'].iloc[i] > 70 and df['macd'].iloc[i] < df['signal'].iloc[i]
-        elif estrategia == "bollinger":
-            senal_compra = precio < df['bb_lower'].iloc[i]
-            senal_venta = precio > df['bb_upper'].iloc[i]
-        elif estrategia == "golden_cross":
-            senal_compra = df['sma50'].iloc[i] > df['sma200'].iloc[i] and df['sma50'].iloc[i-1] <= df['sma200'].iloc[i-1]
-            senal_venta = df['sma50'].iloc[i] < df['sma200'].iloc[i] and df['sma50'].iloc[i-1] >= df['sma200'].iloc[i-1]
-        else:
-            return {"error": "Estrategia no soportada"}
-
-        if senal_compra and posicion == 0:
-            posicion = 1
-            precio_compra = precio
-            operaciones.append({"tipo": "COMPRA", "fecha": fecha, "precio": precio})
-        elif senal_venta and posicion == 1:
-            posicion = 0
-            ganancia = (precio - precio_compra) / precio_compra
-            capital *= (1 + ganancia)
-            operaciones.append({"tipo": "VENTA", "fecha": fecha, "precio": precio, "ganancia": ganancia})
-
-    # Cerrar posición si queda abierta
-    if posicion == 1:
-        precio_final = df['Close'].iloc[-1]
-        ganancia = (precio_final - precio_compra) / precio_compra
-        capital *= (1 + ganancia)
-        operaciones.append({"tipo": "VENTA", "fecha": df.index[-1], "precio": precio_final, "ganancia": ganancia})
-
-    retorno_total = (capital - capital_inicial) / capital_inicial * 100
-    buy_hold = (df['Close'].iloc[-1] - df['Close'].iloc[0]) / df['Close'].iloc[0] * 100
-    max_drawdown = ((df['Close'].cummax() - df['Close']) / df['Close'].cummax()).max() * 100
-
-    return {
-        "estrategia": estrategia,
-        "capital_inicial": capital_inicial,
-        "capital_final": capital,
-        "retorno_total": retorno_total,
-        "buy_and_hold": buy_hold,
-        "max_drawdown": max_drawdown,
-        "operaciones": operaciones,
-        "cantidad_operaciones": len(operaciones),
-        "ganadoras": len([o for o in operaciones if o.get("ganancia", 0) > 0]),
-        "perdedoras": len([o for o in operaciones if o.get("ganancia", 0) < 0])
-    }
+    return ejecutar_backtesting(df, capital_inicial, estrategia, comision=comision, slippage=slippage)
 
 import requests
 from bs4 import BeautifulSoup
@@ -1328,6 +1469,7 @@ def guardar_simulacion_csv(df: pd.DataFrame, nombre: str) -> bool:
     ruta = os.path.join("simulacion", f"{nombre}.csv")
     try:
         df.to_csv(ruta, index=True, index_label='Date')
+        guardar_serie(df, nombre, "simulacion", ruta_origen=ruta)
         return True
     except Exception as e:
         print(f"❌ Error guardando simulación: {e}")
@@ -1338,7 +1480,11 @@ def analizar_simulacion(nombre_simulacion: str) -> dict:
     ruta = os.path.join("simulacion", f"{nombre_simulacion}.csv")
     
     try:
-        df = pd.read_csv(ruta, parse_dates=['Date'], index_col='Date')
+        df = cargar_serie(nombre_simulacion, "simulacion", ruta_origen=ruta)
+        if df is None:
+            firma = firma_archivo(ruta)
+            df = pd.read_csv(ruta, parse_dates=['Date'], index_col='Date')
+            guardar_serie(df, nombre_simulacion, "simulacion", ruta_origen=ruta, firma_origen=firma)
         if df.empty or len(df) < 5:
             return {'error': 'Datos insuficientes en la simulación'}
         
@@ -15,8 +15,6 @@ HTTP_HEADERS = {
 }
 
 # Criptomonedas soportadas por defecto (Top 100 de CoinMarketCap)
-from funciones import obtener_top_100_coinmarketcap
-
 def CRIPTOS_DEFAULT():
     """
     Devuelve la lista específica de 9 criptomonedas predeterminadas.
@@ -452,6 +450,21 @@ CONFIG_ALERTAS = {
         'sonido': True,
         'email': False,
         'webhook': False
+    },
+    # Disparo por cruce: la alerta se rearma solo al volver más allá del umbral menos la banda
+    'histeresis': {
+        'precio': 0.5,  # % del precio objetivo
+        'cambio_esperado': 1.0,  # puntos porcentuales
+        'volatilidad': 1.0,
+        'rsi': 5.0
+    },
+    'enfriamiento': 300,  # segundos mínimos entre dos disparos de la misma alerta y cripto
+    'registro': {
+        'carpeta': 'datos',
+        'archivo': 'alertas_eventos.jsonl',  # dentro de la subcarpeta del almacén, solo se añade
+        'fsync_eventos': 50,  # fsync tras este número de eventos pendientes...
+        'fsync_segundos': 1.0,  # ...o si pasó este tiempo desde el último
+        'limite_consulta': 100
     }
 }
 
@@ -460,7 +473,11 @@ CONFIG_MONTECARLO = {
     'iteraciones': 1000,
     'confianza': 0.95,
     'distribuciones': ['normal', 'lognormal', 'uniforme', 'exponencial'],
-    'semilla': None  # None = aleatorio
+    'semilla': None,  # None = aleatorio
+    'iteraciones_maximas': 200000,
+    'dias_maximos': 1825,  # el histograma ocupa dias * bins_percentiles * 8 bytes (~30 MB a 5 años)
+    'memoria_maxima_mb': 64,  # techo para el bloque de trayectorias en memoria
+    'bins_percentiles': 2048  # resolución del histograma diario de las bandas
 }
 
 # Configuración de backtesting
@@ -478,7 +495,12 @@ CONFIG_BACKTESTING = {
         'taker': 0.001
     },
     'slippage': 0.0005,
-    'minimo_operaciones': 5
+    'minimo_operaciones': 5,
+    'optimizacion': {
+        'procesos': None,  # None = todos los núcleos
+        'maximo_combinaciones': 5000,
+        'minimo_para_paralelizar': 16  # grillas menores se evalúan en el propio proceso
+    }
 }
 
 # Configuración de IA explicativa
@@ -534,7 +556,37 @@ CONFIG_ACTUALIZACION = {
     'intervalo_por_defecto': 5,  # minutos
     'timeout': 30,  # segundos
     'reintentos': 3,
-    'espera_reintento': 5  # segundos
+    'espera_reintento': 5,  # segundos
+    'descargas_concurrentes': 8,  # hilos para descargar varias criptos a la vez
+    'jitter': 0.1,  # ± fracción del intervalo de cada cripto
+    'historial_trabajos': 100  # trabajos terminados que se recuerdan
+}
+
+# Proveedor de datos de mercado del modo online ('yahoo' o 'replay')
+CONFIG_PROVEEDOR = {
+    'nombre': 'yahoo',
+    'replay': {
+        'carpeta': 'datos',  # reproduce <carpeta>/<simbolo>_online.csv
+        'velas_por_segundo': 1.0,  # 0 = el cursor solo avanza manualmente
+        'calentamiento': 48,  # velas visibles al empezar
+        'bucle': True
+    },
+    # Caché compartida de históricos de los proveedores remotos
+    'cache': {
+        'habilitado': True,
+        'fraccion_intervalo': 1 / 60,  # TTL = intervalo de vela / 60 (1h -> 60 s)
+        'ttl_minimo': 5,  # segundos
+        'ttl_maximo': 900,  # segundos
+        'maximo_entradas': 256,
+        'espera_maxima': 120  # segundos esperando una descarga agrupada
+    }
+}
+
+# Canal de eventos en tiempo real (SSE) del modo online
+CONFIG_STREAM = {
+    'maximo_clientes': 50,
+    'tamano_cola': 100,  # eventos sueltos (alertas) pendientes por cliente
+    'latido': 15  # segundos entre comentarios keep-alive
 }
 
 # Configuración de exportación de gráficos
@@ -581,6 +633,10 @@ CONFIG_RENDIMIENTO = {
         'nivel': 6,
         'tipos': ['gzip', 'deflate']
     },
+    'analisis_paralelo': {
+        'procesos': 1,  # 1 = secuencial; >1 reparte las criptos entre procesos (None = todos los núcleos)
+        'minimo_para_paralelizar': 4  # lotes menores se analizan en el propio proceso
+    },
     'lazy_loading': True,
     'precarga': {
         'habilitada': True,
@@ -588,6 +644,53 @@ CONFIG_RENDIMIENTO = {
     }
 }
 
+# Almacén binario columnar (.npy + meta.json) junto a cada carpeta de CSV
+CONFIG_ALMACEN = {
+    'habilitado': True,
+    'subcarpeta': '.almacen'
+}
+
+# Historial de precios del modo online (buffer circular por cripto, se guarda al cerrar)
+CONFIG_HISTORIAL_ONLINE = {
+    'capacidad': 10080,  # puntos por cripto (una semana a un punto por minuto)
+    'carpeta': 'datos',
+    'archivo': 'historial_online.npz'  # dentro de la subcarpeta del almacén
+}
+
+# Alertas y ajustes del modo online en SQLite (modo WAL); alertas_config.json se migra una vez
+CONFIG_BASE_DATOS = {
+    'archivo': 'configuracion.db',
+    'json_alertas': 'alertas_config.json',
+    'espera_bloqueo': 5.0  # segundos esperando a otro escritor antes de fallar
+}
+
+# Correlación incremental del modo online (velas horarias cerradas) y correlación móvil
+CONFIG_CORRELACION = {
+    'ventana': 168,  # velas de la matriz online (7 días horarios)
+    'ventana_movil': 30,  # velas por ventana en la serie de correlación móvil
+    'recalcular_cada': 1000,  # velas entre recálculos completos de las sumas
+    'max_velas': 2000,  # cierres retenidos por cripto
+    'max_motores': 8,  # conjuntos de criptos con matriz incremental
+    'refresco_segundos': 3600,  # criptos sin velas nuevas en este tiempo se descargan al consultar
+    # Correlación offline de muchas criptos: matriz por bloques y solo los pares fuera de los umbrales
+    'umbrales': {'bajo': 0.3, 'alto': 0.7, 'muy_alto': 0.9},
+    'bloque': 256,  # columnas por bloque del producto de matrices
+    'max_denso': 50,  # por encima, la matriz se devuelve en forma dispersa
+    'max_recomendaciones': 100,  # en forma dispersa: la mitad de correlación más baja y la mitad más alta
+    'max_arboles': 16  # linkages de clusters guardados para recortar a otro t
+}
+
+# Codificación de series OHLCV en la API (?formato=json|compacto|binario, ?precision=float64|float32)
+CONFIG_CODIFICACION = {
+    'formato': 'json',  # por defecto: el JSON de siempre (fechas como texto)
+    'precision': 'float64',
+    'cifras_float32': 7,  # cifras significativas al redondear en JSON compacto
+    'tipos_mime': {
+        'compacto': 'application/vnd.cripto.columnar+json',
+        'binario': 'application/vnd.cripto.columnar'
+    }
+}
+
 # Configuración de seguridad
 CONFIG_SEGURIDAD = {
     'rate_limiting': {
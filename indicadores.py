@@ -0,0 +1,327 @@
+# indicadores.py - Motor único de indicadores técnicos sobre bloques OHLCV de NumPy
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+from global_data import CONFIG_ANALISIS
+
+# Indicadores disponibles y columnas que produce cada uno en el resultado
+INDICADORES_DISPONIBLES = {
+    'rsi': ['rsi'],
+    'macd': ['macd', 'macd_signal', 'macd_hist'],
+    'bollinger': ['bb_upper', 'bb_middle', 'bb_lower'],
+    'sma': ['sma_corto', 'sma_medio', 'sma_largo'],
+    'ema': ['ema_rapida', 'ema_lenta'],
+    'atr': ['atr'],
+    'estocastico': ['stoch_k', 'stoch_d'],
+    'adx': ['adx', 'plus_di', 'minus_di'],
+    'obv': ['obv'],
+    'ichimoku': ['ichimoku_tenkan', 'ichimoku_kijun', 'ichimoku_senkou_a',
+                 'ichimoku_senkou_b', 'ichimoku_chikou']
+}
+
+ICHIMOKU_PERIODOS = (9, 26, 52)
+
+
+def _desplazar(valores: np.ndarray, n: int) -> np.ndarray:
+    """Equivalente a Series.shift(n) para arrays float"""
+    resultado = np.full_like(valores, np.nan)
+    if n > 0:
+        resultado[n:] = valores[:-n]
+    elif n < 0:
+        resultado[:n] = valores[-n:]
+    else:
+        resultado[:] = valores
+    return resultado
+
+
+class MotorIndicadores:
+    """
+    Calcula indicadores técnicos sobre arrays OHLCV.
+    Los sub-resultados compartidos (EMAs, medias y extremos móviles, rango verdadero...)
+    se calculan una sola vez por instancia y se reutilizan entre indicadores.
+    """
+
+    def __init__(self, close, high=None, low=None, volume=None, config: dict = None):
+        self.close = np.asarray(close, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64) if high is not None else self.close
+        self.low = np.asarray(low, dtype=np.float64) if low is not None else self.close
+        self.volume = np.asarray(volume, dtype=np.float64) if volume is not None else np.zeros_like(self.close)
+        self.config = config or CONFIG_ANALISIS
+        self.n = len(self.close)
+        self._memo = {}
+
+    @classmethod
+    def desde_dataframe(cls, df: pd.DataFrame, config: dict = None) -> 'MotorIndicadores':
+        return cls(
+            df['Close'].to_numpy(dtype=np.float64),
+            df['High'].to_numpy(dtype=np.float64) if 'High' in df.columns else None,
+            df['Low'].to_numpy(dtype=np.float64) if 'Low' in df.columns else None,
+            df['Volume'].to_numpy(dtype=np.float64) if 'Volume' in df.columns else None,
+            config
+        )
+
+    def _serie(self, fuente):
+        """Columna OHLCV por nombre o array intermedio registrado en el memo"""
+        if fuente in ('close', 'high', 'low', 'volume'):
+            return getattr(self, fuente)
+        return self._memo[fuente]
+
+    def _memorizar(self, clave, funcion):
+        if clave not in self._memo:
+            self._memo[clave] = funcion()
+        return self._memo[clave]
+
+    # ---------- Primitivas memorizadas ----------
+
+    def ema(self, span: int, fuente: str = 'close') -> np.ndarray:
+        """EMA con el mismo ajuste que pandas ewm(span=span, adjust=True)"""
+        def calcular():
+            x = self._serie(fuente)
+            if len(x) == 0:
+                return x.copy()
+            if np.isnan(x).any():
+                return pd.Series(x).ewm(span=span).mean().to_numpy()
+            decaimiento = 1 - 2 / (span + 1)
+            numerador = lfilter([1.0], [1.0, -decaimiento], x)
+            denominador = (1 - decaimiento ** np.arange(1, len(x) + 1)) / (1 - decaimiento)
+            return numerador / denominador
+        return self._memorizar(('ema', span, fuente), calcular)
+
+    def wilder(self, periodo: int, fuente) -> np.ndarray:
+        """Suavizado de Wilder (ewm alpha=1/periodo, adjust=False)"""
+        def calcular():
+            x = self._serie(fuente)
+            validos = np.flatnonzero(~np.isnan(x))
+            resultado = np.full_like(x, np.nan)
+            if len(validos) == 0:
+                return resultado
+            inicio = validos[0]
+            alfa = 1 / periodo
+            tramo = x[inicio:]
+            if np.isnan(tramo).any():
+                resultado[inicio:] = pd.Series(tramo).ewm(alpha=alfa, adjust=False).mean().to_numpy()
+            else:
+                resultado[inicio:] = lfilter([alfa], [1.0, -(1 - alfa)], tramo, zi=[(1 - alfa) * tramo[0]])[0]
+            return resultado
+        return self._memorizar(('wilder', periodo, fuente), calcular)
+
+    def _ventanas(self, periodo: int, fuente):
+        x = self._serie(fuente)
+        if periodo > len(x) or periodo < 1:
+            return None
+        return sliding_window_view(x, periodo)
+
+    def _rodante(self, operacion: str, periodo: int, fuente='close') -> np.ndarray:
+        def calcular():
+            x = self._serie(fuente)
+            resultado = np.full(len(x), np.nan)
+            ventanas = self._ventanas(periodo, fuente)
+            if ventanas is not None:
+                if operacion == 'media':
+                    resultado[periodo - 1:] = ventanas.mean(axis=1)
+                elif operacion == 'std':
+                    resultado[periodo - 1:] = ventanas.std(axis=1, ddof=1) if periodo > 1 else np.nan
+                elif operacion == 'max':
+                    resultado[periodo - 1:] = ventanas.max(axis=1)
+                elif operacion == 'min':
+                    resultado[periodo - 1:] = ventanas.min(axis=1)
+            return resultado
+        return self._memorizar((operacion, periodo, fuente), calcular)
+
+    def sma(self, periodo: int, fuente='close') -> np.ndarray:
+        return self._rodante('media', periodo, fuente)
+
+    def desviacion(self, periodo: int, fuente='close') -> np.ndarray:
+        return self._rodante('std', periodo, fuente)
+
+    def maximo(self, periodo: int, fuente='high') -> np.ndarray:
+        return self._rodante('max', periodo, fuente)
+
+    def minimo(self, periodo: int, fuente='low') -> np.ndarray:
+        return self._rodante('min', periodo, fuente)
+
+    def delta(self) -> np.ndarray:
+        return self._memorizar('delta', lambda: _desplazar(self.close, 0) - _desplazar(self.close, 1))
+
+    def rango_verdadero(self) -> np.ndarray:
+        def calcular():
+            cierre_previo = _desplazar(self.close, 1)
+            rangos = np.vstack([
+                self.high - self.low,
+                np.abs(self.high - cierre_previo),
+                np.abs(self.low - cierre_previo)
+            ])
+            return np.nanmax(rangos, axis=0)
+        return self._memorizar('tr', calcular)
+
+    # ---------- Indicadores ----------
+
+    def rsi(self, periodo: int = None) -> np.ndarray:
+        """RSI con medias simples de ganancias/pérdidas; 50 donde no está definido"""
+        periodo = periodo or self.config['rsi_periodo']
+
+        def calcular():
+            delta = self.delta()
+            self._memo['ganancias'] = np.where(delta > 0, delta, 0.0)
+            self._memo['perdidas'] = np.where(delta < 0, -delta, 0.0)
+            ganancia = self.sma(periodo, 'ganancias')
+            perdida = self.sma(periodo, 'perdidas')
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = ganancia / np.where(perdida == 0, np.nan, perdida)
+                rsi = 100 - (100 / (1 + rs))
+            return np.where(np.isnan(rsi), 50.0, rsi)
+        return self._memorizar(('rsi', periodo), calcular)
+
+    def macd(self, fast: int = None, slow: int = None, signal: int = None) -> dict:
+        fast = fast or self.config['macd_fast']
+        slow = slow or self.config['macd_slow']
+        signal = signal or self.config['macd_signal']
+
+        def calcular():
+            linea = self.ema(fast) - self.ema(slow)
+            clave_linea = ('macd_linea', fast, slow)
+            self._memo[clave_linea] = linea
+            senal = self.ema(signal, clave_linea)
+            return {'macd': linea, 'macd_signal': senal, 'macd_hist': linea - senal}
+        return self._memorizar(('macd', fast, slow, signal), calcular)
+
+    def bollinger(self, periodo: int = None, num_std: float = None) -> dict:
+        periodo = periodo or self.config['bollinger_periodo']
+        num_std = num_std or self.config['bollinger_std']
+        media = self.sma(periodo)
+        desviacion = self.desviacion(periodo)
+        return {
+            'bb_upper': media + desviacion * num_std,
+            'bb_middle': media,
+            'bb_lower': media - desviacion * num_std
+        }
+
+    def medias_simples(self) -> dict:
+        return {
+            'sma_corto': self.sma(self.config['sma_corto']),
+            'sma_medio': self.sma(self.config['sma_medio']),
+            'sma_largo': self.sma(self.config['sma_largo'])
+        }
+
+    def medias_exponenciales(self) -> dict:
+        return {
+            'ema_rapida': self.ema(self.config['macd_fast']),
+            'ema_lenta': self.ema(self.config['macd_slow'])
+        }
+
+    def atr(self, periodo: int = None) -> np.ndarray:
+        periodo = periodo or self.config['atr_periodo']
+        return self.wilder(periodo, self._registrar('tr', self.rango_verdadero()))
+
+    def estocastico(self, periodo_k: int = None, periodo_d: int = None) -> dict:
+        periodo_k = periodo_k or self.config['estocastico_k']
+        periodo_d = periodo_d or self.config['estocastico_d']
+
+        def calcular():
+            minimo = self.minimo(periodo_k)
+            rango = self.maximo(periodo_k) - minimo
+            with np.errstate(divide='ignore', invalid='ignore'):
+                k = 100 * (self.close - minimo) / np.where(rango == 0, np.nan, rango)
+            clave_k = ('stoch_k', periodo_k)
+            self._memo[clave_k] = k
+            return {'stoch_k': k, 'stoch_d': self.sma(periodo_d, clave_k)}
+        return self._memorizar(('estocastico', periodo_k, periodo_d), calcular)
+
+    def adx(self, periodo: int = None) -> dict:
+        periodo = periodo or self.config['atr_periodo']
+
+        def calcular():
+            subida = self.high - _desplazar(self.high, 1)
+            bajada = _desplazar(self.low, 1) - self.low
+            plus_dm = np.where((subida > bajada) & (subida > 0), subida, 0.0)
+            minus_dm = np.where((bajada > subida) & (bajada > 0), bajada, 0.0)
+            atr = self.atr(periodo)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                plus_di = 100 * self.wilder(periodo, self._registrar('plus_dm', plus_dm)) / atr
+                minus_di = 100 * self.wilder(periodo, self._registrar('minus_dm', minus_dm)) / atr
+                suma = plus_di + minus_di
+                dx = 100 * np.abs(plus_di - minus_di) / np.where(suma == 0, np.nan, suma)
+            return {'adx': self.wilder(periodo, self._registrar(('dx', periodo), dx)),
+                    'plus_di': plus_di, 'minus_di': minus_di}
+        return self._memorizar(('adx', periodo), calcular)
+
+    def obv(self) -> np.ndarray:
+        def calcular():
+            direccion = np.sign(np.nan_to_num(self.delta()))
+            return np.cumsum(direccion * np.nan_to_num(self.volume))
+        return self._memorizar('obv', calcular)
+
+    def ichimoku(self, periodos: tuple = ICHIMOKU_PERIODOS) -> dict:
+        corto, medio, largo = periodos
+
+        def calcular():
+            tenkan = (self.maximo(corto) + self.minimo(corto)) / 2
+            kijun = (self.maximo(medio) + self.minimo(medio)) / 2
+            senkou_b = (self.maximo(largo) + self.minimo(largo)) / 2
+            return {
+                'ichimoku_tenkan': tenkan,
+                'ichimoku_kijun': kijun,
+                'ichimoku_senkou_a': _desplazar((tenkan + kijun) / 2, medio),
+                'ichimoku_senkou_b': _desplazar(senkou_b, medio),
+                'ichimoku_chikou': _desplazar(self.close, -medio)
+            }
+        return self._memorizar(('ichimoku', periodos), calcular)
+
+    def liberar_derivados(self):
+        """
+        Olvida los resultados derivados y conserva solo las primitivas calculadas
+        directamente sobre las columnas OHLCV (EMAs, medias, extremos, delta, rango verdadero).
+        Útil cuando un mismo motor evalúa muchas combinaciones de parámetros.
+        """
+        columnas = ('close', 'high', 'low', 'volume')
+        self._memo = {
+            clave: valor for clave, valor in self._memo.items()
+            if clave in ('delta', 'tr', 'ganancias', 'perdidas')
+            or (isinstance(clave, tuple) and clave[-1] in columnas)
+        }
+
+    def _registrar(self, clave, valores):
+        """Guarda un array intermedio en el memo para usarlo como fuente de otras primitivas"""
+        self._memo.setdefault(clave, valores)
+        return clave
+
+    # ---------- Resultado estructurado ----------
+
+    def calcular(self, indicadores: list = None) -> dict:
+        """Devuelve {columna: array} solo con los indicadores pedidos (todos por defecto)"""
+        indicadores = indicadores or list(INDICADORES_DISPONIBLES)
+        desconocidos = [i for i in indicadores if i not in INDICADORES_DISPONIBLES]
+        if desconocidos:
+            raise ValueError(f"Indicadores no soportados: {', '.join(desconocidos)}")
+
+        resultado = {}
+        for nombre in indicadores:
+            if nombre == 'rsi':
+                resultado['rsi'] = self.rsi()
+            elif nombre == 'macd':
+                resultado.update(self.macd())
+            elif nombre == 'bollinger':
+                resultado.update(self.bollinger())
+            elif nombre == 'sma':
+                resultado.update(self.medias_simples())
+            elif nombre == 'ema':
+                resultado.update(self.medias_exponenciales())
+            elif nombre == 'atr':
+                resultado['atr'] = self.atr()
+            elif nombre == 'estocastico':
+                resultado.update(self.estocastico())
+            elif nombre == 'adx':
+                resultado.update(self.adx())
+            elif nombre == 'obv':
+                resultado['obv'] = self.obv()
+            elif nombre == 'ichimoku':
+                resultado.update(self.ichimoku())
+        return resultado
+
+
+def calcular_indicadores(df: pd.DataFrame, indicadores: list = None, config: dict = None) -> pd.DataFrame:
+    """Calcula los indicadores pedidos sobre un DataFrame OHLCV y los devuelve en un único DataFrame"""
+    motor = MotorIndicadores.desde_dataframe(df, config)
+    return pd.DataFrame(motor.calcular(indicadores), index=df.index)
@@ -0,0 +1,327 @@
+# indicadores_incrementales.py - Estado incremental de indicadores para el modo online
+#
+# Cada clase mantiene un estado de tamaño constante y se actualiza en O(1) por vela.
+# Los resultados coinciden con las funciones por lotes (calcular_rsi, calcular_macd,
+# calcular_bollinger_bands, predecir_precio) aplicadas a todos los precios recibidos.
+import copy
+import math
+from collections import deque
+
+import numpy as np
+
+from global_data import CONFIG_ANALISIS
+
+
+class SumaVentana:
+    """
+    Suma móvil sobre las últimas `ventana` observaciones.
+    Se recalcula exactamente cada `ventana` actualizaciones (coste amortizado O(1))
+    para que el error de redondeo no se acumule.
+    """
+
+    def __init__(self, ventana: int):
+        self.ventana = ventana
+        self.valores = deque(maxlen=ventana)
+        self.suma = 0.0
+        self.no_nulos = 0
+        self._pendientes_refresco = ventana
+
+    def agregar(self, valor: float):
+        if len(self.valores) == self.ventana:
+            saliente = self.valores[0]
+            self.suma -= saliente
+            self.no_nulos -= saliente != 0
+        self.valores.append(valor)
+        self.suma += valor
+        self.no_nulos += valor != 0
+
+        self._pendientes_refresco -= 1
+        if self._pendientes_refresco <= 0:
+            self.suma = math.fsum(self.valores)
+            self._pendientes_refresco = self.ventana
+
+    @property
+    def llena(self) -> bool:
+        return len(self.valores) == self.ventana
+
+    def media(self) -> float:
+        if not self.llena:
+            return np.nan
+        # Ventana de ceros: media exactamente 0 aunque queden residuos de redondeo
+        return self.suma / self.ventana if self.no_nulos else 0.0
+
+
+class RSIIncremental:
+    """RSI con medias simples de ganancias/pérdidas, igual que calcular_rsi"""
+
+    def __init__(self, periodo: int = None):
+        self.periodo = periodo or CONFIG_ANALISIS['rsi_periodo']
+        self.ganancias = SumaVentana(self.periodo)
+        self.perdidas = SumaVentana(self.periodo)
+        self.precio_anterior = None
+
+    def actualizar(self, precio: float) -> float:
+        delta = 0.0 if self.precio_anterior is None else precio - self.precio_anterior
+        self.precio_anterior = precio
+        self.ganancias.agregar(delta if delta > 0 else 0.0)
+        self.perdidas.agregar(-delta if delta < 0 else 0.0)
+        return self.valor
+
+    @property
+    def valor(self) -> float:
+        ganancia = self.ganancias.media()
+        perdida = self.perdidas.media()
+        if np.isnan(ganancia) or np.isnan(perdida) or perdida == 0:
+            return 50.0
+        return 100 - (100 / (1 + ganancia / perdida))
+
+
+class EMAIncremental:
+    """
+    EMA incremental. Con `ajustada=True` reproduce pandas ewm(span, adjust=True);
+    con `ajustada=False` la recursión clásica que arranca en el primer precio.
+    """
+
+    def __init__(self, span: int = None, alfa: float = None, ajustada: bool = True):
+        self.alfa = alfa if alfa is not None else 2 / (span + 1)
+        self.ajustada = ajustada
+        self._numerador = 0.0
+        self._denominador = 0.0
+        self.valor = np.nan
+
+    def actualizar(self, precio: float) -> float:
+        decaimiento = 1 - self.alfa
+        if self.ajustada:
+            self._numerador = precio + decaimiento * self._numerador
+            self._denominador = 1 + decaimiento * self._denominador
+            self.valor = self._numerador / self._denominador
+        elif np.isnan(self.valor):
+            self.valor = precio
+        else:
+            self.valor = self.alfa * precio + decaimiento * self.valor
+        return self.valor
+
+
+class MACDIncremental:
+    """MACD con los mismos parámetros y ajuste que calcular_macd"""
+
+    def __init__(self, fast: int = None, slow: int = None, signal: int = None):
+        self.ema_rapida = EMAIncremental(fast or CONFIG_ANALISIS['macd_fast'])
+        self.ema_lenta = EMAIncremental(slow or CONFIG_ANALISIS['macd_slow'])
+        self.ema_senal = EMAIncremental(signal or CONFIG_ANALISIS['macd_signal'])
+        self.macd = np.nan
+        self.signal = np.nan
+
+    def actualizar(self, precio: float) -> dict:
+        self.macd = self.ema_rapida.actualizar(precio) - self.ema_lenta.actualizar(precio)
+        self.signal = self.ema_senal.actualizar(self.macd)
+        return self.valor
+
+    @property
+    def valor(self) -> dict:
+        return {'macd': self.macd, 'signal': self.signal, 'histogram': self.macd - self.signal}
+
+
+class BollingerIncremental:
+    """Media y desviación (ddof=1) móviles por Welford con reemplazo, como calcular_bollinger_bands"""
+
+    def __init__(self, periodo: int = None, num_std: float = None):
+        self.periodo = periodo or CONFIG_ANALISIS['bollinger_periodo']
+        self.num_std = num_std or CONFIG_ANALISIS['bollinger_std']
+        self.valores = deque(maxlen=self.periodo)
+        self.media = 0.0
+        self._m2 = 0.0
+        self._pendientes_refresco = self.periodo
+
+    def actualizar(self, precio: float) -> dict:
+        if len(self.valores) < self.periodo:
+            self.valores.append(precio)
+            delta = precio - self.media
+            self.media += delta / len(self.valores)
+            self._m2 += delta * (precio - self.media)
+        else:
+            saliente = self.valores[0]
+            self.valores.append(precio)
+            media_anterior = self.media
+            self.media += (precio - saliente) / self.periodo
+            self._m2 += (precio - saliente) * (precio - self.media + saliente - media_anterior)
+
+        self._pendientes_refresco -= 1
+        if self._pendientes_refresco <= 0:
+            ventana = np.fromiter(self.valores, dtype=np.float64, count=len(self.valores))
+            self.media = float(ventana.mean())
+            self._m2 = float(((ventana - self.media) ** 2).sum())
+            self._pendientes_refresco = self.periodo
+        return self.valor
+
+    @property
+    def valor(self) -> dict:
+        if len(self.valores) < self.periodo or self.periodo < 2:
+            return {'upper': np.nan, 'middle': np.nan, 'lower': np.nan}
+        desviacion = math.sqrt(max(self._m2, 0.0) / (self.periodo - 1))
+        return {
+            'upper': self.media + desviacion * self.num_std,
+            'middle': self.media,
+            'lower': self.media - desviacion * self.num_std
+        }
+
+
+class RegresionIncremental:
+    """
+    Mínimos cuadrados de precio contra posición (0..n-1) con estadísticos suficientes.
+    Con `ventana` la regresión usa solo las últimas `ventana` velas.
+    """
+
+    def __init__(self, ventana: int = None):
+        self.ventana = ventana
+        self.valores = deque(maxlen=ventana) if ventana else None
+        self.n = 0
+        self.suma_y = 0.0
+        self.suma_xy = 0.0
+        self._pendientes_refresco = ventana or 0
+
+    def actualizar(self, precio: float):
+        self.suma_y += precio
+        self.suma_xy += self.n * precio
+        self.n += 1
+
+        if self.valores is not None:
+            if len(self.valores) == self.ventana:
+                saliente = self.valores[0]
+                # Quitar la posición 0 y desplazar las demás una posición
+                self.suma_y -= saliente
+                self.suma_xy -= self.suma_y
+                self.n -= 1
+            self.valores.append(precio)
+
+            self._pendientes_refresco -= 1
+            if self._pendientes_refresco <= 0:
+                ventana = np.fromiter(self.valores, dtype=np.float64, count=len(self.valores))
+                self.suma_y = math.fsum(ventana)
+                self.suma_xy = math.fsum(np.arange(len(ventana)) * ventana)
+                self._pendientes_refresco = self.ventana
+
+    def predecir(self, x: float = None) -> float:
+        """Valor de la recta en `x` (por defecto, la siguiente posición)"""
+        n = self.n
+        x = n if x is None else x
+        if n == 0:
+            return np.nan
+        media_x = (n - 1) / 2
+        media_y = self.suma_y / n
+        if n < 2:
+            return media_y
+        sxx = n * (n * n - 1) / 12
+        sxy = self.suma_xy - n * media_x * media_y
+        pendiente = sxy / sxx
+        return media_y + pendiente * (x - media_x)
+
+
+class PrediccionIncremental:
+    """Estado incremental equivalente a predecir_precio sobre todas las velas recibidas"""
+
+    def __init__(self, ventana_regresion: int = None):
+        self.regresion = RegresionIncremental(ventana_regresion)
+        self.ema = EMAIncremental(alfa=2 / (14 + 1), ajustada=False)
+        self.recientes = deque(maxlen=10)
+        self.n = 0
+
+    def actualizar(self, precio: float):
+        self.regresion.actualizar(precio)
+        self.ema.actualizar(precio)
+        self.recientes.append(precio)
+        self.n += 1
+
+    def resultado(self) -> dict:
+        if self.n == 0:
+            current_price = 0
+        else:
+            current_price = float(self.recientes[-1])
+        if self.n < 5:
+            return {
+                'precio_actual': current_price,
+                'prediccion_final': current_price,
+                'intervalo_confianza': (current_price*0.95, current_price*1.05),
+                'cambio_porcentual': 0,
+                'metodos': {}
+            }
+
+        recientes = np.fromiter(self.recientes, dtype=np.float64, count=len(self.recientes))
+        pred_linear = self.regresion.predecir() if self.n >= 10 else current_price
+        pred_ema = self.ema.valor if self.n >= 14 else np.mean(recientes[-5:])
+
+        ultimos = recientes[-5:]
+        returns = np.diff(ultimos) / ultimos[:-1]
+        pred_trend = current_price * (1 + float(np.mean(returns)))
+
+        pred_final = pred_linear * 0.4 + pred_ema * 0.35 + pred_trend * 0.25
+        max_change = 0.15
+        pred_final = max(current_price * (1 - max_change), min(pred_final, current_price * (1 + max_change)))
+
+        if self.n >= 10:
+            std_error = np.std(recientes - np.mean(recientes))
+            intervalo = (pred_final - 1.96*std_error, pred_final + 1.96*std_error)
+        else:
+            intervalo = (pred_final * 0.9, pred_final * 1.1)
+
+        cambio = ((pred_final - current_price) / current_price * 100) if current_price > 0 else 0
+        return {
+            'precio_actual': current_price,
+            'prediccion_final': float(pred_final),
+            'intervalo_confianza': (float(intervalo[0]), float(intervalo[1])),
+            'cambio_porcentual': float(cambio),
+            'metodos': {
+                'lineal': float(pred_linear),
+                'ema': float(pred_ema),
+                'tendencia': float(pred_trend)
+            }
+        }
+
+
+class EstadoIndicadores:
+    """Estado incremental por cripto: RSI, MACD, Bollinger y predicción"""
+
+    def __init__(self, ventana_regresion: int = None):
+        self.rsi = RSIIncremental()
+        self.macd = MACDIncremental()
+        self.bollinger = BollingerIncremental()
+        self.prediccion = PrediccionIncremental(ventana_regresion)
+        self.ultima_marca = None
+        self.velas = 0
+
+    def actualizar(self, precio: float, marca=None):
+        """Procesa una vela nueva; las velas con precio no válido se ignoran"""
+        if precio is None or not np.isfinite(precio):
+            return
+        precio = float(precio)
+        self.rsi.actualizar(precio)
+        self.macd.actualizar(precio)
+        self.bollinger.actualizar(precio)
+        self.prediccion.actualizar(precio)
+        self.ultima_marca = marca
+        self.velas += 1
+
+    def actualizar_desde(self, serie) -> int:
+        """Procesa solo las velas de `serie` (pd.Series indexada por fecha) posteriores a la última vista"""
+        if self.ultima_marca is not None:
+            serie = serie[serie.index > self.ultima_marca]
+        for marca, precio in serie.items():
+            self.actualizar(precio, marca)
+        return len(serie)
+
+    def resumen(self, provisional: float = None) -> dict:
+        """
+        Valores actuales. `provisional` es el precio de una vela aún abierta: se aplica
+        sobre una copia del estado, así que no se acumula en el estado real.
+        """
+        if provisional is not None:
+            estado = copy.deepcopy(self)
+            estado.actualizar(provisional)
+            return estado.resumen()
+        return {
+            'rsi': self.rsi.valor,
+            'macd': self.macd.valor,
+            'bollinger': self.bollinger.valor,
+            'prediccion': self.prediccion.resultado(),
+            'velas': self.velas
+        }
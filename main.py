@@ -1,16 +1,15 @@
 # main.py - Backend principal con Flask API (VERSIÓN COMPLETA CON TODAS LAS FUNCIONALIDADES)
 import os
 import sys
-import json
 import time
 import threading
+import atexit
 import webbrowser
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from bs4 import BeautifulSoup
 import requests
 import warnings
@@ -20,6 +19,17 @@ warnings.filterwarnings('ignore')
 from funciones import *
 from global_data import *
 from global_data import CRIPTOS_DEFAULT
+from almacen_datos import guardar_serie, eliminar_serie, recortar_rango
+from indicadores_incrementales import EstadoIndicadores
+from proveedores import obtener_proveedor, cache_historiales
+from planificador import Planificador
+from estado_online import EstadoOnline
+from buffer_precios import HistorialPrecios, COLUMNAS_OHLCV
+from difusion import CanalEventos, formato_sse
+from alertas import MotorAlertas, RegistroEventos
+from configuracion import AlmacenConfiguracion
+from correlacion import CorrelacionOnline, correlacion_movil
+from codificacion import Serie, marcas_ms, codificar, series_clasicas, formato_solicitado, validar_precision
 allCriptos = CRIPTOS_DEFAULT()
 
 app = Flask(__name__, static_folder='web', static_url_path='')
@@ -31,18 +41,85 @@ app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 online_config = {
     'activo': False,
     'intervalo_minutos': 5,
-    'ultima_actualizacion': None,
-    'hilo_automatico': None,
-    'datos_actuales': {},
-    'analisis_actuales': {},
-    'historial_precios': {}  # Para gráficos en tiempo real
+    'estado_indicadores': {}  # EstadoIndicadores incremental por cripto
 }
 
+# Precios, análisis e historial para gráficos: instantáneas inmutables versionadas.
+# Solo actualizar_datos_online publica; las rutas leen estado_mercado.instantanea() sin locks.
+# El historial de precios (buffers circulares) se recupera del último cierre.
+estado_mercado = EstadoOnline(HistorialPrecios.cargar())
+
+# Cambios, alertas y anomalías se calculan una vez por actualización y se reparten por SSE
+canal_eventos = CanalEventos()
+
+# Correlación entre criptos con las velas horarias cerradas de cada actualización (sumas deslizantes)
+correlacion_online = CorrelacionOnline()
+
+# Actualizaciones online en segundo plano: las rutas encolan trabajos y responden al momento
+planificador = Planificador(lambda simbolos: actualizar_datos_online(simbolos=simbolos))
+
+def cerrar_online():
+    """Apagado: parar el planificador, cerrar los streams, el registro de alertas y guardar el historial de precios"""
+    planificador.detener()
+    canal_eventos.cerrar()
+    registro_alertas.cerrar()
+    almacen_configuracion.cerrar()
+    try:
+        estado_mercado.historial.guardar()
+    except Exception as e:
+        print(f"⚠️ Error guardando historial online: {e}")
+
+atexit.register(cerrar_online)
+
+# Velas horarias de la ventana online (7 días) usadas por la regresión de predecir_precio
+VENTANA_REGRESION_ONLINE = 7 * 24
+
 # Asegurar carpetas existen
 os.makedirs('datos', exist_ok=True)
 os.makedirs('web/assets', exist_ok=True)
 os.makedirs('resultados', exist_ok=True)
 
+def parametros_rango(fuente) -> dict:
+    """Extrae desde/hasta/ultimos_n de request.args o del cuerpo JSON (ValueError si ultimos_n no es un entero >= 0)"""
+    ultimos_n = fuente.get('ultimos_n')
+    if ultimos_n not in (None, ''):
+        try:
+            ultimos_n = int(ultimos_n)
+        except (TypeError, ValueError):
+            raise ValueError(f"ultimos_n debe ser un entero: {ultimos_n!r}")
+        if ultimos_n < 0:
+            raise ValueError('ultimos_n no puede ser negativo')
+    else:
+        ultimos_n = None
+    return {
+        'desde': fuente.get('desde') or None,
+        'hasta': fuente.get('hasta') or None,
+        'ultimos_n': ultimos_n
+    }
+
+def parametros_costes(data) -> dict:
+    """Comisión y slippage opcionales del cuerpo JSON (None = CONFIG_BACKTESTING); el rango lo valida resolver_costes"""
+    costes = {}
+    for nombre in ('comision', 'slippage'):
+        valor = data.get(nombre)
+        try:
+            costes[nombre] = float(valor) if valor not in (None, '') else None
+        except (TypeError, ValueError):
+            raise ValueError(f"{nombre} debe ser un número: {valor!r}")
+    return costes
+
+def responder_series(respuesta, estado: int = 200):
+    """Respuesta (una Serie o un dict que las contiene) en el formato pedido (?formato=, ?precision= o cabecera Accept)"""
+    try:
+        formato = formato_solicitado(request.args.get('formato'), request.accept_mimetypes)
+        precision = validar_precision(request.args.get('precision'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if formato == 'json':
+        return jsonify(series_clasicas(respuesta)), estado
+    cuerpo, tipo = codificar(respuesta, formato, precision)
+    return Response(cuerpo, status=estado, mimetype=tipo)
+
 # ==================== RUTAS DE PÁGINAS ====================
 
 @app.route('/')
@@ -69,6 +146,11 @@ def get_criptos_offline():
     criptos = listar_criptomonedas_disponibles('datos')
     return jsonify({'criptos': criptos, 'count': len(criptos)})
 
+@app.route('/api/offline/cache', methods=['GET'])
+def estadisticas_cache_offline():
+    """Estadísticas de la caché de DataFrames parseados"""
+    return jsonify(cache_dataframes.estadisticas())
+
 @app.route('/api/offline/analisis', methods=['POST'])
 def analisis_offline():
     """Realizar análisis completo offline"""
@@ -78,31 +160,37 @@ def analisis_offline():
     if not criptos:
         return jsonify({'error': 'No se seleccionaron criptomonedas'}), 400
     
+    try:
+        rango = parametros_rango(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    procesos = data.get('procesos')
+    if procesos not in (None, '') and (not str(procesos).isdigit() or int(procesos) < 1):
+        return jsonify({'error': f"procesos debe ser un entero positivo: {procesos!r}"}), 400
+    procesos = int(procesos) if procesos not in (None, '') else None
+    inicio = time.perf_counter()
+    lote = analisis_lote_criptos(criptos, 'datos', procesos, **rango)
+
     resultados = []
-    for cripto in criptos:
-        try:
-            resultado = analisis_rapido_cripto(cripto, 'datos')
-            if resultado.get('success'):
-                # Convertir DataFrame a dict para JSON
-                df = resultado['dataframe']
-                resultado['datos_historicos'] = {
-                    'fechas': df.index.strftime('%Y-%m-%d').tolist(),
-                    'precios': df['Close'].tolist(),
-                    'volumenes': df['Volume'].tolist() if 'Volume' in df.columns else [],
-                    'open': df['Open'].tolist() if 'Open' in df.columns else [],
-                    'high': df['High'].tolist() if 'High' in df.columns else [],
-                    'low': df['Low'].tolist() if 'Low' in df.columns else []
-                }
-                del resultado['dataframe']  # Eliminar DataFrame no serializable
-                resultados.append(resultado)
-        except Exception as e:
-            resultados.append({
-                'cripto': cripto,
-                'error': str(e),
-                'success': False
-            })
+    tiempos = []
+    for resultado in lote:
+        tiempos.append({
+            'cripto': resultado.get('cripto'),
+            'segundos': resultado['tiempo_segundos'],
+            'success': bool(resultado.get('success')),
+            'error': resultado.get('error')
+        })
+        if resultado.get('success'):
+            # El DataFrame se codifica al responder, en el formato pedido
+            resultado['datos_historicos'] = Serie.desde_dataframe(resultado.pop('dataframe'))
+            resultados.append(resultado)
     
-    return jsonify({'resultados': resultados, 'count': len(resultados)})
+    return responder_series({
+        'resultados': resultados,
+        'count': len(resultados),
+        'tiempos': tiempos,
+        'tiempo_total': round(time.perf_counter() - inicio, 4)
+    })
 
 @app.route('/api/offline/subir-csv', methods=['POST'])
 def subir_csv():
@@ -242,34 +330,43 @@ def exportar_grafico_online():
 def simulacion_mercado():
     """Generar datos sintéticos de mercado y devolverlos como JSON válido"""
     data = request.get_json()
-    params = {
-        'precio_inicial': data.get('precio_inicial', 50000),
-        'dias': data.get('dias', 90),
-        'volatilidad': data.get('volatilidad', 0.03),
-        'tendencia': data.get('tendencia', 0.001),
-        'nombre': data.get('nombre', 'Simulacion')
-    }
+    semilla = data.get('semilla', CONFIG_MONTECARLO['semilla'])
 
     try:
-        df = generar_datos_sinteticos(**params)
-
-        # ✅ Convertir DataFrame a JSON serializable
-        df_serializable = {
-            'fechas': df.index.strftime('%Y-%m-%d').tolist(),
-            'precios': df['Close'].tolist(),
-            'volumenes': df['Volume'].tolist(),
-            'open': df['Open'].tolist(),
-            'high': df['High'].tolist(),
-            'low': df['Low'].tolist()
+        params = {
+            'precio_inicial': float(data.get('precio_inicial', 50000)),
+            'dias': int(data.get('dias', 90)),
+            'volatilidad': float(data.get('volatilidad', 0.03)),
+            'tendencia': float(data.get('tendencia', 0.001)),
+            'nombre': data.get('nombre', 'Simulacion')
         }
+        simulacion = simular_montecarlo(
+            params['precio_inicial'], params['dias'], params['volatilidad'], params['tendencia'],
+            iteraciones=data.get('iteraciones'),
+            distribucion=data.get('distribucion', 'normal'),
+            confianza=float(data['confianza']) if data.get('confianza') is not None else None,
+            semilla=int(semilla) if semilla is not None else None
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
 
-        # Guardar como CSV en carpeta simulacion
-        os.makedirs("simulacion", exist_ok=True)
-        df.to_csv(os.path.join("simulacion", f"{params['nombre']}.csv"), index=True, index_label='Date')
+    try:
+        df = ohlcv_desde_trayectoria(simulacion['media'], params['volatilidad'], simulacion['semilla'])
 
-        return jsonify({
+        # Guardar como CSV (y su versión binaria) en carpeta simulacion
+        guardar_simulacion_csv(df, params['nombre'])
+
+        return responder_series({
             'success': True,
-            'datos': df_serializable,
+            'datos': Serie.desde_dataframe(df),
+            'montecarlo': {
+                'iteraciones': simulacion['iteraciones'],
+                'distribucion': simulacion['distribucion'],
+                'confianza': simulacion['confianza'],
+                'semilla': simulacion['semilla'],
+                'tiempo_segundos': simulacion['tiempo_segundos'],
+                'bandas': {f'p{q:g}': v.tolist() for q, v in simulacion['percentiles'].items()}
+            },
             'message': f'Simulación {params["nombre"]} generada con éxito'
         })
 
@@ -287,27 +384,69 @@ def calcular_correlacion_offline():
         return jsonify({'error': 'Se necesitan al menos 2 criptomonedas'}), 400
     
     try:
-        resultado = calcular_correlacion_criptos(criptos, 'datos')
+        resultado = calcular_correlacion_criptos(criptos, 'datos', modo=data.get('modo'),
+                                                 t_clusters=float(data.get('t', 3)))
         return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/offline/correlacion/clusters', methods=['POST'])
+def recortar_clusters_offline():
+    """Recorta a otro t (y criterio de fcluster) los clusters de una correlación ya calculada"""
+    data = request.get_json() or {}
+    try:
+        t = float(data.get('t', 3))
+        clusters = recortar_clusters(data.get('arbol_clusters', ''), t, data.get('criterio', 'maxclust'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if clusters is None:
+        return jsonify({'error': 'Árbol de clusters no encontrado: vuelve a calcular la correlación'}), 404
+    return jsonify({'clusters': clusters, 't': t})
+
 @app.route('/api/offline/datos-historicos/<cripto>', methods=['GET'])
 def get_datos_historicos(cripto):
-    """Obtener datos históricos para gráficos offline"""
+    """Obtener datos históricos para gráficos offline (opcional: ?desde=&hasta=&ultimos_n=)"""
     try:
-        df = importar_base_cripto(cripto, 'datos')
+        df = importar_base_cripto(cripto, 'datos', **parametros_rango(request.args))
         if df.empty:
             return jsonify({'error': 'No hay datos'}), 404
         
+        return responder_series(Serie.desde_dataframe(df))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/offline/indicadores/<cripto>', methods=['GET'])
+def get_indicadores(cripto):
+    """Indicadores técnicos pedidos (?indicadores=rsi,macd,atr) sobre datos offline"""
+    try:
+        lista = request.args.get('indicadores', '')
+        indicadores = [i.strip().lower() for i in lista.split(',') if i.strip()] or None
+        desconocidos = [i for i in (indicadores or []) if i not in INDICADORES_DISPONIBLES]
+        if desconocidos:
+            return jsonify({
+                'error': f"Indicadores no soportados: {', '.join(desconocidos)}",
+                'disponibles': list(INDICADORES_DISPONIBLES)
+            }), 400
+
+        df = importar_base_cripto(cripto, 'datos', **parametros_rango(request.args))
+        if df.empty:
+            return jsonify({'error': 'No hay datos'}), 404
+
+        resultado = calcular_indicadores(df, indicadores)
         return jsonify({
+            'cripto': cripto,
             'fechas': df.index.strftime('%Y-%m-%d').tolist(),
-            'precios': df['Close'].tolist(),
-            'volumenes': df['Volume'].tolist() if 'Volume' in df.columns else [],
-            'open': df['Open'].tolist() if 'Open' in df.columns else [],
-            'high': df['High'].tolist() if 'High' in df.columns else [],
-            'low': df['Low'].tolist() if 'Low' in df.columns else []
+            'indicadores': {
+                col: [None if np.isnan(v) else v for v in resultado[col].tolist()]
+                for col in resultado.columns
+            }
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -339,12 +478,50 @@ def backtesting_offline():
         return jsonify({'error': 'Criptomoneda requerida'}), 400
 
     try:
-        df = importar_base_cripto(cripto, 'datos')
+        df = importar_base_cripto(cripto, 'datos', **parametros_rango(data))
         if df.empty or len(df) < 30:  # ✅ Cambiado a 30 días
             return jsonify({'error': 'Datos insuficientes para backtesting (mínimo 30 días)'}), 400
 
-        resultado = backtesting_estrategia(df, capital, estrategia)
+        resultado = backtesting_estrategia(df, capital, estrategia, **parametros_costes(data))
+        return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/offline/backtesting/optimizar', methods=['POST'])
+def optimizar_backtesting_offline():
+    """Barrido de parámetros de una estrategia; devuelve la tabla de configuraciones ordenada"""
+    data = request.get_json()
+    cripto = data.get('cripto')
+    estrategia = data.get('estrategia', 'rsi_macd')
+    grilla = data.get('grilla', {})
+    capital = float(data.get('capital', 10000))
+    limite = data.get('limite')
+
+    if not cripto:
+        return jsonify({'error': 'Criptomoneda requerida'}), 400
+    if not isinstance(grilla, dict):
+        return jsonify({'error': 'La grilla debe ser un objeto {parametro: [valores]}'}), 400
+
+    try:
+        df = importar_base_cripto(cripto, 'datos', **parametros_rango(data))
+        if df.empty:
+            return jsonify({'error': 'No hay datos'}), 404
+
+        resultado = optimizar_backtesting(
+            df, estrategia, grilla, capital,
+            procesos=data.get('procesos'),
+            ordenar_por=data.get('ordenar_por', 'retorno_total'),
+            limite=int(limite) if limite else None,
+            **parametros_costes(data)
+        )
+        if 'error' in resultado:
+            return jsonify(resultado), 400
+        resultado['cripto'] = cripto
         return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -360,14 +537,10 @@ def comparacion_offline():
 
     try:
         resultados = []
-        for cripto in criptos:
-            df = importar_base_cripto(cripto, 'datos')
-            if df.empty:
-                continue
-            
-            actual = analisis_rapido_cripto(cripto, 'datos')
+        for actual in analisis_lote_criptos(criptos, 'datos'):
             if not actual.get('success'):
                 continue
+            cripto = actual['cripto']
 
             valor = None
             if metrica == 'precio':
@@ -402,6 +575,7 @@ def eliminar_cripto(nombre):
         archivo = os.path.join('datos', f"{nombre}.csv")
         if os.path.exists(archivo):
             os.remove(archivo)
+            eliminar_serie(nombre, 'datos')
             return jsonify({'success': True, 'message': f'{nombre} eliminado'})
         else:
             return jsonify({'error': 'Archivo no encontrado'}), 404
@@ -410,70 +584,56 @@ def eliminar_cripto(nombre):
 
 @app.route('/api/offline/obtener-datos/<cripto>', methods=['GET'])
 def obtener_datos_cripto(cripto):
-    """Obtener datos históricos de una criptomoneda para el minijuego FOMO"""
+    """
+    Datos OHLCV de una criptomoneda para el minijuego FOMO. Admite tramo (?desde=&hasta=&ultimos_n=)
+    y páginas (?offset=&limit=) para cargar series largas por partes.
+    """
+    # Como antes, primero el CSV del modo online; el cargador compartido normaliza columnas y fechas
+    nombre = next((n for n in (f"{cripto}_online", cripto)
+                   if os.path.exists(os.path.join('datos', f"{n}.csv"))), None)
+    if nombre is None:
+        return jsonify({'success': False, 'error': f'Criptomoneda no encontrada: {cripto}'}), 404
+    
     try:
-        # Intentar con sufijo _online primero, luego sin sufijo
-        archivo = os.path.join('datos', f"{cripto}_online.csv")
-        if not os.path.exists(archivo):
-            archivo = os.path.join('datos', f"{cripto}.csv")
+        formato = formato_solicitado(request.args.get('formato'), request.accept_mimetypes)
+        offset = max(0, request.args.get('offset', 0, type=int))
+        limit = request.args.get('limit', type=int)
+        if limit is not None and limit <= 0:
+            return jsonify({'success': False, 'error': 'limit debe ser mayor que 0'}), 400
         
-        if not os.path.exists(archivo):
-            print(f"[v0] Archivo no encontrado: {cripto} - intenté: {cripto}_online.csv y {cripto}.csv")
-            return jsonify({'success': False, 'error': f'Criptomoneda no encontrada: {cripto}'}), 404
-        
-        # Cargar datos
-        print(f"[v0] Cargando archivo: {archivo}")
-        df = pd.read_csv(archivo)
-        print(f"[v0] Datos cargados: {len(df)} filas, columnas: {list(df.columns)}")
-        
-        # Normalizar columnas (convertir a minúsculas y limpiar espacios)
-        df.columns = [col.strip().lower() for col in df.columns]
-        
-        # Detectar estructura del CSV y adaptarse
-        if 'date' in df.columns:
-            fecha_col = 'date'
-        elif 'timestamp' in df.columns:
-            fecha_col = 'timestamp'
-        elif 'time' in df.columns:
-            fecha_col = 'time'
-        else:
-            fecha_col = df.columns[0]
-        
-        # Detectar columnas de precio
-        open_col = next((c for c in df.columns if 'open' in c), df.columns[1] if len(df.columns) > 1 else None)
-        close_col = next((c for c in df.columns if 'close' in c), df.columns[-1] if len(df.columns) > 1 else None)
-        high_col = next((c for c in df.columns if 'high' in c), None)
-        low_col = next((c for c in df.columns if 'low' in c), None)
-        volume_col = next((c for c in df.columns if 'volume' in c), None)
-        
-        # Crear datos estructurados para el juego
-        datos_formateados = []
-        for idx, row in df.iterrows():
-            try:
-                datos_formateados.append({
-                    'timestamp': str(row[fecha_col]),
-                    'open': float(row[open_col]) if open_col and pd.notna(row[open_col]) else 0,
-                    'close': float(row[close_col]) if close_col and pd.notna(row[close_col]) else 0,
-                    'high': float(row[high_col]) if high_col and pd.notna(row[high_col]) else 0,
-                    'low': float(row[low_col]) if low_col and pd.notna(row[low_col]) else 0,
-                    'volume': float(row[volume_col]) if volume_col and pd.notna(row[volume_col]) else 0
-                })
-            except Exception as e:
-                print(f"[v0] Error procesando fila {idx}: {e}")
-                continue
-        
-        if not datos_formateados:
+        df = importar_base_cripto(nombre, 'datos', **parametros_rango(request.args))
+        total = len(df)
+        pagina = df.iloc[offset:offset + limit if limit else None]
+        if pagina.empty and offset == 0:
             return jsonify({'success': False, 'error': 'No hay datos válidos en el archivo'}), 400
         
-        return jsonify({
+        columnas = {c: pagina[c].fillna(0).to_numpy(dtype=np.float64) for c in COLUMNAS_OHLCV}
+        siguiente = offset + len(pagina)
+        respuesta = {
             'success': True,
             'cripto': cripto,
-            'datos': datos_formateados,
-            'count': len(datos_formateados)
-        })
+            'count': len(pagina),
+            'total': total,
+            'offset': offset,
+            'siguiente_offset': siguiente if siguiente < total else None
+        }
+        
+        if formato != 'json':
+            respuesta['datos'] = Serie(marcas_ms(pagina.index), columnas, '%Y-%m-%d %H:%M:%S')
+            return responder_series(respuesta)
         
+        # Una fila por vela, construida desde columnas ya convertidas (sin iterrows)
+        respuesta['datos'] = [
+            {'timestamp': t, 'open': o, 'close': c, 'high': h, 'low': l, 'volume': v}
+            for t, o, h, l, c, v in zip(pagina.index.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+                                        *(columnas[c].tolist() for c in COLUMNAS_OHLCV))
+        ]
+        return jsonify(respuesta)
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
-        print(f"[v0] Error en obtener_datos_cripto: {e}")
+        print(f"❌ Error en obtener_datos_cripto: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # ==================== API - MODO ONLINE ====================
@@ -484,56 +644,102 @@ def iniciar_online():
     global online_config
     
     data = request.get_json()
-    online_config['intervalo_minutos'] = data.get('intervalo', 5)
+    online_config['intervalo_minutos'] = data.get('intervalo', CONFIG_ACTUALIZACION['intervalo_por_defecto'])
     online_config['criptos_seleccionadas'] = data.get('criptos', ['BTC', 'ETH', 'BNB'])
     online_config['activo'] = True
     
-    # Primera ejecución inmediata
-    actualizar_datos_online()
+    # Intervalo propio por cripto (opcional), acotado a los límites de CONFIG_ACTUALIZACION
+    intervalos_cripto = data.get('intervalos', {})
+    intervalos = {}
+    for simbolo in online_config['criptos_seleccionadas']:
+        minutos = float(intervalos_cripto.get(simbolo, online_config['intervalo_minutos']))
+        minutos = min(max(minutos, CONFIG_ACTUALIZACION['intervalo_minimo']), CONFIG_ACTUALIZACION['intervalo_maximo'])
+        intervalos[simbolo] = minutos * 60
+    
+    # Se recuerdan para el próximo arranque (y para actualizar-manual sin iniciar antes)
+    almacen_configuracion.guardar_ajustes({
+        'online.intervalo_minutos': online_config['intervalo_minutos'],
+        'online.criptos_seleccionadas': online_config['criptos_seleccionadas']
+    })
     
-    # Iniciar hilo automático si no está corriendo
-    if online_config['hilo_automatico'] is None or not online_config['hilo_automatico'].is_alive():
-        online_config['hilo_automatico'] = threading.Thread(target=loop_automatico, daemon=True)
-        online_config['hilo_automatico'].start()
+    # Primera ejecución inmediata en segundo plano y después cada cripto a su intervalo
+    planificador.programar(intervalos)
+    trabajo = planificador.encolar(online_config['criptos_seleccionadas'], origen='inicial')
     
     return jsonify({
         'success': True,
         'config': {
             'intervalo': online_config['intervalo_minutos'],
+            'intervalos': {s: i / 60 for s, i in intervalos.items()},
             'criptos': online_config['criptos_seleccionadas']
-        }
-    })
+        },
+        'trabajo': trabajo
+    }), 202
 
 @app.route('/api/online/detener', methods=['POST'])
 def detener_online():
     """Detener monitoreo online"""
     global online_config
     online_config['activo'] = False
+    planificador.detener()
     return jsonify({'success': True, 'message': 'Monitoreo detenido'})
 
+@app.route('/api/online/cache', methods=['GET'])
+def estadisticas_cache_online():
+    """Estadísticas de la caché compartida de históricos (descargas evitadas al proveedor)"""
+    return jsonify(cache_historiales.estadisticas())
+
 @app.route('/api/online/estado', methods=['GET'])
 def estado_online():
-    """Obtener estado actual del modo online"""
-    return jsonify({
+    """
+    Obtener estado actual del modo online.
+    Con ?desde_version=N solo se envía el análisis si hay una versión más nueva
+    (con &espera=segundos la petición espera a que llegue, hasta 30 s).
+    """
+    desde_version = request.args.get('desde_version', type=int)
+    espera = min(request.args.get('espera', 0, type=float), 30)
+    instantanea = estado_mercado.instantanea()
+    if desde_version is not None:
+        instantanea = estado_mercado.esperar_cambio(desde_version, espera)
+    
+    respuesta = {
         'activo': online_config['activo'],
-        'ultima_actualizacion': online_config['ultima_actualizacion'],
-        'criptos': list(online_config['datos_actuales'].keys()),
-        'analisis': online_config['analisis_actuales']
-    })
+        'version': instantanea.version,
+        'ultima_actualizacion': instantanea.ultima_actualizacion,
+        'criptos': instantanea.criptos,
+        'planificador': planificador.estado(),
+        'stream': canal_eventos.estadisticas()
+    }
+    if desde_version is not None and instantanea.version <= desde_version:
+        respuesta['cambios'] = False
+    else:
+        respuesta['analisis'] = instantanea.analisis_actuales
+    return jsonify(respuesta)
 
 @app.route('/api/online/actualizar-manual', methods=['POST'])
 def actualizar_manual():
-    """Forzar actualización manual"""
+    """Forzar actualización manual (se encola; el progreso se consulta en /api/online/trabajos/<id>)"""
     try:
-        actualizar_datos_online()
+        trabajo = planificador.encolar(online_config['criptos_seleccionadas'], origen='manual')
+        instantanea = estado_mercado.instantanea()
         return jsonify({
             'success': True,
-            'ultima_actualizacion': online_config['ultima_actualizacion'],
-            'datos': online_config['analisis_actuales']
-        })
+            'trabajo': trabajo,
+            'version': instantanea.version,
+            'ultima_actualizacion': instantanea.ultima_actualizacion,
+            'datos': instantanea.analisis_actuales
+        }), 202
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/online/trabajos/<int:id_trabajo>', methods=['GET'])
+def estado_trabajo(id_trabajo):
+    """Estado de un trabajo de actualización encolado"""
+    trabajo = planificador.trabajo(id_trabajo)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo)
+
 @app.route('/api/online/sentimiento-detallado', methods=['GET'])
 def analisis_sentimiento_detallado():
     """Análisis de sentimiento con datos históricos"""
@@ -541,8 +747,7 @@ def analisis_sentimiento_detallado():
     dias = int(request.args.get('dias', '30'))
     
     try:
-        ticker = yf.Ticker(f"{cripto}-USD")
-        hist = ticker.history(period=f"{dias}d", interval="1d")
+        hist = obtener_proveedor().historial(cripto, period=f"{dias}d", interval="1d")
         
         if hist.empty:
             return jsonify({'error': 'Sin datos disponibles'})
@@ -680,38 +885,74 @@ def analisis_sentimiento_detallado():
 def detectar_anomalias():
     """Detectar anomalías en el mercado"""
     try:
-        anomalias = []
-        
-        for simbolo, datos in online_config['datos_actuales'].items():
-            if simbolo in online_config['analisis_actuales']:
-                analisis = online_config['analisis_actuales'][simbolo]
-                cambio_1h = analisis.get('cambio_esperado', 0)
-                
-                # Detectar pump/dump
-                if abs(cambio_1h) > 10:
-                    tipo = 'pump' if cambio_1h > 0 else 'dump'
-                    anomalias.append({
-                        'tipo': tipo,
-                        'cripto': simbolo,
-                        'valor': float(cambio_1h),
-                        'mensaje': f'{"Pump" if tipo == "pump" else "Dump"} detectado en {simbolo}: {cambio_1h:+.1f}% en 1h'
-                    })
-                
-                # Detectar volumen anormal
-                volatilidad = analisis.get('indicadores', {}).get('volatilidad', 0)
-                if volatilidad > 10:
-                    anomalias.append({
-                        'tipo': 'volumen_anormal',
-                        'cripto': simbolo,
-                        'valor': float(volatilidad),
-                        'mensaje': f'Alta volatilidad en {simbolo}: {volatilidad:.1f}%'
-                    })
-        
+        anomalias = calcular_anomalias(estado_mercado.instantanea())
         return jsonify({'anomalias': anomalias, 'count': len(anomalias)})
     except Exception as e:
         print(f"Error en detección de anomalías: {e}")
         return jsonify({'anomalias': [], 'count': 0, 'error': str(e)})
 
+def calcular_anomalias(instantanea):
+    """Pumps/dumps y volatilidad alta a partir de una instantánea del estado online"""
+    anomalias = []
+    
+    for simbolo, datos in instantanea.datos_actuales.items():
+        if simbolo in instantanea.analisis_actuales:
+            analisis = instantanea.analisis_actuales[simbolo]
+            cambio_1h = analisis.get('cambio_esperado', 0)
+            
+            # Detectar pump/dump
+            if abs(cambio_1h) > 10:
+                tipo = 'pump' if cambio_1h > 0 else 'dump'
+                anomalias.append({
+                    'tipo': tipo,
+                    'cripto': simbolo,
+                    'valor': float(cambio_1h),
+                    'mensaje': f'{"Pump" if tipo == "pump" else "Dump"} detectado en {simbolo}: {cambio_1h:+.1f}% en 1h'
+                })
+            
+            # Detectar volumen anormal
+            volatilidad = analisis.get('indicadores', {}).get('volatilidad', 0)
+            if volatilidad > 10:
+                anomalias.append({
+                    'tipo': 'volumen_anormal',
+                    'cripto': simbolo,
+                    'valor': float(volatilidad),
+                    'mensaje': f'Alta volatilidad en {simbolo}: {volatilidad:.1f}%'
+                })
+    
+    return anomalias
+
+@app.route('/api/online/stream', methods=['GET'])
+def stream_online():
+    """
+    Canal SSE: al conectar envía 'estado' (instantánea completa) y después 'precio' por cripto
+    actualizada, 'anomalias' y 'alerta' en cuanto los produce la actualización en segundo plano.
+    """
+    suscripcion = canal_eventos.suscribir()
+    if suscripcion is None:
+        return jsonify({'error': 'Demasiados clientes conectados'}), 503
+    
+    def generar():
+        try:
+            instantanea = estado_mercado.instantanea()
+            yield formato_sse('estado', {
+                'version': instantanea.version,
+                'ultima_actualizacion': instantanea.ultima_actualizacion,
+                'criptos': instantanea.criptos,
+                'analisis': instantanea.analisis_actuales
+            })
+            while not suscripcion.cerrada:
+                eventos = suscripcion.siguientes(CONFIG_STREAM['latido'])
+                if not eventos:
+                    yield ': latido\n\n'
+                for evento in eventos:
+                    yield formato_sse(evento['tipo'], evento['datos'], evento['id'])
+        finally:
+            canal_eventos.cancelar(suscripcion)
+    
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/online/ia-explicacion', methods=['POST'])
 def ia_explicacion():
     """Generar explicación con IA local de la decisión"""
@@ -720,15 +961,27 @@ def ia_explicacion():
     
     try:
         # Obtener análisis actual si existe
-        indicadores = online_config['analisis_actuales'].get(cripto, {})
+        indicadores = estado_mercado.instantanea().analisis_actuales.get(cripto, {})
         explicacion = generar_explicacion_ia_completa(cripto, indicadores)
         return jsonify({'explicacion': explicacion})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def refrescar_cierres_correlacion(criptos):
+    """Descarga (una vez, por la caché del proveedor) las criptos que el modo online no está actualizando"""
+    pendientes = correlacion_online.pendientes(criptos)
+    if not pendientes:
+        return
+    descarga = obtener_proveedor().history(pendientes, period="7d", interval="1h")
+    for cripto, error in descarga['errores'].items():
+        print(f"Error obteniendo datos de {cripto}: {error}")
+    for cripto, hist in descarga['datos'].items():
+        if len(hist) > 1:
+            correlacion_online.agregar_cierres(cripto, hist['Close'].iloc[:-1])
+
 @app.route('/api/online/correlacion', methods=['POST'])
 def calcular_correlacion_online():
-    """Calcular correlación entre criptomonedas online"""
+    """Matriz de correlación de las últimas CONFIG_CORRELACION['ventana'] velas horarias (incremental)"""
     data = request.get_json()
     criptos = data.get('criptos', [])
     
@@ -736,108 +989,125 @@ def calcular_correlacion_online():
         return jsonify({'error': 'Se necesitan al menos 2 criptomonedas'}), 400
     
     try:
-        # Obtener datos históricos de Yahoo Finance
-        datos = {}
-        for cripto in criptos:
-            try:
-                ticker = yf.Ticker(f"{cripto}-USD")
-                hist = ticker.history(period="30d", interval="1d")
-                if not hist.empty:
-                    datos[cripto] = hist['Close']
-            except Exception as e:
-                print(f"Error obteniendo datos de {cripto}: {e}")
-                continue
-        
-        if len(datos) < 2:
+        refrescar_cierres_correlacion(criptos)
+        criptos = [c for c in criptos if c in correlacion_online.simbolos()]
+        if len(criptos) < 2:
             return jsonify({'error': 'No se pudieron obtener datos suficientes'}), 400
         
-        df_combined = pd.DataFrame(datos)
-        df_combined = df_combined.dropna()
-        
-        if len(df_combined) < 5:
+        corr_matrix, periodo = correlacion_online.matriz(criptos)
+        if periodo < 5:
             return jsonify({'error': 'Datos históricos insuficientes'}), 400
         
-        # Calcular retornos
-        returns = df_combined.pct_change().dropna()
-        corr_matrix = returns.corr()
-        
-        # Preparar matriz para JSON
-        matriz_valores = []
-        for i in range(len(corr_matrix.columns)):
-            fila = []
-            for j in range(len(corr_matrix.columns)):
-                valor = float(corr_matrix.iloc[i, j])
-                # Asegurar que no haya NaN
-                if np.isnan(valor):
-                    valor = 0.0
-                fila.append(valor)
-            matriz_valores.append(fila)
+        # Asegurar que no haya NaN (cripto con precio constante)
+        corr_matrix = np.nan_to_num(corr_matrix, nan=0.0)
+        matriz_valores = corr_matrix.tolist()
         
         # Recomendaciones
         recomendaciones = []
-        for i in range(len(corr_matrix.columns)):
-            for j in range(i+1, len(corr_matrix.columns)):
-                corr_val = float(corr_matrix.iloc[i, j])
-                if not np.isnan(corr_val):
-                    if corr_val < 0.3:
-                        recomendaciones.append({
-                            'par': f"{corr_matrix.columns[i]}-{corr_matrix.columns[j]}",
-                            'correlacion': corr_val,
-                            'tipo': 'Diversificación ideal',
-                            'mensaje': f'Baja correlación ({corr_val:.2f}) - Buena para diversificar riesgo'
-                        })
-                    elif corr_val > 0.9:
-                        recomendaciones.append({
-                            'par': f"{corr_matrix.columns[i]}-{corr_matrix.columns[j]}",
-                            'correlacion': corr_val,
-                            'tipo': 'Movimiento sincronizado',
-                            'mensaje': f'Alta correlación ({corr_val:.2f}) - Se mueven juntas, evitar sobreexposición'
-                        })
+        for i in range(len(criptos)):
+            for j in range(i+1, len(criptos)):
+                corr_val = float(corr_matrix[i, j])
+                if corr_val < 0.3:
+                    recomendaciones.append({
+                        'par': f"{criptos[i]}-{criptos[j]}",
+                        'correlacion': corr_val,
+                        'tipo': 'Diversificación ideal',
+                        'mensaje': f'Baja correlación ({corr_val:.2f}) - Buena para diversificar riesgo'
+                    })
+                elif corr_val > 0.9:
+                    recomendaciones.append({
+                        'par': f"{criptos[i]}-{criptos[j]}",
+                        'correlacion': corr_val,
+                        'tipo': 'Movimiento sincronizado',
+                        'mensaje': f'Alta correlación ({corr_val:.2f}) - Se mueven juntas, evitar sobreexposición'
+                    })
         
         # Calcular estadísticas
-        valores_matriz = np.array(matriz_valores)
-        valores_validos = valores_matriz[~np.isnan(valores_matriz)]
+        valores_validos = corr_matrix.ravel()
         
         return jsonify({
             'matriz_correlacion': {
-                'labels': list(corr_matrix.columns),
+                'labels': criptos,
                 'valores': matriz_valores
             },
             'recomendaciones': recomendaciones,
-            'periodo_analisis': len(returns),
+            'periodo_analisis': periodo,
             'estadisticas': {
-                'correlacion_promedio': float(np.mean(valores_validos)) if len(valores_validos) > 0 else 0.0,
-                'max_correlacion': float(np.max(valores_validos)) if len(valores_validos) > 0 else 0.0,
-                'min_correlacion': float(np.min(valores_validos)) if len(valores_validos) > 0 else 0.0
+                'correlacion_promedio': float(np.mean(valores_validos)),
+                'max_correlacion': float(np.max(valores_validos)),
+                'min_correlacion': float(np.min(valores_validos))
             }
         })
     except Exception as e:
         print(f"Error en correlación online: {e}")
         return jsonify({'error': f'Error procesando correlación: {str(e)}'}), 500
 
+@app.route('/api/online/correlacion-movil', methods=['POST'])
+def calcular_correlacion_movil_online():
+    """Correlación de cada par en ventanas móviles de `ventana` velas horarias (deriva de la correlación)"""
+    data = request.get_json() or {}
+    criptos = data.get('criptos', [])
+    
+    if len(criptos) < 2:
+        return jsonify({'error': 'Se necesitan al menos 2 criptomonedas'}), 400
+    
+    try:
+        ventana = int(data.get('ventana') or CONFIG_CORRELACION['ventana_movil'])
+        if ventana < 2:
+            raise ValueError('La ventana debe ser de al menos 2 velas')
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        refrescar_cierres_correlacion(criptos)
+        precios = correlacion_online.alineados(criptos)
+        if precios.shape[1] < 2 or len(precios) <= ventana:
+            return jsonify({'error': 'Datos históricos insuficientes'}), 400
+        
+        movil = correlacion_movil(precios.pct_change().iloc[1:], ventana)
+        return jsonify({
+            'labels': list(precios.columns),
+            'ventana': ventana,
+            'fechas': movil.index.strftime('%Y-%m-%d %H:%M').tolist(),
+            'pares': {par: [None if np.isnan(v) else round(float(v), 4) for v in movil[par].to_numpy()]
+                      for par in movil.columns}
+        })
+    except Exception as e:
+        print(f"Error en correlación móvil: {e}")
+        return jsonify({'error': f'Error procesando correlación: {str(e)}'}), 500
+
 @app.route('/api/online/historial/<cripto>', methods=['GET'])
 def get_historial_online(cripto):
     """Obtener historial de precios para gráficos"""
     periodo = request.args.get('periodo', '7d')
     
     try:
-        ticker = yf.Ticker(f"{cripto}-USD")
-        hist = ticker.history(period=periodo, interval="1h")
+        hist = obtener_proveedor().historial(cripto, period=periodo, interval="1h")
+        hist = recortar_rango(hist, **parametros_rango(request.args))
         
         if hist.empty:
             return jsonify({'error': 'Sin datos'}), 404
         
-        return jsonify({
-            'fechas': hist.index.strftime('%Y-%m-%d %H:%M').tolist(),
-            'precios': hist['Close'].tolist(),
-            'volumenes': hist['Volume'].tolist(),
-            'open': hist['Open'].tolist(),
-            'high': hist['High'].tolist(),
-            'low': hist['Low'].tolist()
-        })
+        return responder_series(Serie.desde_dataframe(hist, '%Y-%m-%d %H:%M'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/online/historial-precios/<cripto>', methods=['GET'])
+def get_historial_precios(cripto):
+    """Puntos registrados por las actualizaciones online (buffer circular), los más recientes al final"""
+    ultimos_n = request.args.get('ultimos_n', type=int)
+    ventana = estado_mercado.instantanea().historial(cripto, ultimos_n)
+    if ventana is None:
+        return jsonify({'error': 'Sin historial para esta cripto'}), 404
+    
+    marcas, valores = ventana
+    respuesta = {'timestamps': (marcas // 1_000_000).tolist()}
+    for i, columna in enumerate(COLUMNAS_OHLCV):
+        respuesta[columna.lower()] = valores[:, i].tolist()
+    return jsonify(respuesta)
+
 @app.route('/api/online/config-alerta', methods=['POST'])
 def configurar_alerta():
     """Configurar alertas personalizadas"""
@@ -847,143 +1117,111 @@ def configurar_alerta():
 
 # ==================== SISTEMA DE ALERTAS ====================
 
-# Almacenamiento de alertas en memoria (persistente durante la sesión)
+# Alertas y ajustes en SQLite (configuracion.db); alertas_configuradas es la copia en memoria
+# que usa el motor y se relee tras cada cambio
+almacen_configuracion = AlmacenConfiguracion()
 alertas_configuradas = []
 alertas_activas = []
+lock_alertas = threading.Lock()  # releer + recompilar: el último en entrar ve todos los cambios
+
+# Índices de umbrales de las alertas: se recompilan al cambiar la lista y se evalúan tras cada actualización.
+# Cada disparo (por cruce, con histéresis y enfriamiento) se añade al registro de eventos.
+motor_alertas = MotorAlertas()
+registro_alertas = RegistroEventos()
 
 @app.route('/api/online/guardar-alerta', methods=['POST'])
 def guardar_alerta_completa():
-    """Guardar alerta en memoria y archivo JSON"""
-    global alertas_configuradas
-    
-    data = request.get_json()
-    alerta = {
-        'id': len(alertas_configuradas) + 1,
-        'tipo': data.get('tipo'),
-        'cripto': data.get('cripto'),
-        'valor': data.get('valor'),
-        'condicion': data.get('condicion'),
-        'activa': True,
-        'fecha_creacion': datetime.now().isoformat(),
-        'ultima_ejecucion': None,
-        'ejecuciones': []
-    }
-    
-    alertas_configuradas.append(alerta)
-    
-    # Guardar en archivo JSON
+    """Guardar alerta en la base de datos de configuración"""
+    data = request.get_json() or {}
     try:
-        with open('alertas_config.json', 'w') as f:
-            json.dump(alertas_configuradas, f, indent=2)
+        alerta = almacen_configuracion.crear_alerta({
+            'tipo': data.get('tipo'),
+            'cripto': data.get('cripto'),
+            'valor': data.get('valor'),
+            'condicion': data.get('condicion'),
+            'histeresis': data.get('histeresis'),  # None = CONFIG_ALERTAS['histeresis']
+            'enfriamiento': data.get('enfriamiento')  # segundos; None = CONFIG_ALERTAS['enfriamiento']
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error guardando alertas: {e}")
+        return jsonify({'error': str(e)}), 500
     
+    cargar_alertas_guardadas()
     return jsonify({'success': True, 'alerta': alerta})
 
 @app.route('/api/online/obtener-alertas', methods=['GET'])
 def obtener_alertas():
-    """Obtener todas las alertas configuradas"""
-    return jsonify({'alertas': alertas_configuradas})
+    """Alertas configuradas (?cripto=&tipo= opcionales), con sus ejecuciones según el registro de eventos"""
+    cripto, tipo = request.args.get('cripto'), request.args.get('tipo')
+    configuradas = almacen_configuracion.alertas(cripto, tipo) if cripto or tipo else alertas_configuradas
+    resumen = registro_alertas.resumen()
+    alertas = [dict(a, **resumen.get(a['id'], {'ejecuciones': 0, 'ultima_ejecucion': None}))
+               for a in configuradas]
+    return jsonify({'alertas': alertas})
+
+@app.route('/api/online/alertas/eventos', methods=['GET'])
+def obtener_eventos_alertas():
+    """Disparos de alertas, del más reciente al más antiguo (?antes_id=&limite=&cripto=&alerta_id=)"""
+    return jsonify(registro_alertas.consultar(
+        antes_id=request.args.get('antes_id', type=int),
+        limite=request.args.get('limite', type=int),
+        cripto=request.args.get('cripto') or None,
+        alerta_id=request.args.get('alerta_id', type=int)
+    ))
 
 @app.route('/api/online/eliminar-alerta/<int:alerta_id>', methods=['DELETE'])
 def eliminar_alerta(alerta_id):
     """Eliminar alerta específica"""
-    global alertas_configuradas
-    
-    alertas_configuradas = [a for a in alertas_configuradas if a['id'] != alerta_id]
-    
-    # Actualizar archivo
     try:
-        with open('alertas_config.json', 'w') as f:
-            json.dump(alertas_configuradas, f, indent=2)
+        eliminada = almacen_configuracion.eliminar_alerta(alerta_id)
     except Exception as e:
         print(f"Error actualizando alertas: {e}")
+        return jsonify({'error': str(e)}), 500
+    if not eliminada:
+        return jsonify({'error': f'Alerta {alerta_id} no encontrada'}), 404
     
+    cargar_alertas_guardadas()
     return jsonify({'success': True})
 
 def cargar_alertas_guardadas():
-    """Cargar alertas desde archivo al iniciar"""
+    """Relee las alertas de la base de datos y recompila el motor"""
     global alertas_configuradas
     
-    try:
-        if os.path.exists('alertas_config.json'):
-            with open('alertas_config.json', 'r') as f:
-                alertas_configuradas = json.load(f)
-    except Exception as e:
-        print(f"Error cargando alertas: {e}")
-        alertas_configuradas = []
-
-def verificar_alertas_activas():
-    """Verificar todas las alertas configuradas contra datos actuales"""
-    global alertas_activas
-    
-    if not online_config['activo'] or not alertas_configuradas:
-        return
-    
-    nuevas_alertas = []
-    datos_actuales = online_config['datos_actuales']
-    analisis_actuales = online_config['analisis_actuales']
-    
-    for alerta in alertas_configuradas:
-        if not alerta['activa']:
-            continue
-            
+    with lock_alertas:
         try:
-            cripto = alerta['cripto']
-            if cripto == 'all':
-                # Verificar para todas las criptos
-                for cripto_actual in datos_actuales.keys():
-                    if verificar_alerta_individual(alerta, cripto_actual, datos_actuales, analisis_actuales):
-                        alerta_copia = alerta.copy()
-                        alerta_copia['cripto_afectada'] = cripto_actual
-                        nuevas_alertas.append(alerta_copia)
-            else:
-                # Verificar para cripto específica
-                if cripto in datos_actuales and verificar_alerta_individual(alerta, cripto, datos_actuales, analisis_actuales):
-                    alerta['cripto_afectada'] = cripto
-                    nuevas_alertas.append(alerta)
-                    
+            alertas_configuradas = almacen_configuracion.alertas()
         except Exception as e:
-            print(f"Error verificando alerta {alerta['id']}: {e}")
-    
-    alertas_activas = nuevas_alertas
-
-def verificar_alerta_individual(alerta, cripto, datos_actuales, analisis_actuales):
-    """Verificar si una alerta específica se debe activar"""
-    tipo = alerta['tipo']
+            print(f"Error cargando alertas: {e}")
+            alertas_configuradas = []
+        motor_alertas.cargar(alertas_configuradas)
+
+def cargar_ajustes_online():
+    """Recupera las criptos e intervalo del último inicio del modo online (sin activarlo)"""
+    online_config['intervalo_minutos'] = almacen_configuracion.ajuste(
+        'online.intervalo_minutos', online_config['intervalo_minutos'])
+    online_config['criptos_seleccionadas'] = almacen_configuracion.ajuste(
+        'online.criptos_seleccionadas', ['BTC', 'ETH', 'BNB'])
+
+cargar_alertas_guardadas()
+cargar_ajustes_online()
+
+def verificar_alertas_activas(instantanea=None, criptos=None):
+    """
+    Evalúa las alertas contra una instantánea (la vigente por defecto): solo las criptos actualizadas (`criptos`)
+    y, dentro de ellas, las métricas que cambiaron. Devuelve los eventos de las alertas que dispararon
+    (ya guardados en el registro); `alertas_activas` son las disparadas que aún no se han rearmado.
+    """
+    global alertas_activas
     
-    if tipo == 'pump':
-        cambio = analisis_actuales.get(cripto, {}).get('cambio_esperado', 0)
-        return cambio > 10
-    elif tipo == 'dump':
-        cambio = analisis_actuales.get(cripto, {}).get('cambio_esperado', 0)
-        return cambio < -10
-    elif tipo == 'volumen':
-        volatilidad = analisis_actuales.get(cripto, {}).get('indicadores', {}).get('volatilidad', 0)
-        return volatilidad > 10  # 10% de volatilidad
-    elif tipo == 'rsi':
-        rsi = analisis_actuales.get(cripto, {}).get('rsi', 50)
-        return rsi > 80 or rsi < 20
-    elif tipo == 'precio':
-        precio_actual = datos_actuales.get(cripto, {}).get('precio', 0)
-        valor_objetivo = float(alerta.get('valor', 0))
-        condicion = alerta.get('condicion', 'above')
-        
-        if condicion == 'above':
-            return precio_actual >= valor_objetivo
-        else:
-            return precio_actual <= valor_objetivo
-    elif tipo == 'cambio':
-        cambio = analisis_actuales.get(cripto, {}).get('cambio_esperado', 0)
-        valor_cambio = float(alerta.get('valor', 0))
-        condicion = alerta.get('condicion', 'increase')
-        
-        if condicion == 'increase':
-            return cambio >= valor_cambio
-        else:
-            return cambio <= -valor_cambio
+    if not online_config['activo'] or not alertas_configuradas:
+        return []
     
-    return False
+    instantanea = instantanea or estado_mercado.instantanea()
+    resultado = motor_alertas.evaluar(instantanea.datos_actuales, instantanea.analisis_actuales, criptos)
+    alertas_activas = motor_alertas.activas()
+    return registro_alertas.agregar(resultado['disparadas'])
 
 @app.route('/api/online/comparacion', methods=['POST'])
 def comparacion_online():
@@ -997,9 +1235,10 @@ def comparacion_online():
 
     try:
         resultados = []
+        analisis_actuales = estado_mercado.instantanea().analisis_actuales
         for cripto in criptos:
-            if cripto in online_config['analisis_actuales']:
-                analisis = online_config['analisis_actuales'][cripto]
+            if cripto in analisis_actuales:
+                analisis = analisis_actuales[cripto]
                 
                 valor = None
                 if metrica == 'precio':
@@ -1039,151 +1278,160 @@ def backtesting_online():
         return jsonify({'error': 'Criptomoneda requerida'}), 400
 
     try:
+        costes = parametros_costes(data)
         # Obtener datos históricos
-        ticker = yf.Ticker(f"{cripto}-USD")
-        df = ticker.history(period="1y", interval="1d")
+        df = obtener_proveedor().historial(cripto, period="1y", interval="1d")
         
         if df.empty or len(df) < 200:
             return jsonify({'error': 'Datos insuficientes para backtesting'}), 400
 
-        resultado = backtesting_estrategia(df, capital, estrategia)
+        resultado = backtesting_estrategia(df, capital, estrategia, **costes)
         return jsonify(resultado)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # ==================== FUNCIONES AUXILIARES ====================
 
-def loop_automatico():
-    """Loop automático para actualización online"""
-    while online_config['activo']:
-        try:
-            actualizar_datos_online()
-            # Dormir por el intervalo configurado
-            for _ in range(online_config['intervalo_minutos'] * 60):
-                if not online_config['activo']:
-                    break
-                time.sleep(1)
-        except Exception as e:
-            print(f"Error en loop automático: {e}")
-            time.sleep(60)
-
-def actualizar_datos_online():
-    """Actualizar datos desde Yahoo Finance"""
+def actualizar_datos_online(proveedor=None, simbolos=None):
+    """
+    Actualizar datos desde el proveedor de mercado (Yahoo Finance por defecto).
+    Primero se piden todas las criptos (`simbolos` o las seleccionadas) en un lote y después
+    se analizan los históricos reunidos. `proveedor` permite usar otro (replay, fuentes
+    simuladas) solo en esta llamada. Devuelve {'actualizadas': [...], 'errores': {...}}.
+    """
     global online_config
     
     print(f"[{datetime.now()}] Actualizando datos online...")
     
-    for simbolo in online_config['criptos_seleccionadas']:
+    proveedor = proveedor or obtener_proveedor()
+    simbolos = simbolos if simbolos is not None else online_config['criptos_seleccionadas']
+    descarga = proveedor.history(simbolos, period="7d", interval="1h")
+    errores = dict(descarga['errores'])
+    for simbolo, error in errores.items():
+        print(f"⚠️ Sin datos para {simbolo}: {error}")
+    
+    cambios = {}
+    for simbolo, hist in descarga['datos'].items():
         try:
-            # Usar Yahoo Finance directamente
-            ticker = yf.Ticker(f"{simbolo}-USD")
-            hist = ticker.history(period="7d", interval="1h")
-            
-            if hist.empty or len(hist) < 2:
-                print(f"⚠️ Sin datos para {simbolo}")
-                continue
-            
-            # Calcular precio actual y tendencia
-            current_price = float(hist['Close'].iloc[-1])
-            prev_price = float(hist['Close'].iloc[-2])
-            change_pct = ((current_price - prev_price) / prev_price) * 100
-            tendencia = 'ALTA' if change_pct > 0 else 'BAJA' if change_pct < 0 else 'ESTABLE'
-            
-            # Guardar en CSV para uso offline
-            try:
-                hist_clean = hist.copy()
-                if hist_clean.index.tz is not None:
-                    hist_clean.index = hist_clean.index.tz_localize(None)
-                hist_clean.to_csv(f'datos/{simbolo}_online.csv')
-            except Exception as e:
-                print(f"⚠️ Error guardando CSV: {e}")
-            
-            # Análisis completo
-            try:
-                estadisticas = limpieza_datos(hist)
-                prediccion = predecir_precio(hist)
-                decision_info = tomar_desiciones(current_price, estadisticas, prediccion, tendencia)
-                
-                # Calcular RSI
-                try:
-                    rsi_vals = calcular_rsi(hist['Close'])
-                    rsi_val = float(rsi_vals.iloc[-1]) if not rsi_vals.empty else 50.0
-                except:
-                    rsi_val = 50.0
-                
-                # Calcular MACD
-                try:
-                    macd_df = calcular_macd(hist['Close'])
-                    macd_val = float(macd_df['macd'].iloc[-1]) if not macd_df.empty else 0.0
-                except:
-                    macd_val = 0.0
-                
-                # Guardar historial para gráficos
-                if simbolo not in online_config['historial_precios']:
-                    online_config['historial_precios'][simbolo] = []
-                
-                online_config['historial_precios'][simbolo].append({
-                    'timestamp': datetime.now().isoformat(),
-                    'precio': current_price
-                })
-                
-                # Mantener solo últimos 100 puntos
-                if len(online_config['historial_precios'][simbolo]) > 100:
-                    online_config['historial_precios'][simbolo] = online_config['historial_precios'][simbolo][-100:]
-                
-                online_config['datos_actuales'][simbolo] = {
-                    'precio': current_price,
-                    'tendencia': tendencia,
-                    'volumen_24h': float(hist['Volume'].sum()) if 'Volume' in hist.columns else 0,
-                    'high_24h': float(hist['High'].max()) if 'High' in hist.columns else current_price,
-                    'low_24h': float(hist['Low'].min()) if 'Low' in hist.columns else current_price,
-                    'change_24h': change_pct
-                }
-                
-                online_config['analisis_actuales'][simbolo] = {
-                    'precio_actual': current_price,
-                    'tendencia': tendencia,
-                    'decision': decision_info['decision'],
-                    'confianza': float(decision_info['confianza']),
-                    'prediccion': float(prediccion['prediccion_final']),
-                    'cambio_esperado': float(prediccion['cambio_porcentual']),
-                    'rsi': rsi_val,
-                    'macd': macd_val,
-                    'indicadores': {
-                        'media': float(estadisticas['media']),
-                        'volatilidad': float(estadisticas['desviacion'] / estadisticas['media'] * 100) if estadisticas['media'] > 0 else 0
-                    }
-                }
-                
-                print(f"  ✅ {simbolo}: ${current_price:,.2f} - {decision_info['decision']}")
-                
-            except Exception as e:
-                print(f"  ❌ Error en análisis de {simbolo}: {e}")
-                
+            cambios[simbolo] = analizar_historial_online(simbolo, hist, guardar_csv=proveedor.guardar_csv)
         except Exception as e:
-            print(f"❌ Error crítico actualizando {simbolo}: {e}")
+            errores[simbolo] = str(e)
             continue
+        # La última vela sigue abierta: solo las cerradas entran en la correlación
+        correlacion_online.agregar_cierres(simbolo, hist['Close'].iloc[:-1])
+    
+    # Una sola versión nueva con todas las criptos actualizadas
+    instantanea = estado_mercado.publicar(cambios)
+    difundir_actualizacion(instantanea, cambios)
+    print(f"[{datetime.now()}] Actualización completada en {descarga['tiempo_segundos']}s (versión {instantanea.version})")
+    return {'actualizadas': list(cambios), 'errores': errores}
+
+def difundir_actualizacion(instantanea, cambios):
+    """Publica en el canal SSE las criptos actualizadas, las anomalías y las alertas disparadas"""
+    for simbolo, cambio in cambios.items():
+        canal_eventos.publicar('precio', {
+            'version': instantanea.version,
+            'cripto': simbolo,
+            'datos': cambio['datos'],
+            'analisis': cambio['analisis']
+        }, clave=simbolo)
+    
+    anomalias = calcular_anomalias(instantanea)
+    canal_eventos.publicar('anomalias', {'anomalias': anomalias, 'count': len(anomalias)}, clave='anomalias')
     
-    online_config['ultima_actualizacion'] = datetime.now().isoformat()
-    print(f"[{datetime.now()}] Actualización completada")
-
-def calcular_rsi(prices, period=14):
-    """Calcular RSI"""
-    delta = prices.diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-def calcular_macd(prices, fast=12, slow=26, signal=9):
-    """Calcular MACD"""
-    ema_fast = prices.ewm(span=fast).mean()
-    ema_slow = prices.ewm(span=slow).mean()
-    macd = ema_fast - ema_slow
-    signal_line = macd.ewm(span=signal).mean()
-    histogram = macd - signal_line
-    return pd.DataFrame({'macd': macd, 'signal': signal_line, 'histogram': histogram})
+    # Solo los disparos nuevos: una alerta que sigue cumpliéndose no se repite
+    for evento in verificar_alertas_activas(instantanea, list(cambios)):
+        canal_eventos.publicar('alerta', evento)
+
+def analizar_historial_online(simbolo, hist, guardar_csv=True):
+    """
+    Analizar el histórico descargado de una cripto.
+    Devuelve sus entradas nuevas para el estado online ({'datos', 'analisis', 'punto'}).
+    """
+    if hist.empty or len(hist) < 2:
+        print(f"⚠️ Sin datos para {simbolo}")
+        raise ValueError('Datos insuficientes')
+    
+    # Calcular precio actual y tendencia
+    current_price = float(hist['Close'].iloc[-1])
+    prev_price = float(hist['Close'].iloc[-2])
+    change_pct = ((current_price - prev_price) / prev_price) * 100
+    tendencia = 'ALTA' if change_pct > 0 else 'BAJA' if change_pct < 0 else 'ESTABLE'
+    
+    # Guardar en CSV (y en el almacén binario) para uso offline
+    if guardar_csv:
+        try:
+            hist_clean = hist.copy()
+            if hist_clean.index.tz is not None:
+                hist_clean.index = hist_clean.index.tz_localize(None)
+            ruta_csv = os.path.join('datos', f'{simbolo}_online.csv')
+            hist_clean.to_csv(ruta_csv)
+            guardar_serie(hist_clean, f'{simbolo}_online', 'datos', ruta_origen=ruta_csv)
+        except Exception as e:
+            print(f"⚠️ Error guardando CSV: {e}")
+    
+    # Análisis completo
+    try:
+        estadisticas = limpieza_datos(hist)
+        
+        # Indicadores incrementales: solo se procesan las velas cerradas nuevas.
+        # La última vela sigue abierta y se aplica como provisional. Se reinicia si hay un
+        # hueco con el histórico o si la serie retrocede (proveedor replay en bucle).
+        estado = online_config['estado_indicadores'].get(simbolo)
+        if estado is None or (estado.ultima_marca is not None and
+                              not hist.index[0] <= estado.ultima_marca <= hist.index[-1]):
+            estado = EstadoIndicadores(VENTANA_REGRESION_ONLINE)
+            online_config['estado_indicadores'][simbolo] = estado
+        estado.actualizar_desde(hist['Close'].iloc[:-1])
+        resumen = estado.resumen(provisional=current_price)
+        
+        prediccion = resumen['prediccion']
+        decision_info = tomar_desiciones(current_price, estadisticas, prediccion, tendencia)
+        rsi_val = float(resumen['rsi'])
+        macd_val = float(resumen['macd']['macd'])
+        if np.isnan(macd_val):
+            macd_val = 0.0
+        
+        # Punto para los gráficos en tiempo real: OHLCV de la vela en curso con el precio actual
+        ultima_vela = hist.iloc[-1]
+        punto = {
+            'marca_ns': time.time_ns(),
+            'valores': [float(ultima_vela.get(c, current_price)) if c != 'Close' else current_price
+                        for c in COLUMNAS_OHLCV]
+        }
+        
+        datos = {
+            'precio': current_price,
+            'tendencia': tendencia,
+            'volumen_24h': float(hist['Volume'].sum()) if 'Volume' in hist.columns else 0,
+            'high_24h': float(hist['High'].max()) if 'High' in hist.columns else current_price,
+            'low_24h': float(hist['Low'].min()) if 'Low' in hist.columns else current_price,
+            'change_24h': change_pct
+        }
+        
+        analisis = {
+            'precio_actual': current_price,
+            'tendencia': tendencia,
+            'decision': decision_info['decision'],
+            'confianza': float(decision_info['confianza']),
+            'prediccion': float(prediccion['prediccion_final']),
+            'cambio_esperado': float(prediccion['cambio_porcentual']),
+            'rsi': rsi_val,
+            'macd': macd_val,
+            'indicadores': {
+                'media': float(estadisticas['media']),
+                'volatilidad': float(estadisticas['desviacion'] / estadisticas['media'] * 100) if estadisticas['media'] > 0 else 0
+            }
+        }
+        
+        print(f"  ✅ {simbolo}: ${current_price:,.2f} - {decision_info['decision']}")
+        return {'datos': datos, 'analisis': analisis, 'punto': punto}
+        
+    except Exception as e:
+        print(f"  ❌ Error en análisis de {simbolo}: {e}")
+        raise
 
 @app.route('/api/online/top100', methods=['GET'])
 def top_100_coinmarketcap():
@@ -0,0 +1,158 @@
+# montecarlo.py - Simulación Monte Carlo (GBM) por bloques con memoria acotada
+#
+# Las trayectorias se generan en bloques de filas: ningún momento se guardan todas.
+# La trayectoria media se acumula sumando por día y las bandas de percentiles con un
+# histograma por día del log-rendimiento acumulado (tamaño fijo: dias x bins).
+import math
+import time
+
+import numpy as np
+
+from global_data import CONFIG_MONTECARLO
+
+# Desviación del log-normal subyacente usado para la distribución 'lognormal'
+SIGMA_LOGNORMAL = 0.5
+# Rango del histograma en desviaciones típicas del log-rendimiento acumulado
+RANGO_HISTOGRAMA = 8.0
+# Arrays float64 de (bloque, dias) vivos a la vez al procesar un bloque
+ARRAYS_POR_BLOQUE = 4
+
+
+def generar_shocks(rng: np.random.Generator, distribucion: str, forma: tuple) -> np.ndarray:
+    """Shocks estandarizados (media 0, varianza 1) de la distribución pedida"""
+    if distribucion == 'normal':
+        return rng.standard_normal(forma)
+    if distribucion == 'lognormal':
+        media = math.exp(SIGMA_LOGNORMAL ** 2 / 2)
+        desviacion = math.sqrt((math.exp(SIGMA_LOGNORMAL ** 2) - 1) * math.exp(SIGMA_LOGNORMAL ** 2))
+        shocks = rng.lognormal(0.0, SIGMA_LOGNORMAL, forma)
+        shocks -= media
+        shocks /= desviacion
+        return shocks
+    if distribucion == 'uniforme':
+        return rng.uniform(-math.sqrt(3), math.sqrt(3), forma)
+    if distribucion == 'exponencial':
+        shocks = rng.standard_exponential(forma)
+        shocks -= 1.0
+        return shocks
+    raise ValueError(f"Distribución no soportada: {distribucion}")
+
+
+class BandasPercentiles:
+    """
+    Percentiles por día sin guardar las trayectorias: cada día tiene un histograma fijo
+    del log-rendimiento acumulado centrado en su media teórica (± RANGO_HISTOGRAMA desviaciones).
+    Los valores fuera de rango caen en los bins extremos.
+    """
+
+    def __init__(self, dias: int, deriva: float, volatilidad: float, bins: int):
+        self.dias = dias
+        self.bins = bins
+        t = np.arange(dias, dtype=np.float64)
+        dispersion = np.maximum(volatilidad * np.sqrt(t), 1e-12)
+        self.minimo = deriva * t - RANGO_HISTOGRAMA * dispersion
+        self.ancho = 2 * RANGO_HISTOGRAMA * dispersion / bins
+        self.conteos = np.zeros(dias * bins, dtype=np.int64)
+        self._desplazamiento = (np.arange(dias) * bins)[None, :]
+        self.total = 0
+
+    def agregar(self, log_rendimientos: np.ndarray):
+        """Acumula un bloque (trayectorias, dias) de log(S_t / S_0)"""
+        posiciones = (log_rendimientos - self.minimo) / self.ancho
+        np.clip(posiciones, 0, self.bins - 1, out=posiciones)
+        indices = posiciones.astype(np.int64)
+        del posiciones
+        indices += self._desplazamiento
+        self.conteos += np.bincount(indices.ravel(), minlength=self.dias * self.bins)
+        self.total += log_rendimientos.shape[0]
+
+    def percentiles(self, cuantiles: list) -> dict:
+        """{q: array de log-rendimientos} interpolando linealmente dentro del bin"""
+        conteos = self.conteos.reshape(self.dias, self.bins)
+        acumulado = np.cumsum(conteos, axis=1)
+        resultado = {}
+        for q in cuantiles:
+            objetivo = q / 100 * self.total
+            # Primer bin cuyo acumulado alcanza el objetivo, para cada día
+            indice = np.minimum((acumulado < objetivo).sum(axis=1), self.bins - 1)
+            filas = np.arange(self.dias)
+            previo = np.where(indice > 0, acumulado[filas, np.maximum(indice - 1, 0)], 0)
+            en_bin = np.maximum(conteos[filas, indice], 1)
+            fraccion = np.clip((objetivo - previo) / en_bin, 0.0, 1.0)
+            resultado[q] = self.minimo + (indice + fraccion) * self.ancho
+        # El día 0 es el precio inicial en todas las trayectorias
+        for q in resultado:
+            resultado[q][0] = 0.0
+        return resultado
+
+
+def cuantiles_confianza(confianza: float) -> list:
+    """Cola inferior, mediana y cola superior para un nivel de confianza (0.95 -> 2.5/50/97.5)"""
+    cola = (1 - confianza) / 2 * 100
+    return [round(cola, 6), 50.0, round(100 - cola, 6)]
+
+
+def simular_montecarlo(precio_inicial: float = 50000, dias: int = 90, volatilidad: float = 0.03,
+                       tendencia: float = 0.001, iteraciones: int = None, distribucion: str = 'normal',
+                       confianza: float = None, semilla: int = None, percentiles: list = None,
+                       memoria_mb: float = None) -> dict:
+    """
+    Movimiento browniano geométrico con shocks de `distribucion`.
+    Devuelve la trayectoria media y las bandas de percentiles (por defecto según `confianza`).
+    El pico de memoria queda por debajo de `memoria_mb` más el histograma de percentiles.
+    """
+    iteraciones = int(iteraciones or CONFIG_MONTECARLO['iteraciones'])
+    confianza = confianza if confianza is not None else CONFIG_MONTECARLO['confianza']
+    semilla = semilla if semilla is not None else CONFIG_MONTECARLO['semilla']
+    memoria_mb = memoria_mb or CONFIG_MONTECARLO['memoria_maxima_mb']
+    dias = int(dias)
+
+    if distribucion not in CONFIG_MONTECARLO['distribuciones']:
+        raise ValueError(f"Distribución no soportada: {distribucion}")
+    if iteraciones < 1 or iteraciones > CONFIG_MONTECARLO['iteraciones_maximas']:
+        raise ValueError(f"Iteraciones fuera de rango (1-{CONFIG_MONTECARLO['iteraciones_maximas']})")
+    if dias < 2 or dias > CONFIG_MONTECARLO['dias_maximos']:
+        raise ValueError(f"Días fuera de rango (2-{CONFIG_MONTECARLO['dias_maximos']})")
+    if not 0 < confianza < 1:
+        raise ValueError("La confianza debe estar entre 0 y 1")
+
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(semilla)
+    deriva = tendencia - 0.5 * volatilidad ** 2  # dt = 1 día
+    bandas = BandasPercentiles(dias, deriva, volatilidad, CONFIG_MONTECARLO['bins_percentiles'])
+    suma_precios = np.zeros(dias)
+
+    bytes_por_trayectoria = ARRAYS_POR_BLOQUE * 8 * dias
+    bloque = max(1, int(memoria_mb * 1024 * 1024 // bytes_por_trayectoria))
+
+    procesadas = 0
+    while procesadas < iteraciones:
+        filas = min(bloque, iteraciones - procesadas)
+        # Todos los shocks del bloque en una sola llamada; el orden de extracción es el
+        # mismo sea cual sea el tamaño del bloque, así que el resultado solo depende de la semilla
+        shocks = generar_shocks(rng, distribucion, (filas, dias - 1))
+        shocks *= volatilidad
+        shocks += deriva
+
+        log_rendimientos = np.empty((filas, dias))
+        log_rendimientos[:, 0] = 0.0
+        np.cumsum(shocks, axis=1, out=log_rendimientos[:, 1:])
+        del shocks
+
+        bandas.agregar(log_rendimientos)
+        np.exp(log_rendimientos, out=log_rendimientos)
+        suma_precios += log_rendimientos.sum(axis=0)
+        del log_rendimientos
+        procesadas += filas
+
+    cuantiles = percentiles or cuantiles_confianza(confianza)
+    return {
+        'media': precio_inicial * suma_precios / iteraciones,
+        'percentiles': {q: precio_inicial * np.exp(v) for q, v in bandas.percentiles(cuantiles).items()},
+        'iteraciones': iteraciones,
+        'distribucion': distribucion,
+        'confianza': confianza,
+        'semilla': semilla,
+        'trayectorias_por_bloque': bloque,
+        'tiempo_segundos': round(time.perf_counter() - inicio, 3)
+    }
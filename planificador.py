@@ -0,0 +1,200 @@
+# planificador.py - Planificador de actualizaciones online en segundo plano
+#
+# Un hilo reloj mantiene una tarea periódica por cripto (intervalo propio + jitter) y encola
+# trabajos cuando vencen; las criptos que vencen a la vez van en un mismo trabajo para que
+# el proveedor las descargue en un solo lote. Un único hilo trabajador ejecuta los trabajos
+# en orden, así las rutas HTTP solo encolan y devuelven el id del trabajo al momento.
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from global_data import CONFIG_ACTUALIZACION
+
+# Estados de un trabajo
+PENDIENTE, EJECUTANDO, COMPLETADO, ERROR, CANCELADO = 'pendiente', 'ejecutando', 'completado', 'error', 'cancelado'
+
+
+class Planificador:
+    """
+    `ejecutar(simbolos)` actualiza esas criptos y devuelve {'actualizadas': [...], 'errores': {simbolo: msg}}.
+    Los hilos arrancan con el primer trabajo o tarea programada y se paran con detener().
+    """
+
+    def __init__(self, ejecutar, jitter: float = None, maximo_trabajos: int = None, semilla: int = None):
+        self.ejecutar = ejecutar
+        self.jitter = jitter if jitter is not None else CONFIG_ACTUALIZACION['jitter']
+        self.maximo_trabajos = maximo_trabajos or CONFIG_ACTUALIZACION['historial_trabajos']
+        self._azar = random.Random(semilla)
+        self._condicion = threading.Condition()
+        self._tareas = {}  # simbolo -> {'intervalo': segundos, 'proxima': monotonic}
+        self._criptos = {}  # simbolo -> última actualización / último error
+        self._trabajos = OrderedDict()  # id -> trabajo (los más recientes al final)
+        self._en_cola = Counter()  # cripto -> trabajos pendientes o en ejecución que la incluyen
+        self._ids = itertools.count(1)
+        self._en_curso = None
+        self._cola = None
+        self._detenido = None
+        self._hilos = []
+
+    # ---------- API pública ----------
+
+    def programar(self, intervalos: dict):
+        """Sustituye las tareas periódicas: {simbolo: intervalo en segundos}. La primera ejecución es tras un intervalo"""
+        with self._condicion:
+            self._asegurar_hilos()
+            ahora = time.monotonic()
+            self._tareas = {s: {'intervalo': float(i), 'proxima': ahora + self._con_jitter(float(i))}
+                            for s, i in intervalos.items()}
+            self._condicion.notify_all()
+
+    def encolar(self, simbolos: list, origen: str = 'manual') -> dict:
+        """Encola una actualización inmediata y devuelve el trabajo (con su id) sin esperar"""
+        with self._condicion:
+            self._asegurar_hilos()
+            return dict(self._encolar(list(simbolos), origen))
+
+    def trabajo(self, id_trabajo: int) -> dict:
+        with self._condicion:
+            trabajo = self._trabajos.get(id_trabajo)
+            return dict(trabajo) if trabajo else None
+
+    def estado(self) -> dict:
+        with self._condicion:
+            ahora = time.monotonic()
+            criptos = {}
+            for simbolo in sorted(set(self._tareas) | set(self._criptos)):
+                tarea = self._tareas.get(simbolo)
+                info = self._criptos.get(simbolo, {})
+                criptos[simbolo] = {
+                    'intervalo_segundos': tarea['intervalo'] if tarea else None,
+                    'proxima_en_segundos': round(max(tarea['proxima'] - ahora, 0), 1) if tarea else None,
+                    'ultima_actualizacion': info.get('ultima_actualizacion'),
+                    'ultimo_error': info.get('ultimo_error'),
+                    'en_cola': simbolo in self._en_cola
+                }
+            return {
+                'activo': self._activo(),
+                'profundidad_cola': sum(1 for t in self._trabajos.values() if t['estado'] == PENDIENTE),
+                'trabajo_en_curso': self._en_curso,
+                'criptos': criptos
+            }
+
+    def detener(self, timeout: float = 10):
+        """Cancela tareas y trabajos pendientes, despierta a los hilos y espera a que terminen"""
+        with self._condicion:
+            if self._detenido is None:
+                return
+            self._detenido.set()
+            self._tareas = {}
+            for trabajo in self._trabajos.values():
+                if trabajo['estado'] == PENDIENTE:
+                    trabajo['estado'] = CANCELADO
+                    trabajo['fin'] = datetime.now().isoformat()
+            self._en_cola.clear()
+            self._cola.put(None)
+            self._condicion.notify_all()
+            hilos, self._hilos = self._hilos, []
+        # Fuera del lock: el trabajador lo necesita para cerrar el trabajo en curso
+        for hilo in hilos:
+            if hilo is not threading.current_thread():
+                hilo.join(timeout)
+
+    # ---------- Interno ----------
+
+    def _activo(self) -> bool:
+        return bool(self._hilos) and not self._detenido.is_set() and all(h.is_alive() for h in self._hilos)
+
+    def _asegurar_hilos(self):
+        """Arranca (o rearranca tras detener) el reloj y el trabajador; requiere el lock"""
+        if self._activo():
+            return
+        # Cola y evento nuevos por generación: un trabajador anterior que aún termina no los ve
+        self._cola = queue.Queue()
+        self._detenido = threading.Event()
+        self._hilos = [
+            threading.Thread(target=self._reloj, args=(self._detenido,), name='planificador-reloj', daemon=True),
+            threading.Thread(target=self._trabajador, args=(self._cola, self._detenido),
+                             name='planificador-trabajador', daemon=True)
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def _con_jitter(self, intervalo: float) -> float:
+        return intervalo * (1 + self._azar.uniform(-self.jitter, self.jitter))
+
+    def _encolar(self, simbolos: list, origen: str) -> dict:
+        """Registra el trabajo y lo pone en la cola; requiere el lock"""
+        trabajo = {
+            'id': next(self._ids),
+            'simbolos': simbolos,
+            'origen': origen,
+            'estado': PENDIENTE,
+            'creado': datetime.now().isoformat(),
+            'inicio': None,
+            'fin': None,
+            'actualizadas': [],
+            'errores': {}
+        }
+        self._trabajos[trabajo['id']] = trabajo
+        self._en_cola.update(simbolos)
+        # Olvidar los trabajos terminados más antiguos
+        while len(self._trabajos) > self.maximo_trabajos:
+            antiguo = next(iter(self._trabajos.values()))
+            if antiguo['estado'] in (PENDIENTE, EJECUTANDO):
+                break
+            self._trabajos.popitem(last=False)
+        self._cola.put(trabajo['id'])
+        return trabajo
+
+    def _reloj(self, detenido: threading.Event):
+        with self._condicion:
+            while not detenido.is_set():
+                ahora = time.monotonic()
+                vencidas = [s for s, t in self._tareas.items() if t['proxima'] <= ahora]
+                for simbolo in vencidas:
+                    tarea = self._tareas[simbolo]
+                    tarea['proxima'] = ahora + self._con_jitter(tarea['intervalo'])
+                # Si una cripto sigue en cola (actualización más lenta que su intervalo) no se duplica
+                nuevas = [s for s in vencidas if s not in self._en_cola]
+                if nuevas:
+                    self._encolar(nuevas, 'programado')
+                espera = min((t['proxima'] for t in self._tareas.values()), default=None)
+                self._condicion.wait(None if espera is None else max(espera - time.monotonic(), 0))
+
+    def _trabajador(self, cola: queue.Queue, detenido: threading.Event):
+        while True:
+            id_trabajo = cola.get()
+            if id_trabajo is None or detenido.is_set():
+                break
+            with self._condicion:
+                trabajo = self._trabajos.get(id_trabajo)
+                if trabajo is None or trabajo['estado'] != PENDIENTE:
+                    continue
+                trabajo['estado'] = EJECUTANDO
+                trabajo['inicio'] = datetime.now().isoformat()
+                self._en_curso = id_trabajo
+
+            try:
+                resultado = self.ejecutar(trabajo['simbolos'])
+            except Exception as e:
+                print(f"❌ Error en trabajo {id_trabajo}: {e}")
+                resultado = {'actualizadas': [], 'errores': {s: str(e) for s in trabajo['simbolos']}}
+
+            with self._condicion:
+                marca = datetime.now().isoformat()
+                for simbolo in resultado['actualizadas']:
+                    self._criptos[simbolo] = {'ultima_actualizacion': marca, 'ultimo_error': None}
+                for simbolo, error in resultado['errores'].items():
+                    info = self._criptos.setdefault(simbolo, {'ultima_actualizacion': None})
+                    info['ultimo_error'] = error
+                trabajo['actualizadas'] = list(resultado['actualizadas'])
+                trabajo['errores'] = dict(resultado['errores'])
+                trabajo['estado'] = COMPLETADO if resultado['actualizadas'] or not resultado['errores'] else ERROR
+                trabajo['fin'] = marca
+                # Solo sale de la cola si ningún otro trabajo pendiente la incluye (-= descarta los ceros)
+                self._en_cola -= Counter(trabajo['simbolos'])
+                self._en_curso = None
@@ -0,0 +1,379 @@
+# proveedores.py - Proveedores de datos de mercado para el modo online
+#
+# Todas las rutas online piden históricos a través de un proveedor con el método por lotes
+# history(simbolos, period, interval). ProveedorYahoo descarga de Yahoo Finance (descargas.py);
+# ProveedorReplay reproduce las velas guardadas en datos/*_online.csv a la velocidad configurada,
+# lo que permite ejecutar y medir el bucle online sin red. Los proveedores remotos se envuelven
+# en ProveedorConCache, que comparte los históricos entre rutas (caché TTL por intervalo de vela).
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+from global_data import CONFIG_PROVEEDOR
+from almacen_datos import cargar_serie
+from descargas import descargar_historiales, historial_yahoo
+
+# Agregación OHLCV al remuestrear velas a un intervalo mayor
+AGREGACION_OHLCV = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+# Unidades de los periodos/intervalos de Yahoo ('7d', '1mo', '1y', '1h', '15m', '1wk')
+UNIDADES_YAHOO = {'m': 'min', 'h': 'h', 'd': 'D', 'wk': 'W', 'mo': 'D', 'y': 'D'}
+DIAS_POR_UNIDAD = {'mo': 30, 'y': 365}
+
+
+def duracion_yahoo(texto: str):
+    """Convierte un periodo/intervalo de Yahoo ('7d', '1mo', '60m') a Timedelta; None para 'max'/'ytd'"""
+    texto = str(texto).strip().lower()
+    for unidad in ('wk', 'mo', 'm', 'h', 'd', 'y'):
+        if texto.endswith(unidad) and texto[:-len(unidad)].isdigit():
+            cantidad = int(texto[:-len(unidad)]) * DIAS_POR_UNIDAD.get(unidad, 1)
+            return pd.Timedelta(cantidad, UNIDADES_YAHOO[unidad])
+    return None
+
+
+class ProveedorDatos(ABC):
+    """
+    Interfaz de los proveedores. history() devuelve
+    {'datos': {simbolo: DataFrame OHLCV}, 'errores': {simbolo: mensaje}, 'tiempo_segundos'}.
+    Un proveedor sin history() falla al crearlo (TypeError), no en la primera actualización.
+    """
+    nombre = 'base'
+    # Si las actualizaciones online deben sobrescribir datos/<simbolo>_online.csv
+    guardar_csv = True
+    # Si crear_proveedor lo envuelve en la caché compartida de históricos
+    cacheable = False
+
+    @abstractmethod
+    def history(self, simbolos: list, period: str = "7d", interval: str = "1h") -> dict:
+        """Históricos por lotes de `simbolos`"""
+
+    def historial(self, simbolo: str, period: str = "7d", interval: str = "1h") -> pd.DataFrame:
+        """Histórico de un solo símbolo; DataFrame vacío si no hay datos"""
+        return self.history([simbolo], period, interval)['datos'].get(simbolo, pd.DataFrame())
+
+
+class ProveedorYahoo(ProveedorDatos):
+    """Yahoo Finance con descargas concurrentes, reintentos y timeout de CONFIG_ACTUALIZACION"""
+    nombre = 'yahoo'
+    cacheable = True
+
+    def __init__(self, fuente=None, trabajadores: int = None):
+        # `fuente` sustituye a la llamada a Yahoo (pruebas sin red)
+        self.fuente = fuente or historial_yahoo
+        self.trabajadores = trabajadores
+
+    def history(self, simbolos: list, period: str = "7d", interval: str = "1h") -> dict:
+        return descargar_historiales(simbolos, period, interval, fuente=self.fuente,
+                                     trabajadores=self.trabajadores)
+
+
+class ProveedorReplay(ProveedorDatos):
+    """
+    Reproduce <carpeta>/<simbolo>_online.csv vela a vela. Cada símbolo empieza con
+    `calentamiento` velas visibles y el cursor avanza `velas_por_segundo` (0 = solo con avanzar()).
+    Con `bucle` vuelve al principio al agotar la serie. Los intervalos mayores que el de
+    los datos se remuestrean; el periodo se mide hacia atrás desde la última vela visible.
+    """
+    nombre = 'replay'
+    guardar_csv = False  # no sobrescribir los datos que se están reproduciendo
+
+    def __init__(self, carpeta: str = None, velas_por_segundo: float = None, calentamiento: int = None,
+                 bucle: bool = None):
+        config = CONFIG_PROVEEDOR['replay']
+        self.carpeta = carpeta or config['carpeta']
+        self.velas_por_segundo = velas_por_segundo if velas_por_segundo is not None else config['velas_por_segundo']
+        self.calentamiento = calentamiento if calentamiento is not None else config['calentamiento']
+        self.bucle = bucle if bucle is not None else config['bucle']
+        self._series = {}
+        self._avance_manual = 0
+        self._inicio = time.monotonic()
+        self._lock = threading.Lock()
+
+    def avanzar(self, velas: int = 1):
+        """Adelanta el cursor `velas` velas en todos los símbolos"""
+        with self._lock:
+            self._avance_manual += int(velas)
+
+    def cursor(self) -> int:
+        """Velas reproducidas desde el calentamiento"""
+        with self._lock:
+            return int((time.monotonic() - self._inicio) * self.velas_por_segundo) + self._avance_manual
+
+    def _serie(self, simbolo: str) -> pd.DataFrame:
+        simbolo = simbolo.split('-')[0].upper()
+        with self._lock:
+            if simbolo in self._series:
+                return self._series[simbolo]
+        nombre = f"{simbolo}_online"
+        ruta = os.path.join(self.carpeta, f"{nombre}.csv")
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"Sin datos de replay para {simbolo}")
+        df = cargar_serie(nombre, self.carpeta, ruta_origen=ruta)
+        if df is None:
+            df = pd.read_csv(ruta, index_col=0, parse_dates=True)
+        df = df[[c for c in AGREGACION_OHLCV if c in df.columns]].sort_index().copy()
+        with self._lock:
+            self._series[simbolo] = df
+        return df
+
+    def _ventana(self, df: pd.DataFrame, cursor: int, period: str, interval: str) -> pd.DataFrame:
+        calentamiento = min(max(self.calentamiento, 2), len(df))
+        recorrido = len(df) - calentamiento
+        if self.bucle and recorrido > 0:
+            fin = calentamiento + cursor % (recorrido + 1)
+        else:
+            fin = min(calentamiento + cursor, len(df))
+        visibles = df.iloc[:fin]
+
+        duracion = duracion_yahoo(period)
+        if duracion is not None:
+            visibles = visibles[visibles.index > visibles.index[-1] - duracion]
+
+        paso = duracion_yahoo(interval)
+        if paso is not None and len(df) > 1 and paso > df.index[1] - df.index[0]:
+            agregacion = {c: f for c, f in AGREGACION_OHLCV.items() if c in visibles.columns}
+            visibles = visibles.resample(paso).agg(agregacion).dropna(subset=['Close'])
+        return visibles
+
+    def history(self, simbolos: list, period: str = "7d", interval: str = "1h") -> dict:
+        inicio = time.perf_counter()
+        cursor = self.cursor()
+        datos, errores = {}, {}
+        for simbolo in simbolos:
+            try:
+                ventana = self._ventana(self._serie(simbolo), cursor, period, interval)
+                if ventana.empty:
+                    errores[simbolo] = 'Sin datos'
+                else:
+                    datos[simbolo] = ventana
+            except Exception as e:
+                errores[simbolo] = str(e)
+        return {
+            'datos': datos,
+            'errores': errores,
+            'tiempo_segundos': round(time.perf_counter() - inicio, 3)
+        }
+
+
+class _Descarga:
+    """Descarga en curso de un símbolo; las consultas coincidentes esperan a su evento"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.datos = None
+        self.error = None
+
+
+class CacheHistoriales:
+    """
+    Caché TTL de históricos compartida por todas las rutas online.
+    - Clave (origen, simbolo, interval, period); el TTL es una fracción del intervalo de vela.
+    - Un periodo mayor cacheado con el mismo intervalo responde a uno menor ('1y' sirve '30d').
+    - Los fallos simultáneos de la misma clave se agrupan en una sola descarga.
+    """
+
+    def __init__(self, habilitado: bool = True, fraccion_intervalo: float = 1 / 60, ttl_minimo: float = 5,
+                 ttl_maximo: float = 900, maximo_entradas: int = 256, espera_maxima: float = 120):
+        self.habilitado = habilitado
+        self.fraccion_intervalo = fraccion_intervalo
+        self.ttl_minimo = ttl_minimo
+        self.ttl_maximo = ttl_maximo
+        self.maximo_entradas = maximo_entradas
+        self.espera_maxima = espera_maxima
+        self._grupos = {}  # (origen, simbolo, interval) -> {period: (df, cobertura, expira)}
+        self._en_curso = {}  # (origen, simbolo, interval, period) -> _Descarga
+        self._lock = threading.Lock()
+        self._contadores = dict.fromkeys(('consultas', 'hits', 'hits_superconjunto', 'coalescidas', 'misses',
+                                          'peticiones_upstream', 'simbolos_descargados', 'errores',
+                                          'expulsiones'), 0)
+
+    @classmethod
+    def desde_config(cls, config: dict) -> 'CacheHistoriales':
+        return cls(**config)
+
+    def ttl(self, interval: str) -> float:
+        paso = duracion_yahoo(interval)
+        segundos = paso.total_seconds() * self.fraccion_intervalo if paso is not None else 0
+        return min(max(segundos, self.ttl_minimo), self.ttl_maximo)
+
+    @staticmethod
+    def _cobertura(period: str):
+        """Tramo que cubre un periodo: Timedelta, 'max' cubre todo y None solo se reutiliza tal cual"""
+        if str(period).lower() == 'max':
+            return pd.Timedelta.max
+        return duracion_yahoo(period)
+
+    def _buscar(self, grupo: tuple, period: str):
+        """DataFrame vigente para `period` (exacto o recortado de un periodo mayor); requiere el lock"""
+        entradas = self._grupos.get(grupo)
+        if not entradas:
+            return None
+        ahora = time.monotonic()
+        for clave in [p for p, (_, _, expira) in entradas.items() if expira <= ahora]:
+            del entradas[clave]
+
+        if period in entradas:
+            self._contadores['hits'] += 1
+            return entradas[period][0]
+
+        pedido = self._cobertura(period)
+        if pedido is None:
+            return None
+        candidatos = [(cobertura, df) for df, cobertura, _ in entradas.values()
+                      if cobertura is not None and cobertura >= pedido]
+        if not candidatos:
+            return None
+        _, df = min(candidatos, key=lambda c: c[0])
+        self._contadores['hits'] += 1
+        self._contadores['hits_superconjunto'] += 1
+        return df if df.empty or pedido == pd.Timedelta.max else df[df.index > df.index[-1] - pedido]
+
+    def _guardar(self, grupo: tuple, period: str, df: pd.DataFrame, interval: str):
+        """Guarda la entrada y expulsa las que caducan antes si se supera el máximo; requiere el lock"""
+        self._grupos.setdefault(grupo, {})[period] = (df, self._cobertura(period),
+                                                      time.monotonic() + self.ttl(interval))
+        total = sum(len(e) for e in self._grupos.values())
+        while total > self.maximo_entradas:
+            g, p = min(((g, p) for g, e in self._grupos.items() for p in e),
+                       key=lambda c: self._grupos[c[0]][c[1]][2])
+            del self._grupos[g][p]
+            if not self._grupos[g]:
+                del self._grupos[g]
+            self._contadores['expulsiones'] += 1
+            total -= 1
+
+    def obtener(self, origen: str, simbolos: list, period: str, interval: str, descargar) -> dict:
+        """
+        history() con caché: `descargar(simbolos)` se llama una vez con los símbolos que no están
+        cacheados ni descargándose ya en otra consulta. Mismo formato de resultado que history().
+        """
+        inicio = time.perf_counter()
+        if not self.habilitado:
+            return descargar(simbolos)
+
+        encontrados, esperas, propias = {}, {}, {}
+        with self._lock:
+            for simbolo in simbolos:
+                self._contadores['consultas'] += 1
+                df = self._buscar((origen, simbolo, interval), period)
+                clave = (origen, simbolo, interval, period)
+                if df is not None:
+                    encontrados[simbolo] = df
+                elif clave in self._en_curso:
+                    self._contadores['coalescidas'] += 1
+                    esperas[simbolo] = self._en_curso[clave]
+                else:
+                    self._contadores['misses'] += 1
+                    propias[simbolo] = self._en_curso[clave] = _Descarga()
+
+        if propias:
+            try:
+                descarga = descargar(list(propias))
+            except Exception as e:
+                descarga = {'datos': {}, 'errores': {s: str(e) for s in propias}}
+            with self._lock:
+                self._contadores['peticiones_upstream'] += 1
+                self._contadores['simbolos_descargados'] += len(propias)
+                for simbolo, pendiente in propias.items():
+                    pendiente.datos = descarga['datos'].get(simbolo)
+                    pendiente.error = descarga['errores'].get(simbolo, 'Sin datos')
+                    if pendiente.datos is not None:
+                        self._guardar((origen, simbolo, interval), period, pendiente.datos, interval)
+                    else:
+                        self._contadores['errores'] += 1
+                    del self._en_curso[(origen, simbolo, interval, period)]
+            for pendiente in propias.values():
+                pendiente.evento.set()
+
+        datos, errores = {}, {}
+        for simbolo in simbolos:
+            if simbolo in encontrados:
+                df = encontrados[simbolo]
+            else:
+                pendiente = propias.get(simbolo) or esperas[simbolo]
+                if not pendiente.evento.wait(self.espera_maxima):
+                    errores[simbolo] = 'Tiempo de espera agotado'
+                    continue
+                df = pendiente.datos
+                if df is None:
+                    errores[simbolo] = pendiente.error
+                    continue
+            # Copia para que el llamador no modifique la entrada compartida
+            datos[simbolo] = df.copy()
+
+        return {
+            'datos': datos,
+            'errores': errores,
+            'tiempo_segundos': round(time.perf_counter() - inicio, 3)
+        }
+
+    def invalidar(self):
+        with self._lock:
+            self._grupos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            c = dict(self._contadores)
+            entradas = sum(len(e) for e in self._grupos.values())
+        ahorradas = c['hits'] + c['coalescidas']
+        return {
+            'habilitado': self.habilitado,
+            'entradas': entradas,
+            **c,
+            'ratio_aciertos': round(ahorradas / c['consultas'], 4) if c['consultas'] else 0.0,
+            # Símbolos que no llegaron a pedirse al proveedor remoto
+            'descargas_evitadas': ahorradas
+        }
+
+
+class ProveedorConCache(ProveedorDatos):
+    """Envuelve otro proveedor con la caché compartida de históricos"""
+
+    def __init__(self, base: ProveedorDatos, cache: CacheHistoriales = None):
+        self.base = base
+        self.cache = cache or cache_historiales
+        self.nombre = base.nombre
+        self.guardar_csv = base.guardar_csv
+
+    def history(self, simbolos: list, period: str = "7d", interval: str = "1h") -> dict:
+        return self.cache.obtener(self.base.nombre, simbolos, period, interval,
+                                  lambda pendientes: self.base.history(pendientes, period, interval))
+
+
+# Instancia compartida por todas las rutas online
+cache_historiales = CacheHistoriales.desde_config(CONFIG_PROVEEDOR['cache'])
+
+
+PROVEEDORES = {
+    'yahoo': ProveedorYahoo,
+    'replay': ProveedorReplay
+}
+
+_proveedor_actual = None
+_lock_proveedor = threading.Lock()
+
+
+def crear_proveedor(nombre: str, **opciones) -> ProveedorDatos:
+    """Instancia el proveedor; los remotos se devuelven envueltos en la caché compartida"""
+    if nombre not in PROVEEDORES:
+        raise ValueError(f"Proveedor no soportado: {nombre}")
+    proveedor = PROVEEDORES[nombre](**opciones)
+    return ProveedorConCache(proveedor) if proveedor.cacheable else proveedor
+
+
+def obtener_proveedor() -> ProveedorDatos:
+    """Proveedor en uso (por defecto el de CONFIG_PROVEEDOR['nombre'])"""
+    global _proveedor_actual
+    with _lock_proveedor:
+        if _proveedor_actual is None:
+            _proveedor_actual = crear_proveedor(CONFIG_PROVEEDOR['nombre'])
+        return _proveedor_actual
+
+
+def establecer_proveedor(proveedor: ProveedorDatos):
+    """Sustituye el proveedor en uso (replay, pruebas de carga, fuentes simuladas)"""
+    global _proveedor_actual
+    with _lock_proveedor:
+        _proveedor_actual = proveedor
@@ -0,0 +1,5 @@
+# conftest.py - Los tests importan los módulos de la raíz del repositorio, como los benchmarks
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
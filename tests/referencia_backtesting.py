@@ -0,0 +1,67 @@
+# referencia_backtesting.py - Bucle iloc original de backtesting_estrategia, como referencia
+#
+# Lo usan el test de regresión (tests/test_backtesting.py) y benchmarks/benchmark_backtesting.py.
+import pandas as pd
+
+from funciones import calcular_rsi, calcular_macd, calcular_bollinger_bands
+
+
+def backtesting_iloc(df: pd.DataFrame, capital_inicial: float = 10000, estrategia: str = "rsi_macd") -> dict:
+    """Implementación anterior de backtesting_estrategia (recorrido vela a vela), como referencia"""
+    df = df.copy()
+    df['rsi'] = calcular_rsi(df['Close'])
+    df['macd'] = calcular_macd(df['Close'])['macd']
+    df['signal'] = calcular_macd(df['Close'])['signal']
+    df['sma50'] = df['Close'].rolling(50).mean()
+    df['sma200'] = df['Close'].rolling(200).mean()
+    bb = calcular_bollinger_bands(df['Close'])
+    df['bb_upper'] = bb['upper']
+    df['bb_lower'] = bb['lower']
+
+    capital = capital_inicial
+    posicion = 0
+    operaciones = []
+    precio_compra = 0
+
+    for i in range(1, len(df)):
+        precio = df['Close'].iloc[i]
+        fecha = df.index[i]
+
+        if estrategia == "rsi_macd":
+            senal_compra = df['rsi'].iloc[i] < 30 and df['macd'].iloc[i] > df['signal'].iloc[i]
+            senal_venta = df['rsi'].iloc[i] > 70 and df['macd'].iloc[i] < df['signal'].iloc[i]
+        elif estrategia == "bollinger":
+            senal_compra = precio < df['bb_lower'].iloc[i]
+            senal_venta = precio > df['bb_upper'].iloc[i]
+        elif estrategia == "golden_cross":
+            senal_compra = df['sma50'].iloc[i] > df['sma200'].iloc[i] and df['sma50'].iloc[i-1] <= df['sma200'].iloc[i-1]
+            senal_venta = df['sma50'].iloc[i] < df['sma200'].iloc[i] and df['sma50'].iloc[i-1] >= df['sma200'].iloc[i-1]
+        else:
+            return {"error": "Estrategia no soportada"}
+
+        if senal_compra and posicion == 0:
+            posicion = 1
+            precio_compra = precio
+            operaciones.append({"tipo": "COMPRA", "fecha": fecha, "precio": precio})
+        elif senal_venta and posicion == 1:
+            posicion = 0
+            ganancia = (precio - precio_compra) / precio_compra
+            capital *= (1 + ganancia)
+            operaciones.append({"tipo": "VENTA", "fecha": fecha, "precio": precio, "ganancia": ganancia})
+
+    if posicion == 1:
+        precio_final = df['Close'].iloc[-1]
+        ganancia = (precio_final - precio_compra) / precio_compra
+        capital *= (1 + ganancia)
+        operaciones.append({"tipo": "VENTA", "fecha": df.index[-1], "precio": precio_final, "ganancia": ganancia})
+
+    retorno_total = (capital - capital_inicial) / capital_inicial * 100
+    max_drawdown = ((df['Close'].cummax() - df['Close']) / df['Close'].cummax()).max() * 100
+
+    return {
+        "retorno_total": retorno_total,
+        "max_drawdown": max_drawdown,
+        "operaciones": operaciones,
+        "ganadoras": len([o for o in operaciones if o.get("ganancia", 0) > 0]),
+        "perdedoras": len([o for o in operaciones if o.get("ganancia", 0) < 0])
+    }
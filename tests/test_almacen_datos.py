@@ -0,0 +1,56 @@
+# test_almacen_datos.py - guardar_serie + leer_rango devuelven los mismos datos y metadatos
+import numpy as np
+import pandas as pd
+import pytest
+
+from almacen_datos import guardar_serie, leer_rango, leer_metadatos, serie_vigente
+
+FILAS = 50
+
+
+@pytest.fixture
+def serie() -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    indice = pd.date_range('2024-03-01', periods=FILAS, freq='h', name='Date')
+    cierre = 30000 + np.cumsum(rng.normal(0, 50, FILAS))
+    # Desordenada a propósito: el almacén guarda por fecha
+    return pd.DataFrame({'Close': cierre, 'Volume': rng.uniform(1, 100, FILAS)}, index=indice)[::-1]
+
+
+def test_ida_y_vuelta(tmp_path, serie):
+    origen = tmp_path / 'BTC.csv'
+    origen.write_text('x')
+    assert guardar_serie(serie, 'BTC', str(tmp_path), ruta_origen=str(origen))
+
+    meta = leer_metadatos('BTC', str(tmp_path))
+    assert meta['columnas'] == ['Close', 'Volume']
+    assert meta['filas'] == FILAS
+    assert meta['desde'] == '2024-03-01 00:00:00'
+    assert meta['hasta'] == str(serie.index.max())
+    assert serie_vigente(meta, str(origen))
+
+    leido = leer_rango('BTC', carpeta_data=str(tmp_path), ruta_origen=str(origen))
+    pd.testing.assert_frame_equal(leido, serie.sort_index(), check_freq=False)
+
+    tramo = leer_rango('BTC', desde='2024-03-01 10:00', hasta='2024-03-01 19:00', carpeta_data=str(tmp_path))
+    pd.testing.assert_frame_equal(tramo, serie.sort_index().iloc[10:20], check_freq=False)
+    ultimos = leer_rango('BTC', ultimos_n=5, carpeta_data=str(tmp_path))
+    pd.testing.assert_frame_equal(ultimos, serie.sort_index().tail(5), check_freq=False)
+
+
+def test_zona_horaria_en_utc(tmp_path, serie):
+    local = serie.tz_localize('UTC').tz_convert('America/Bogota')
+    assert guardar_serie(local, 'ETH', str(tmp_path))
+
+    meta = leer_metadatos('ETH', str(tmp_path))
+    assert meta['desde'] == '2024-03-01 00:00:00'
+    leido = leer_rango('ETH', carpeta_data=str(tmp_path))
+    pd.testing.assert_frame_equal(leido, serie.sort_index(), check_freq=False)
+
+
+def test_origen_modificado_invalida(tmp_path, serie):
+    origen = tmp_path / 'SOL.csv'
+    origen.write_text('x')
+    guardar_serie(serie, 'SOL', str(tmp_path), ruta_origen=str(origen))
+    origen.write_text('xy')
+    assert leer_rango('SOL', carpeta_data=str(tmp_path), ruta_origen=str(origen)) is None
@@ -0,0 +1,108 @@
+# test_backtesting.py - El motor vectorizado reproduce el bucle iloc original vela a vela
+#
+# Serie pequeña y fija (800 velas) con ciclos lentos y rápidos, para que las tres estrategias
+# abran y cierren varias operaciones. Sin comisiones ni slippage, como el bucle original.
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtesting import ESTRATEGIAS_SOPORTADAS, optimizar_backtesting, simular
+from referencia_backtesting import backtesting_iloc
+from funciones import backtesting_estrategia
+
+VELAS = 800
+
+# Operaciones, retorno_total, max_drawdown (de la estrategia) y max_drawdown_buy_hold esperados
+ESPERADO = {
+    'rsi_macd': (6, 24.20405376298868, 26.533615419804885, 35.706892941276045),
+    'bollinger': (28, -22.98765437316676, 34.51771063563063, 35.706892941276045),
+    'golden_cross': (6, -7.804877890494136, 35.22283529168807, 35.706892941276045),
+}
+
+
+@pytest.fixture(scope='module')
+def velas() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    t = np.arange(VELAS)
+    precios = 30000 * np.exp(0.15 * np.sin(t / 40) + 0.08 * np.sin(t / 7) + np.cumsum(rng.normal(0, 0.004, VELAS)))
+    return pd.DataFrame({'Close': precios}, index=pd.date_range('2024-01-01', periods=VELAS, freq='h'))
+
+
+def test_cubre_todas_las_estrategias():
+    assert set(ESPERADO) == set(ESTRATEGIAS_SOPORTADAS)
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS_SOPORTADAS)
+def test_igual_al_bucle_iloc(velas, estrategia):
+    referencia = backtesting_iloc(velas, 10000, estrategia)
+    resultado = backtesting_estrategia(velas, 10000, estrategia, comision=0, slippage=0)
+
+    assert resultado['operaciones'] == referencia['operaciones']
+    assert resultado['retorno_total'] == referencia['retorno_total']
+    # El bucle original medía la caída del precio, que ahora es max_drawdown_buy_hold
+    assert resultado['max_drawdown_buy_hold'] == referencia['max_drawdown']
+    assert resultado['ganadoras'] == referencia['ganadoras']
+    assert resultado['perdedoras'] == referencia['perdedoras']
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS_SOPORTADAS)
+def test_valores_fijados(velas, estrategia):
+    operaciones, retorno_total, max_drawdown, max_drawdown_buy_hold = ESPERADO[estrategia]
+    resultado = backtesting_estrategia(velas, 10000, estrategia, comision=0, slippage=0)
+
+    assert resultado['cantidad_operaciones'] == len(resultado['operaciones']) == operaciones
+    assert resultado['retorno_total'] == pytest.approx(retorno_total, rel=1e-9)
+    assert resultado['max_drawdown'] == pytest.approx(max_drawdown, rel=1e-9)
+    assert resultado['max_drawdown_buy_hold'] == pytest.approx(max_drawdown_buy_hold, rel=1e-9)
+
+
+@pytest.mark.parametrize('estrategia', ESTRATEGIAS_SOPORTADAS)
+def test_costes_reducen_el_retorno(velas, estrategia):
+    sin_costes = backtesting_estrategia(velas, 10000, estrategia, comision=0, slippage=0)
+    con_comision = backtesting_estrategia(velas, 10000, estrategia, comision=0.001, slippage=0)
+    con_ambos = backtesting_estrategia(velas, 10000, estrategia, comision=0.001, slippage=0.0005)
+
+    # Los costes no cambian las señales, solo el precio efectivo de cada ejecución
+    assert con_ambos['cantidad_operaciones'] == sin_costes['cantidad_operaciones']
+    assert sin_costes['retorno_total'] > con_comision['retorno_total'] > con_ambos['retorno_total']
+    assert con_ambos['comisiones_pagadas'] > 0
+
+
+@pytest.mark.parametrize('comision, slippage', [(0.001, 0), (0.01, 0), (0.001, 0.0005)])
+def test_una_operacion_ida_y_vuelta(comision, slippage):
+    precios = np.array([100.0, 100.0, 104.0, 110.0, 108.0])
+    compra = np.array([False, True, False, False, False])
+    venta = np.array([False, False, False, True, False])
+
+    resultado = simular(precios, compra, venta, 10000, comision, slippage)
+
+    # Entrada a p0 y salida a p1 pagando la comisión en cada lado (y el slippage en contra)
+    esperado = (1 - comision) ** 2 * (1 - slippage) / (1 + slippage) * 110.0 / 100.0 - 1
+    assert list(resultado['entradas']) == [1] and list(resultado['salidas']) == [3]
+    assert resultado['ganancias'][0] == pytest.approx(esperado, rel=1e-12)
+    assert resultado['capital_final'] == pytest.approx(10000 * (1 + esperado), rel=1e-12)
+
+
+@pytest.mark.parametrize('costes', [{'comision': 1}, {'comision': -0.001}, {'slippage': 1.5}, {'slippage': -0.01}])
+def test_costes_fuera_de_rango(velas, costes):
+    with pytest.raises(ValueError):
+        backtesting_estrategia(velas, 10000, 'bollinger', **costes)
+
+
+def test_optimizaciones_concurrentes_no_se_mezclan(velas):
+    # Camino en el propio proceso (procesos=1), como en los hilos del servidor Flask
+    series = [velas, velas.assign(Close=velas['Close'].to_numpy()[::-1])]
+    grilla = {'bollinger_periodo': [10, 20], 'bollinger_std': [1.5, 2, 2.5]}
+
+    def optimizar(df):
+        resultado = optimizar_backtesting(df, 'bollinger', grilla, procesos=1, comision=0, slippage=0)
+        return [(r['parametros'], r['retorno_total']) for r in resultado['resultados']]
+
+    esperados = [optimizar(df) for df in series]
+    with ThreadPoolExecutor(max_workers=8) as ejecutor:
+        for _ in range(5):
+            futuros = [(i, ejecutor.submit(optimizar, series[i])) for i in (0, 1) * 6]
+            for i, futuro in futuros:
+                assert futuro.result() == esperados[i]
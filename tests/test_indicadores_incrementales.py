@@ -0,0 +1,94 @@
+# test_indicadores_incrementales.py - Los indicadores incrementales coinciden con el recálculo por lotes
+#
+# Series pequeñas y fijas con precios altos (~30000) y muchos ticks, para que cada estado pase
+# varias veces por su refresco periódico (cada `ventana`/`periodo` actualizaciones).
+import numpy as np
+import pandas as pd
+import pytest
+
+from funciones import calcular_rsi, calcular_macd, predecir_precio
+from indicadores_incrementales import (SumaVentana, BollingerIncremental, RegresionIncremental,
+                                       PrediccionIncremental, EstadoIndicadores)
+
+TOLERANCIA = 1e-9
+TICKS = 400
+
+
+@pytest.fixture
+def precios() -> pd.Series:
+    rng = np.random.default_rng(42)
+    valores = 30000 + np.cumsum(rng.normal(0, 50, TICKS))
+    valores[150:190] = valores[149]  # tramo plano: ventanas de varianza y pérdidas nulas
+    return pd.Series(valores, index=pd.date_range('2024-01-01', periods=TICKS, freq='h'))
+
+
+@pytest.mark.parametrize('ventana', [5, 20])
+def test_sma_igual_a_rolling(precios, ventana):
+    suma = SumaVentana(ventana)
+    esperado = precios.rolling(ventana).mean().to_numpy()
+    for i, precio in enumerate(precios):
+        suma.agregar(precio)
+        if i >= ventana - 1:
+            assert suma.media() == pytest.approx(esperado[i], rel=TOLERANCIA)
+    assert TICKS // ventana > 3  # varios refrescos completos
+
+
+def test_bollinger_igual_a_rolling(precios):
+    bollinger = BollingerIncremental(20, 2)
+    media = precios.rolling(20).mean().to_numpy()
+    desviacion = precios.rolling(20).std(ddof=1).to_numpy()
+    for i, precio in enumerate(precios):
+        valor = bollinger.actualizar(precio)
+        if i >= 19:
+            assert valor['middle'] == pytest.approx(media[i], rel=TOLERANCIA)
+            assert valor['upper'] == pytest.approx(media[i] + 2 * desviacion[i], rel=TOLERANCIA, abs=TOLERANCIA)
+            assert valor['lower'] == pytest.approx(media[i] - 2 * desviacion[i], rel=TOLERANCIA, abs=TOLERANCIA)
+
+
+@pytest.mark.parametrize('ventana', [None, 24])
+def test_regresion_igual_a_minimos_cuadrados(precios, ventana):
+    regresion = RegresionIncremental(ventana)
+    valores = precios.to_numpy()
+    for i, precio in enumerate(valores):
+        regresion.actualizar(precio)
+        if i >= 10 and i % 7 == 0:
+            tramo = valores[:i + 1] if ventana is None else valores[max(0, i + 1 - ventana):i + 1]
+            pendiente, ordenada = np.polyfit(np.arange(len(tramo)), tramo, 1)
+            assert regresion.predecir() == pytest.approx(pendiente * len(tramo) + ordenada, rel=TOLERANCIA)
+
+
+def test_prediccion_igual_a_predecir_precio(precios):
+    prediccion = PrediccionIncremental()
+    for i, precio in enumerate(precios):
+        prediccion.actualizar(precio)
+        if i in (3, 9, 13, 50, 189, TICKS - 1):
+            esperado = predecir_precio(pd.DataFrame({'Close': precios.iloc[:i + 1]}))
+            obtenido = prediccion.resultado()
+            assert obtenido['prediccion_final'] == pytest.approx(esperado['prediccion_final'], rel=TOLERANCIA)
+            assert obtenido['intervalo_confianza'] == pytest.approx(esperado['intervalo_confianza'], rel=TOLERANCIA)
+
+
+def test_estado_igual_a_lotes_tras_muchos_ticks(precios):
+    estado = EstadoIndicadores()
+    estado.actualizar_desde(precios.iloc[:100])
+    # Las velas repetidas no se vuelven a procesar
+    assert estado.actualizar_desde(precios.iloc[:250]) == 150
+    estado.actualizar_desde(precios)
+    resumen = estado.resumen()
+
+    macd = calcular_macd(precios).iloc[-1]
+    assert estado.velas == TICKS
+    assert resumen['rsi'] == pytest.approx(calcular_rsi(precios).iloc[-1], rel=TOLERANCIA)
+    assert resumen['macd']['macd'] == pytest.approx(macd['macd'], rel=TOLERANCIA)
+    assert resumen['macd']['signal'] == pytest.approx(macd['signal'], rel=TOLERANCIA)
+    assert resumen['prediccion']['prediccion_final'] == pytest.approx(
+        predecir_precio(pd.DataFrame({'Close': precios}))['prediccion_final'], rel=TOLERANCIA)
+
+
+def test_provisional_no_modifica_el_estado(precios):
+    estado = EstadoIndicadores()
+    estado.actualizar_desde(precios.iloc[:-1])
+    antes = estado.resumen()
+    con_provisional = estado.resumen(provisional=precios.iloc[-1])
+    assert estado.resumen()['velas'] == antes['velas']
+    assert con_provisional['rsi'] == pytest.approx(calcular_rsi(precios).iloc[-1], rel=TOLERANCIA)
@@ -0,0 +1,16 @@
+# test_montecarlo.py - Límites de simular_montecarlo (la memoria del histograma crece con los días)
+import pytest
+
+from global_data import CONFIG_MONTECARLO
+from montecarlo import simular_montecarlo
+
+
+def test_dias_maximos_permitidos():
+    resultado = simular_montecarlo(dias=CONFIG_MONTECARLO['dias_maximos'], iteraciones=10, semilla=1)
+    assert len(resultado['media']) == CONFIG_MONTECARLO['dias_maximos']
+
+
+@pytest.mark.parametrize('dias', [1, CONFIG_MONTECARLO['dias_maximos'] + 1, 100000])
+def test_dias_fuera_de_rango(dias):
+    with pytest.raises(ValueError):
+        simular_montecarlo(dias=dias, iteraciones=10, semilla=1)
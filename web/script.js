@@ -13,6 +13,86 @@ function fetchAPI(endpoint, options = {}) {
     }).then(r => r.json());
 }
 
+// Series OHLCV columnares (?formato=compacto|binario, ver codificacion.py)
+const TIPOS_SERIE = {
+    compacto: 'application/vnd.cripto.columnar+json',
+    binario: 'application/vnd.cripto.columnar'
+};
+const ARRAYS_BINARIOS = { f8: Float64Array, f4: Float32Array, i4: Int32Array };
+
+function formatearFechaUTC(ms, formato) {
+    const d = new Date(ms);
+    const dos = n => String(n).padStart(2, '0');
+    return formato
+        .replace('%Y', d.getUTCFullYear())
+        .replace('%m', dos(d.getUTCMonth() + 1))
+        .replace('%d', dos(d.getUTCDate()))
+        .replace('%H', dos(d.getUTCHours()))
+        .replace('%M', dos(d.getUTCMinutes()))
+        .replace('%S', dos(d.getUTCSeconds()));
+}
+
+// Serie columnar -> forma clásica {fechas, precios, volumenes, open, high, low} + timestamps (ms)
+function serieClasica(serie, leerColumna, leerDeltas) {
+    const n = serie.n;
+    const tiempo = serie.tiempo;
+    const timestamps = new Array(n);
+    if (tiempo.deltas === undefined) {
+        for (let i = 0; i < n; i++) timestamps[i] = tiempo.base + i * tiempo.paso;
+    } else {
+        const deltas = leerDeltas(tiempo.deltas);
+        timestamps[0] = tiempo.base;
+        for (let i = 1; i < n; i++) timestamps[i] = timestamps[i - 1] + deltas[i - 1];
+    }
+    const columna = nombre => serie.columnas[nombre] === undefined ? [] : Array.from(leerColumna(serie.columnas[nombre]));
+    return {
+        timestamps,
+        fechas: timestamps.map(ms => formatearFechaUTC(ms, serie.fechas)),
+        precios: columna('close'),
+        volumenes: columna('volume'),
+        open: columna('open'),
+        high: columna('high'),
+        low: columna('low')
+    };
+}
+
+function sustituirSeries(valor, convertir) {
+    if (Array.isArray(valor)) return valor.map(v => sustituirSeries(v, convertir));
+    if (valor && typeof valor === 'object') {
+        if (valor.codificacion === 'columnar') return convertir(valor);
+        const copia = {};
+        for (const clave in valor) copia[clave] = sustituirSeries(valor[clave], convertir);
+        return copia;
+    }
+    return valor;
+}
+
+function decodificarBinario(buffer) {
+    const magia = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magia !== 'CRPT') throw new Error('Respuesta binaria no reconocida');
+    const longitud = new DataView(buffer).getUint32(8, true);
+    const cabecera = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, longitud)));
+    const inicio = 12 + longitud;  // los arrays empiezan alineados a 8 bytes
+    return sustituirSeries(cabecera, serie => {
+        const leer = (desc, n) => new ARRAYS_BINARIOS[desc.tipo](buffer, inicio + desc.offset, n);
+        return serieClasica(serie, desc => leer(desc, serie.n), desc => leer(desc, Math.max(serie.n - 1, 0)));
+    });
+}
+
+// Decodifica una respuesta json, compacta o binaria a la forma clásica
+async function leerRespuestaSeries(response) {
+    const tipo = (response.headers.get('Content-Type') || '').split(';')[0].trim();
+    if (tipo === TIPOS_SERIE.binario) return decodificarBinario(await response.arrayBuffer());
+    const datos = await response.json();
+    return sustituirSeries(datos, serie => serieClasica(serie, valores => valores, deltas => deltas));
+}
+
+// fetch de una ruta con series OHLCV en formato binario (precision 'float32' reduce el tamaño a la mitad)
+function fetchSeries(url, options = {}, precision = 'float64') {
+    const separador = url.includes('?') ? '&' : '?';
+    return fetch(`${url}${separador}formato=binario&precision=${precision}`, options).then(leerRespuestaSeries);
+}
+
 function formatCurrency(value) {
     return new Intl.NumberFormat('es-ES', {
         style: 'currency',